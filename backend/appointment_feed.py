@@ -0,0 +1,122 @@
+"""
+Appointment responses served by a single aggregation per request.
+
+The doctor, the doctor's user and the patient user are joined in MongoDB with
+$lookup, and the response shape is built with $project. Ids are stored as strings,
+so they are converted to ObjectIds first and every join is an _id equality lookup.
+A malformed or dangling id yields blank details, as the Python-side join used to.
+The joins use $lookup's localField/foreignField + pipeline form (MongoDB 5.0+).
+"""
+from typing import Optional
+
+from bson import ObjectId
+
+from pagination import page_stages, split_page
+from projections import USER_NAME
+
+
+def _object_id(path: str) -> dict:
+    return {"$convert": {"input": path, "to": "objectId", "onError": None, "onNull": None}}
+
+
+def _name(path: str) -> dict:
+    return {
+        "first_name": {"$ifNull": [f"{path}.first_name", ""]},
+        "last_name": {"$ifNull": [f"{path}.last_name", ""]},
+    }
+
+
+PARTICIPANT_STAGES = [
+    {"$set": {"doctor_oid": _object_id("$doctor_id"), "patient_oid": _object_id("$patient_id")}},
+    {"$lookup": {
+        "from": "doctors",
+        "localField": "doctor_oid",
+        "foreignField": "_id",
+        "pipeline": [
+            {"$project": {"specialization": 1, "user_oid": _object_id("$user_id")}},
+            {"$lookup": {"from": "users", "localField": "user_oid", "foreignField": "_id",
+                         "pipeline": [{"$project": USER_NAME}], "as": "user"}},
+        ],
+        "as": "doctor",
+    }},
+    {"$lookup": {"from": "users", "localField": "patient_oid", "foreignField": "_id",
+                 "pipeline": [{"$project": USER_NAME}], "as": "patient"}},
+    {"$set": {"doctor": {"$first": "$doctor"}, "patient": {"$first": "$patient"}}},
+    {"$set": {"doctor_user": {"$first": "$doctor.user"}}},
+]
+
+# Fields copied as-is, then optional fields with the defaults the handlers used to apply
+_REQUIRED_FIELDS = ["patient_id", "doctor_id", "appointment_datetime", "appointment_type", "status"]
+_OPTIONAL_FIELDS = {
+    "symptoms": None,
+    "notes": None,
+    "consultation_fee": 0.0,
+    "payment_status": None,
+    "zoom_meeting_id": None,
+    "zoom_join_url": None,
+    "zoom_password": None,
+}
+
+
+def response_stage(extra_fields: Optional[dict] = None) -> dict:
+    """$project building the appointment response; `_id` is kept and renamed in Python."""
+    optional = {**_OPTIONAL_FIELDS, **(extra_fields or {})}
+    return {"$project": {
+        "_id": 1,
+        **{field: 1 for field in _REQUIRED_FIELDS},
+        **{field: {"$ifNull": [f"${field}", default]} for field, default in optional.items()},
+        "patient_details": _name("$patient"),
+        "doctor_details": {
+            **_name("$doctor_user"),
+            "specialization": {"$ifNull": ["$doctor.specialization", ""]},
+        },
+    }}
+
+
+LIST_STAGES = PARTICIPANT_STAGES + [response_stage()]
+DETAIL_STAGES = PARTICIPANT_STAGES + [response_stage({"payment_id": None})]
+
+
+def _with_ids(docs: list) -> list:
+    for doc in docs:
+        doc["id"] = str(doc.pop("_id"))
+    return docs
+
+
+async def patient_appointments(db, patient_id: str, limit: int, cursor: Optional[str] = None):
+    """One page of a patient's appointments, newest first. Returns (appointments, next_cursor)."""
+    pipeline = page_stages({"patient_id": patient_id}, "appointment_datetime", limit, cursor) + LIST_STAGES
+    docs = await db.appointments.aggregate(pipeline).to_list(length=limit + 1)
+    docs, next_cursor = split_page(docs, "appointment_datetime", limit)
+    return _with_ids(docs), next_cursor
+
+
+async def doctor_appointments(db, doctor_user_id: str, limit: int, cursor: Optional[str] = None):
+    """
+    One page of the appointments of the doctor whose user id is `doctor_user_id`.
+    Starts from `doctors` so resolving the caller's doctor id is part of the same round trip.
+    """
+    pipeline = [
+        {"$match": {"user_id": doctor_user_id}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "doctor_id": {"$toString": "$_id"}}},
+        {"$lookup": {
+            "from": "appointments",
+            "localField": "doctor_id",
+            "foreignField": "doctor_id",
+            "pipeline": page_stages({}, "appointment_datetime", limit, cursor) + LIST_STAGES,
+            "as": "appointment",
+        }},
+        {"$unwind": "$appointment"},
+        {"$replaceRoot": {"newRoot": "$appointment"}},
+    ]
+    docs = await db.doctors.aggregate(pipeline).to_list(length=limit + 1)
+    docs, next_cursor = split_page(docs, "appointment_datetime", limit)
+    return _with_ids(docs), next_cursor
+
+
+async def appointment_detail(db, appointment_id: ObjectId) -> Optional[dict]:
+    """A single appointment with participant details, or None."""
+    pipeline = [{"$match": {"_id": appointment_id}}] + DETAIL_STAGES
+    docs = await db.appointments.aggregate(pipeline).to_list(length=1)
+    return _with_ids(docs)[0] if docs else None
@@ -1,11 +1,15 @@
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Hashable, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials as HTTPAuthCredentials
+import asyncio
 import os
+import time
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -13,6 +17,19 @@ security = HTTPBearer()
 JWT_SECRET = os.getenv("JWT_SECRET", "secret")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRATION_HOURS = int(os.getenv("JWT_EXPIRATION_HOURS", "24"))
+# Verified tokens are cached until their own `exp`; 0 disables the cache.
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+# Where /auth/me gets the profile from: "token" embeds it in the JWT (readable by anyone
+# holding the token), "cache" keeps it in memory per user, "none" reads Mongo every time.
+AUTH_PROFILE_MODE = os.getenv("AUTH_PROFILE_MODE", "cache")
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "300"))
+
+# bcrypt is CPU-bound, so password work runs off the event loop in a bounded pool.
+# "inline" runs it on the loop as before the pool existed; only for before/after benchmarks.
+PASSWORD_POOL_KIND = os.getenv("PASSWORD_POOL_KIND", "thread")  # "thread", "process" or "inline"
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_QUEUE_SIZE = int(os.getenv("PASSWORD_POOL_QUEUE_SIZE", "32"))
 
 def hash_password(password: str) -> str:
     """Hash a password."""
@@ -22,6 +39,113 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordPool:
+    """
+    Runs password hashing/verification in a worker pool.
+    At most `workers + queue_size` calls are admitted at once; beyond that callers
+    get a 503 instead of piling up behind the pool.
+    """
+
+    def __init__(self, kind: str = PASSWORD_POOL_KIND, workers: int = PASSWORD_POOL_WORKERS,
+                 queue_size: int = PASSWORD_POOL_QUEUE_SIZE):
+        self.kind = kind
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.kind == "inline":
+            return fn(*args)
+        if self.pending >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_pool = PasswordPool()
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+class ExpiringLRU:
+    """Bounded LRU map whose entries carry their own expiry (a Unix timestamp)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.time():
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value, expires_at: float):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+token_cache = ExpiringLRU(JWT_CACHE_SIZE)
+profile_cache = ExpiringLRU(PROFILE_CACHE_SIZE)
+
+def profile_claims(user: dict) -> dict:
+    """The UserProfile fields of a user document, in JSON-safe form."""
+    return {
+        "first_name": user["first_name"],
+        "last_name": user["last_name"],
+        "phone": user["phone"],
+        "date_of_birth": user["date_of_birth"],
+        "gender": user["gender"],
+        "profile_image": user.get("profile_image"),
+        "created_at": user["created_at"].isoformat()
+    }
+
+def token_claims(user: dict) -> dict:
+    """Claims for a user's access token, including the profile when AUTH_PROFILE_MODE is "token"."""
+    claims = {"sub": str(user["_id"]), "email": user["email"], "role": user["role"]}
+    if AUTH_PROFILE_MODE == "token":
+        claims["profile"] = profile_claims(user)
+    return claims
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -34,9 +158,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 def decode_access_token(token: str) -> dict:
-    """Decode and verify a JWT token."""
+    """Decode and verify a JWT token, reusing earlier verifications of the same token."""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        if "exp" in payload:
+            token_cache.put(token, payload, payload["exp"])
         return payload
     except JWTError:
         raise HTTPException(
@@ -56,4 +185,7 @@ async def get_current_user(credentials: HTTPAuthCredentials = Depends(security))
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
-    return {"user_id": user_id, "role": role, "email": payload.get("email")}
+    current_user = {"user_id": user_id, "role": role, "email": payload.get("email")}
+    if "profile" in payload:
+        current_user["profile"] = payload["profile"]
+    return current_user
@@ -0,0 +1,308 @@
+"""
+Doctor availability: weekly schedules expanded into bookable slots.
+
+A doctor's `availability` is a list of weekly windows (day_of_week, start_time,
+end_time). Each day's windows are merged and cut into APPOINTMENT_SLOT_MINUTES
+slots, and a slot is free unless an active appointment overlaps it. Doctors who
+have not set a schedule get DEFAULT_AVAILABILITY, the clinic hours the booking
+screen used to hard-code.
+
+Appointment times are naive local clinic time, as the patient picked them. They are
+read in CLINIC_TIMEZONE, or in the server's local timezone when it is unset, which is
+what comparing them with datetime.now() has always assumed.
+
+Results are cached per (doctor, day). Booking or cancelling drops that day, and a
+doctor profile update bumps the directory generation, which drops everything.
+Other workers pick up a booking within AVAILABILITY_CACHE_TTL_SECONDS; until then
+the doctor_slot_active_unique index still rejects a second booking of the slot.
+"""
+import heapq
+import os
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from fastapi import HTTPException, status
+
+from loaders import load_doctors
+from models import ACTIVE_APPOINTMENT_STATUSES
+from projections import BOOKED_SLOTS_BY_DOCTOR, DOCTOR_AVAILABILITY
+
+APPOINTMENT_SLOT_MINUTES = int(os.getenv("APPOINTMENT_SLOT_MINUTES", "30"))
+AVAILABILITY_CACHE_TTL_SECONDS = float(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "30"))
+AVAILABILITY_CACHE_MAX_ENTRIES = int(os.getenv("AVAILABILITY_CACHE_MAX_ENTRIES", "20000"))
+AVAILABILITY_MAX_DAYS = int(os.getenv("AVAILABILITY_MAX_DAYS", "31"))
+AVAILABILITY_MAX_DOCTORS = int(os.getenv("AVAILABILITY_MAX_DOCTORS", "50"))
+# IANA name, e.g. Asia/Kolkata; None means the server's local timezone
+CLINIC_TIMEZONE = ZoneInfo(os.environ["CLINIC_TIMEZONE"]) if os.getenv("CLINIC_TIMEZONE") else None
+
+DEFAULT_AVAILABILITY = [
+    {"day_of_week": day, "start_time": start, "end_time": end}
+    for day in range(7)
+    for start, end in (("09:00", "13:00"), ("14:00", "19:00"))
+]
+
+
+class InvalidDateRange(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def clinic_now() -> datetime:
+    """The current naive local clinic time."""
+    return datetime.now(CLINIC_TIMEZONE).replace(tzinfo=None)
+
+
+def to_clinic_time(value: datetime) -> datetime:
+    """A datetime as naive local clinic time; naive values are taken to be clinic time already."""
+    if value.tzinfo is None:
+        return value
+    # astimezone(None) converts to the server's local timezone
+    return value.astimezone(CLINIC_TIMEZONE).replace(tzinfo=None)
+
+
+def clinic_to_utc(value: datetime) -> datetime:
+    """Naive local clinic time as naive UTC, the form every other stored timestamp takes."""
+    # A naive datetime's astimezone() reads it as the server's local time
+    local = value.replace(tzinfo=CLINIC_TIMEZONE) if CLINIC_TIMEZONE else value
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def utc_to_clinic(value: datetime) -> datetime:
+    """Naive UTC as naive local clinic time; the inverse of clinic_to_utc."""
+    return to_clinic_time(value.replace(tzinfo=timezone.utc))
+
+
+def parse_date_range(start_date: str, end_date: Optional[str] = None) -> Tuple[date, date]:
+    """Parse an inclusive YYYY-MM-DD range of at most AVAILABILITY_MAX_DAYS days."""
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else start
+    except ValueError:
+        raise InvalidDateRange("Dates must be in YYYY-MM-DD format")
+    if end < start:
+        raise InvalidDateRange("end_date must not be before start_date")
+    if (end - start).days >= AVAILABILITY_MAX_DAYS:
+        raise InvalidDateRange(f"Date range cannot exceed {AVAILABILITY_MAX_DAYS} days")
+    return start, end
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def weekly_windows(availability: Optional[List[dict]]) -> Dict[int, List[Tuple[int, int]]]:
+    """Weekday -> sorted, non-overlapping (start, end) windows in minutes after midnight."""
+    by_day: Dict[int, List[Tuple[int, int]]] = {}
+    for window in availability or DEFAULT_AVAILABILITY:
+        try:
+            start, end = _minutes(window["start_time"]), _minutes(window["end_time"])
+        except (KeyError, ValueError, AttributeError):
+            continue
+        if end > start:
+            by_day.setdefault(window["day_of_week"], []).append((start, end))
+
+    merged = {}
+    for day, windows in by_day.items():
+        windows.sort()
+        day_windows = [windows[0]]
+        for start, end in windows[1:]:
+            last_start, last_end = day_windows[-1]
+            if start <= last_end:
+                day_windows[-1] = (last_start, max(last_end, end))
+            else:
+                day_windows.append((start, end))
+        merged[day] = day_windows
+    return merged
+
+
+def schedule_slots(windows: Dict[int, List[Tuple[int, int]]], day: date) -> List[int]:
+    """Start minutes of every slot that fits entirely inside one of the day's windows."""
+    slots = []
+    for start, end in windows.get(day.weekday(), ()):
+        slots.extend(range(start, end - APPOINTMENT_SLOT_MINUTES + 1, APPOINTMENT_SLOT_MINUTES))
+    return slots
+
+
+class DaySlots(NamedTuple):
+    free: Tuple[int, ...]
+    booked: Tuple[int, ...]
+
+    def to_dict(self, day: date) -> dict:
+        return {
+            "date": day.isoformat(),
+            "free_slots": [format_minutes(start) for start in self.free],
+            "booked_slots": [format_minutes(start) for start in self.booked],
+        }
+
+
+def split_slots(slots: List[int], bookings: List[int]) -> DaySlots:
+    """
+    Partition slots into free and booked. `bookings` are sorted start minutes, each
+    occupying one slot length; a slot is booked if any booking interval overlaps it.
+    """
+    free, booked = [], []
+    for start in slots:
+        # First booking that ends after this slot starts
+        index = bisect_right(bookings, start - APPOINTMENT_SLOT_MINUTES)
+        if index < len(bookings) and bookings[index] < start + APPOINTMENT_SLOT_MINUTES:
+            booked.append(start)
+        else:
+            free.append(start)
+    return DaySlots(tuple(free), tuple(booked))
+
+
+def _slot_stream(doctor_id: str, days: Dict[date, DaySlots], start: datetime,
+                 end: datetime) -> Iterator[Tuple[datetime, str]]:
+    """A doctor's free slots within [start, end) in time order, as (slot start, doctor_id)."""
+    for day, day_slots in days.items():
+        midnight = datetime.combine(day, datetime.min.time())
+        for minutes in day_slots.free:
+            slot_start = midnight + timedelta(minutes=minutes)
+            if slot_start >= end:
+                return
+            if slot_start >= start:
+                yield slot_start, doctor_id
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    generation: int
+    value: DaySlots
+
+
+class AvailabilityService:
+    """Free/booked slots per doctor per day, computed in batches and cached per doctor-day."""
+
+    def __init__(self, db, generation, ttl: float = AVAILABILITY_CACHE_TTL_SECONDS,
+                 max_entries: int = AVAILABILITY_CACHE_MAX_ENTRIES):
+        self.db = db
+        self.generation = generation
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        # Bumped by every invalidation so loads that raced one are not cached
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get_days(self, doctor_ids: Iterable[str], start: date, end: date) -> Dict[str, Dict[date, DaySlots]]:
+        """
+        Slots for every doctor on every day from `start` to `end` inclusive.
+        Unknown doctors are left out. Cache misses cost two queries in total.
+        """
+        days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        generation = await self.generation.current()
+        now = time.monotonic()
+
+        result: Dict[str, Dict[date, DaySlots]] = {}
+        missing: Dict[str, List[date]] = {}
+        computed: Dict[str, Dict[date, DaySlots]] = {}
+        for doctor_id in dict.fromkeys(doctor_ids):
+            for day in days:
+                entry = self._entries.get((doctor_id, day))
+                if entry is not None and entry.generation == generation and entry.expires_at > now:
+                    self.hits += 1
+                    self._entries.move_to_end((doctor_id, day))
+                    result.setdefault(doctor_id, {})[day] = entry.value
+                else:
+                    self.misses += 1
+                    missing.setdefault(doctor_id, []).append(day)
+
+        if missing:
+            version = self._version
+            computed = await self._compute(missing)
+            for doctor_id, day_slots in computed.items():
+                result.setdefault(doctor_id, {}).update(day_slots)
+            # Skip caching if a booking or cancellation landed while we were reading
+            if version == self._version:
+                self._store(computed, generation)
+
+        # Doctors that do not exist have nothing computed and are dropped
+        return {
+            doctor_id: dict(sorted(day_slots.items()))
+            for doctor_id, day_slots in result.items()
+            if doctor_id not in missing or doctor_id in computed
+        }
+
+    async def _compute(self, missing: Dict[str, List[date]]) -> Dict[str, Dict[date, DaySlots]]:
+        doctors = await load_doctors(self.db, missing.keys(), DOCTOR_AVAILABILITY)
+        if not doctors:
+            return {}
+
+        first_day = min(day for days in missing.values() for day in days)
+        last_day = max(day for days in missing.values() for day in days)
+        bookings: Dict[Tuple[str, date], List[int]] = {}
+        cursor = self.db.appointments.find({
+            "doctor_id": {"$in": list(doctors)},
+            "appointment_datetime": {
+                "$gte": datetime.combine(first_day, datetime.min.time()),
+                "$lt": datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+            },
+            "status": {"$in": ACTIVE_APPOINTMENT_STATUSES}
+        }, BOOKED_SLOTS_BY_DOCTOR)
+        async for appointment in cursor:
+            booked_at = appointment["appointment_datetime"]
+            key = (appointment["doctor_id"], booked_at.date())
+            bookings.setdefault(key, []).append(booked_at.hour * 60 + booked_at.minute)
+
+        computed = {}
+        for doctor_id, doctor in doctors.items():
+            windows = weekly_windows(doctor.get("availability"))
+            computed[doctor_id] = {
+                day: split_slots(schedule_slots(windows, day), sorted(bookings.get((doctor_id, day), ())))
+                for day in missing[doctor_id]
+            }
+        return computed
+
+    async def next_available(self, doctor_ids: List[str], start: datetime, end: datetime,
+                             limit: int) -> List[Tuple[datetime, str]]:
+        """
+        Earliest `limit` free (slot start, doctor_id) pairs in [start, end) across all doctors.
+        Each doctor's free slots form a sorted stream and the streams are heap-merged. Days
+        are loaded in chunks that double in size, so a busy window does not load at all
+        beyond the day that fills the result.
+        """
+        results: List[Tuple[datetime, str]] = []
+        day, last_day = start.date(), end.date()
+        chunk_days = 1
+        while day <= last_day and len(results) < limit:
+            chunk_end = min(day + timedelta(days=chunk_days - 1), last_day)
+            slots = await self.get_days(doctor_ids, day, chunk_end)
+            streams = [_slot_stream(doctor_id, days, start, end) for doctor_id, days in slots.items()]
+            results.extend(islice(heapq.merge(*streams), limit - len(results)))
+            day = chunk_end + timedelta(days=1)
+            chunk_days *= 2
+        return results
+
+    def _store(self, computed: Dict[str, Dict[date, DaySlots]], generation: int):
+        expires_at = time.monotonic() + self.ttl
+        for doctor_id, day_slots in computed.items():
+            for day, slots in day_slots.items():
+                self._entries[(doctor_id, day)] = _Entry(expires_at, generation, slots)
+                self._entries.move_to_end((doctor_id, day))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_day(self, doctor_id: str, day: date):
+        """Forget one doctor-day after a booking or cancellation on this worker."""
+        self._version += 1
+        self._entries.pop((doctor_id, day), None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,124 @@
+"""
+In-process cache for the doctor directory (`/doctors/list`, `/doctors/{id}`).
+
+Entries expire after DOCTOR_CACHE_TTL_SECONDS and are also tagged with a
+directory generation. Any doctor write bumps the generation, which invalidates
+every entry at once. With DOCTOR_CACHE_BACKEND=mongo the generation lives in the
+`cache_generations` collection, so a write on one worker invalidates the others
+within DOCTOR_CACHE_SYNC_INTERVAL_SECONDS.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, NamedTuple
+
+from pymongo import ReturnDocument
+
+DOCTOR_CACHE_TTL_SECONDS = float(os.getenv("DOCTOR_CACHE_TTL_SECONDS", "60"))
+DOCTOR_CACHE_MAX_ENTRIES = int(os.getenv("DOCTOR_CACHE_MAX_ENTRIES", "1024"))
+DOCTOR_CACHE_BACKEND = os.getenv("DOCTOR_CACHE_BACKEND", "memory")  # "memory" or "mongo"
+DOCTOR_CACHE_SYNC_INTERVAL_SECONDS = float(os.getenv("DOCTOR_CACHE_SYNC_INTERVAL_SECONDS", "1"))
+
+
+class LocalGeneration:
+    """Generation counter private to this process."""
+
+    def __init__(self):
+        self.value = 0
+
+    async def current(self) -> int:
+        return self.value
+
+    async def bump(self) -> int:
+        self.value += 1
+        return self.value
+
+
+class MongoGeneration:
+    """
+    Generation counter shared through MongoDB.
+    Reads are served from a local copy refreshed at most every `sync_interval` seconds.
+    """
+
+    def __init__(self, db, name: str, sync_interval: float = DOCTOR_CACHE_SYNC_INTERVAL_SECONDS):
+        self.collection = db.cache_generations
+        self.name = name
+        self.sync_interval = sync_interval
+        self.value = 0
+        self.synced_at = 0.0
+
+    async def current(self) -> int:
+        now = time.monotonic()
+        if now - self.synced_at >= self.sync_interval:
+            doc = await self.collection.find_one({"_id": self.name}, {"generation": 1})
+            self.value = doc["generation"] if doc else 0
+            self.synced_at = now
+        return self.value
+
+    async def bump(self) -> int:
+        doc = await self.collection.find_one_and_update(
+            {"_id": self.name},
+            {"$inc": {"generation": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self.value = doc["generation"]
+        self.synced_at = time.monotonic()
+        return self.value
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    generation: int
+    value: object
+
+
+class DoctorDirectoryCache:
+    def __init__(self, generation, ttl: float = DOCTOR_CACHE_TTL_SECONDS, max_entries: int = DOCTOR_CACHE_MAX_ENTRIES):
+        self.generation = generation
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[object]]):
+        """Return the cached value for `key`, calling `loader` on a miss. Values must not be mutated by callers."""
+        generation = await self.generation.current()
+        entry = self._entries.get(key)
+        if entry is not None and entry.generation == generation and entry.expires_at > time.monotonic():
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry.value
+
+        self.misses += 1
+        value = await loader()
+        self._entries[key] = _Entry(time.monotonic() + self.ttl, generation, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    async def invalidate(self):
+        """Drop every entry here and, with a shared backend, on every other worker."""
+        self.invalidations += 1
+        self._entries.clear()
+        await self.generation.bump()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.generation).__name__,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+def create_doctor_cache(db) -> DoctorDirectoryCache:
+    if DOCTOR_CACHE_BACKEND == "mongo":
+        return DoctorDirectoryCache(MongoGeneration(db, "doctor_directory"))
+    return DoctorDirectoryCache(LocalGeneration())
@@ -0,0 +1,219 @@
+"""
+In-memory inverted index over the doctor directory.
+
+Doctors are tokenized across name, specialization, qualifications and bio. Each
+token's posting list maps doctors to a field-weighted score. Queries AND their
+tokens together and treat the last token as a prefix, so results show up while
+the user is still typing. Rows are ranked by idf-weighted score, then rating.
+
+The index is rebuilt off the event loop whenever the doctor directory generation
+changes (see doctor_cache) or DOCTOR_SEARCH_REFRESH_SECONDS elapses.
+"""
+import asyncio
+import heapq
+import math
+import os
+import re
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Set
+
+from bson import ObjectId
+
+from projections import DOCTOR_CARD, USER_NAME
+
+DOCTOR_SEARCH_REFRESH_SECONDS = float(os.getenv("DOCTOR_SEARCH_REFRESH_SECONDS", "300"))
+MAX_PREFIX_EXPANSIONS = 64
+
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "specialization": 2.5,
+    "qualifications": 1.5,
+    "bio": 1.0,
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def doctor_card(doctor: dict, user: dict) -> dict:
+    """Public directory entry for a doctor, as returned by /doctors/list."""
+    return {
+        "id": str(doctor["_id"]),
+        "user_id": doctor["user_id"],
+        "first_name": user["first_name"],
+        "last_name": user["last_name"],
+        "specialization": doctor.get("specialization", ""),
+        "qualifications": doctor.get("qualifications", []),
+        "experience": doctor.get("experience", 0),
+        "consultation_fee": doctor.get("consultation_fee", 0.0),
+        "rating": doctor.get("rating", 0.0),
+        "bio": doctor.get("bio", ""),
+        "verified": doctor.get("verified", False)
+    }
+
+
+class DoctorSearchIndex:
+    def __init__(self, cards: Iterable[dict]):
+        # Internal ids follow ObjectId order, so sorting them sorts by _id
+        self.cards: List[dict] = sorted(cards, key=lambda card: ObjectId(card["id"]))
+        self.object_ids: List[ObjectId] = [ObjectId(card["id"]) for card in self.cards]
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.specialization_postings: Dict[str, Set[int]] = {}
+
+        for doc_id, card in enumerate(self.cards):
+            field_text = {
+                "name": f"{card['first_name']} {card['last_name']}",
+                "specialization": card["specialization"],
+                "qualifications": " ".join(card["qualifications"]),
+                "bio": card["bio"],
+            }
+            for field, text in field_text.items():
+                for token in set(tokenize(text)):
+                    weights = self.postings.setdefault(token, {})
+                    weights[doc_id] = weights.get(doc_id, 0.0) + FIELD_WEIGHTS[field]
+            for token in tokenize(card["specialization"]):
+                self.specialization_postings.setdefault(token, set()).add(doc_id)
+
+        self.terms = sorted(self.postings)
+        self.specialization_terms = sorted(self.specialization_postings)
+
+    def __len__(self):
+        return len(self.cards)
+
+    @staticmethod
+    def _expand(terms: List[str], token: str, prefix: bool) -> List[str]:
+        if not prefix:
+            index = bisect_left(terms, token)
+            return [token] if index < len(terms) and terms[index] == token else []
+        start = bisect_left(terms, token)
+        end = min(bisect_right(terms, token + "\uffff", lo=start), start + MAX_PREFIX_EXPANSIONS)
+        return terms[start:end]
+
+    def _score_matches(self, tokens: List[str], prefix: bool) -> Dict[int, float]:
+        """Doctors matching every token, with their summed idf-weighted scores."""
+        total = len(self.cards)
+        scores: Optional[Dict[int, float]] = None
+        for position, token in enumerate(tokens):
+            is_prefix = prefix and position == len(tokens) - 1
+            token_scores: Dict[int, float] = {}
+            for term in self._expand(self.terms, token, is_prefix):
+                postings = self.postings[term]
+                idf = math.log(1 + total / len(postings))
+                for doc_id, weight in postings.items():
+                    score = weight * idf
+                    if score > token_scores.get(doc_id, 0.0):
+                        token_scores[doc_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                if len(token_scores) < len(scores):
+                    scores, token_scores = token_scores, scores
+                scores = {doc_id: score + token_scores[doc_id] for doc_id, score in scores.items() if doc_id in token_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def _specialization_matches(self, specialization: str) -> Set[int]:
+        tokens = tokenize(specialization)
+        matches: Optional[Set[int]] = None
+        for position, token in enumerate(tokens):
+            token_matches: Set[int] = set()
+            for term in self._expand(self.specialization_terms, token, position == len(tokens) - 1):
+                token_matches |= self.specialization_postings[term]
+            matches = token_matches if matches is None else matches & token_matches
+            if not matches:
+                return set()
+        return matches if matches is not None else set(range(len(self.cards)))
+
+    def _passes_filters(self, card: dict, min_fee, max_fee, min_experience, verified) -> bool:
+        if min_fee is not None and card["consultation_fee"] < min_fee:
+            return False
+        if max_fee is not None and card["consultation_fee"] > max_fee:
+            return False
+        if min_experience is not None and card["experience"] < min_experience:
+            return False
+        if verified is not None and card["verified"] != verified:
+            return False
+        return True
+
+    def search(self, query: Optional[str] = None, specialization: Optional[str] = None, min_fee: float = None,
+               max_fee: float = None, min_experience: int = None, verified: bool = None, limit: int = 20,
+               prefix: bool = True) -> List[dict]:
+        """Top `limit` doctors for a free-text query plus filters, best first, each with a `score`."""
+        tokens = tokenize(query)
+        allowed = self._specialization_matches(specialization) if specialization else None
+        if tokens:
+            scores = self._score_matches(tokens, prefix)
+            if allowed is not None:
+                scores = {doc_id: score for doc_id, score in scores.items() if doc_id in allowed}
+        else:
+            scores = dict.fromkeys(range(len(self.cards)) if allowed is None else allowed, 0.0)
+
+        candidates = (
+            (score, self.cards[doc_id]["rating"], -doc_id)
+            for doc_id, score in scores.items()
+            if self._passes_filters(self.cards[doc_id], min_fee, max_fee, min_experience, verified)
+        )
+        results = []
+        for score, _, negative_id in heapq.nlargest(limit, candidates):
+            card = dict(self.cards[-negative_id])
+            card["score"] = round(score, 4)
+            results.append(card)
+        return results
+
+    def list_by_specialization(self, specialization: str, limit: int, after_id: Optional[ObjectId] = None) -> List[dict]:
+        """Doctors whose specialization matches, in _id order, starting after `after_id`."""
+        doc_ids = sorted(self._specialization_matches(specialization))
+        start = 0
+        if after_id is not None:
+            start = bisect_right(doc_ids, after_id, key=lambda doc_id: self.object_ids[doc_id])
+        return [self.cards[doc_id] for doc_id in doc_ids[start:start + limit]]
+
+
+class DoctorSearchService:
+    """Keeps a DoctorSearchIndex in sync with the database, rebuilding it off the event loop."""
+
+    def __init__(self, db, generation, refresh_seconds: float = DOCTOR_SEARCH_REFRESH_SECONDS):
+        self.db = db
+        self.generation = generation
+        self.refresh_seconds = refresh_seconds
+        self._index: Optional[DoctorSearchIndex] = None
+        self._index_generation = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _load_cards(self) -> List[dict]:
+        users = {}
+        async for user in self.db.users.find({"role": "doctor"}, USER_NAME):
+            users[str(user["_id"])] = user
+        cards = []
+        async for doctor in self.db.doctors.find({}, DOCTOR_CARD):
+            user = users.get(doctor["user_id"])
+            if user:
+                cards.append(doctor_card(doctor, user))
+        return cards
+
+    def _is_fresh(self, generation) -> bool:
+        return (
+            self._index is not None
+            and self._index_generation == generation
+            and time.monotonic() - self._built_at < self.refresh_seconds
+        )
+
+    async def get_index(self) -> DoctorSearchIndex:
+        generation = await self.generation.current()
+        if self._is_fresh(generation):
+            return self._index
+        async with self._lock:
+            if self._is_fresh(generation):
+                return self._index
+            cards = await self._load_cards()
+            loop = asyncio.get_running_loop()
+            self._index = await loop.run_in_executor(None, DoctorSearchIndex, cards)
+            self._index_generation = generation
+            self._built_at = time.monotonic()
+            return self._index
@@ -0,0 +1,164 @@
+"""
+Chunked GridFS storage for medical document files.
+
+`medical_documents` keeps only metadata plus a `file_id` pointing into the
+GridFS bucket. Documents written before this store existed carry their payload
+inline as base64 `document_data`; `python document_store.py --migrate` moves
+those into GridFS.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+
+DOCUMENT_BUCKET = os.getenv("DOCUMENT_BUCKET", "medical_document_files")
+DOCUMENT_CHUNK_SIZE_BYTES = int(os.getenv("DOCUMENT_CHUNK_SIZE_BYTES", str(255 * 1024)))
+MAX_DOCUMENT_SIZE_BYTES = int(os.getenv("MAX_DOCUMENT_SIZE_BYTES", str(25 * 1024 * 1024)))
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class DocumentTooLarge(Exception):
+    pass
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header into an inclusive (start, end) pair.
+    Returns None when the whole file should be sent (no header, or a multi-range
+    request, which we answer with the full body as RFC 9110 allows).
+    """
+    if not range_header:
+        return None
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        raise RangeNotSatisfiable()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def decode_base64_document(document_data: str) -> bytes:
+    """Decode a legacy base64 payload, tolerating a `data:<type>;base64,` prefix."""
+    if document_data.startswith("data:") and "," in document_data:
+        document_data = document_data.split(",", 1)[1]
+    try:
+        return base64.b64decode(document_data, validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError("document_data is not valid base64")
+
+
+class DocumentStore:
+    def __init__(self, db, bucket_name: str = DOCUMENT_BUCKET):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name, chunk_size_bytes=DOCUMENT_CHUNK_SIZE_BYTES)
+
+    async def save(self, filename: str, content_type: str, chunks: AsyncIterator[bytes]):
+        """
+        Stream `chunks` into GridFS and return (file_id, size).
+        Aborts the upload and raises DocumentTooLarge past MAX_DOCUMENT_SIZE_BYTES.
+        """
+        grid_in = self.bucket.open_upload_stream(filename, metadata={"content_type": content_type})
+        size = 0
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_DOCUMENT_SIZE_BYTES:
+                    raise DocumentTooLarge()
+                await grid_in.write(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        return grid_in._id, size
+
+    async def save_bytes(self, filename: str, content_type: str, data: bytes):
+        async def single_chunk():
+            yield data
+        return await self.save(filename, content_type, single_chunk())
+
+    async def stream(self, file_id, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield the bytes of a stored file from `start` to `end` inclusive, one GridFS chunk at a time."""
+        grid_out = await self.bucket.open_download_stream(file_id)
+        if end is None:
+            end = grid_out.length - 1
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, file_id):
+        await self.bucket.delete(file_id)
+
+
+async def iter_upload_file(upload, chunk_size: int = DOCUMENT_CHUNK_SIZE_BYTES) -> AsyncIterator[bytes]:
+    """Read a Starlette UploadFile in fixed-size chunks."""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def migrate_inline_documents(db) -> int:
+    """Move base64 `document_data` payloads into GridFS. Returns the number migrated."""
+    store = DocumentStore(db)
+    migrated = 0
+    cursor = db.medical_documents.find({"document_data": {"$exists": True}, "file_id": {"$exists": False}})
+    async for doc in cursor:
+        data = decode_base64_document(doc["document_data"])
+        content_type = doc.get("content_type", DEFAULT_CONTENT_TYPE)
+        file_id, size = await store.save_bytes(doc.get("document_name", str(doc["_id"])), content_type, data)
+        await db.medical_documents.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"file_id": file_id, "size": size, "content_type": content_type},
+             "$unset": {"document_data": ""}}
+        )
+        migrated += 1
+    return migrated
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        migrated = await migrate_inline_documents(client[os.environ['DB_NAME']])
+    finally:
+        client.close()
+    print(f"Migrated {migrated} documents to GridFS.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Medical document storage maintenance.")
+    parser.add_argument("--migrate", action="store_true", help="move inline base64 documents into GridFS")
+    args = parser.parse_args()
+    if not args.migrate:
+        parser.error("nothing to do; pass --migrate")
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+"""
+A patient's EMR as one time-ordered feed.
+
+Vitals, prescriptions, documents and appointments each keep their own collection
+and their own (patient_id, time field, _id) index. A timeline page opens one
+index-ordered cursor per collection, newest first, and k-way merges them, so a
+page of `limit` entries reads at most `limit + 1` rows from each source no
+matter how long the history is.
+
+Entries are ordered by (time, source, _id), descending, with time in UTC.
+Appointment times are stored as local clinic time, so they are converted before
+merging, and the cursor's UTC time is converted back for the appointment filter.
+The page cursor is the last entry's full key, which every source turns into its
+own keyset filter.
+"""
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+from appointment_feed import LIST_STAGES
+from availability import clinic_to_utc, utc_to_clinic
+from pagination import InvalidCursor, decode_cursor, encode_cursor, sort_spec
+from projections import DOCUMENT_METADATA, PRESCRIPTION, VITALS
+from vitals_store import vitals_collection
+
+
+class TimelineSource(NamedTuple):
+    kind: str
+    time_field: str
+    projection: Optional[dict]
+    # Aggregation stages appended after the page stages, for sources that need a join
+    stages: Optional[list] = None
+    # Whether time_field holds naive local clinic time rather than naive UTC
+    clinic_time: bool = False
+
+    def occurred_at(self, doc: dict) -> datetime:
+        """The row's time in UTC, the merge key."""
+        value = doc[self.time_field]
+        return clinic_to_utc(value) if self.clinic_time else value
+
+    def stored_time(self, occurred_at: datetime) -> datetime:
+        """A UTC merge key as this source stores it, for its keyset filter."""
+        return utc_to_clinic(occurred_at) if self.clinic_time else occurred_at
+
+    def collection(self, db):
+        if self.kind == "vital":
+            return vitals_collection(db)
+        return db[{"prescription": "prescriptions", "document": "medical_documents",
+                   "appointment": "appointments"}[self.kind]]
+
+
+# Listed in tie-break order: on equal timestamps the later source comes first
+TIMELINE_SOURCES = [
+    TimelineSource("vital", "recorded_at", VITALS),
+    TimelineSource("prescription", "created_at", PRESCRIPTION),
+    TimelineSource("document", "uploaded_at", DOCUMENT_METADATA),
+    TimelineSource("appointment", "appointment_datetime", None, LIST_STAGES, clinic_time=True),
+]
+TIMELINE_KINDS = [source.kind for source in TIMELINE_SOURCES]
+_RANKS = {kind: rank for rank, kind in enumerate(TIMELINE_KINDS)}
+
+
+class TimelineEntry(NamedTuple):
+    occurred_at: object
+    rank: int
+    doc: dict
+
+    @property
+    def kind(self) -> str:
+        return TIMELINE_KINDS[self.rank]
+
+    def key(self) -> tuple:
+        return self.occurred_at, self.rank, self.doc["_id"]
+
+
+def decode_timeline_cursor(cursor: str) -> Tuple[object, int, object]:
+    value, last_id = decode_cursor(cursor)
+    if not isinstance(value, list) or len(value) != 2 or not isinstance(value[0], datetime) or value[1] not in _RANKS:
+        raise InvalidCursor()
+    return value[0], _RANKS[value[1]], last_id
+
+
+def _after(source: TimelineSource, position: Tuple[object, int, object]) -> dict:
+    """Keyset filter for one source: rows that sort after `position` in (time, rank, _id) descending order."""
+    occurred_at, rank, last_id = position
+    source_rank, time_field = _RANKS[source.kind], source.time_field
+    occurred_at = source.stored_time(occurred_at)
+    if source_rank < rank:
+        return {time_field: {"$lte": occurred_at}}
+    if source_rank > rank:
+        return {time_field: {"$lt": occurred_at}}
+    return {"$or": [
+        {time_field: {"$lt": occurred_at}},
+        {time_field: occurred_at, "_id": {"$lt": last_id}},
+    ]}
+
+
+def _source_cursor(db, source: TimelineSource, query: dict, limit: int):
+    sort = sort_spec(source.time_field)
+    if source.stages:
+        pipeline = [{"$match": query}, {"$sort": dict(sort)}, {"$limit": limit}] + source.stages
+        return source.collection(db).aggregate(pipeline)
+    return source.collection(db).find(query, source.projection).sort(sort).limit(limit)
+
+
+async def _entries(cursor, source: TimelineSource) -> AsyncIterator[TimelineEntry]:
+    rank = _RANKS[source.kind]
+    async for doc in cursor:
+        yield TimelineEntry(source.occurred_at(doc), rank, doc)
+
+
+async def _merge(streams: List[AsyncIterator[TimelineEntry]], limit: int) -> List[TimelineEntry]:
+    """
+    K-way merge of descending streams, stopping after `limit` entries. With at most
+    four sources, picking the largest head directly beats maintaining a heap.
+    """
+    heads: Dict[int, TimelineEntry] = {}
+    for index, stream in enumerate(streams):
+        entry = await anext(stream, None)
+        if entry is not None:
+            heads[index] = entry
+
+    merged = []
+    while heads and len(merged) < limit:
+        index = max(heads, key=lambda i: heads[i].key())
+        merged.append(heads[index])
+        entry = await anext(streams[index], None)
+        if entry is None:
+            del heads[index]
+        else:
+            heads[index] = entry
+    return merged
+
+
+async def patient_timeline(db, patient_id: str, limit: int, cursor: Optional[str] = None,
+                           kinds: Optional[List[str]] = None):
+    """
+    One page of a patient's timeline, newest first, as (entries, next_cursor).
+    Appointment documents come with participant details; the rest are raw projected rows.
+    """
+    position = decode_timeline_cursor(cursor) if cursor else None
+    cursors, streams = [], []
+    for source in TIMELINE_SOURCES:
+        if kinds and source.kind not in kinds:
+            continue
+        query = {"patient_id": patient_id}
+        if position:
+            query = {"$and": [query, _after(source, position)]}
+        cursors.append(_source_cursor(db, source, query, limit + 1))
+        streams.append(_entries(cursors[-1], source))
+
+    try:
+        entries = await _merge(streams, limit + 1)
+    finally:
+        # Sources the merge did not drain still hold server-side cursors
+        for source_cursor in cursors:
+            await source_cursor.close()
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        next_cursor = encode_cursor([last.occurred_at, last.kind], last.doc["_id"])
+    return entries, next_cursor
@@ -0,0 +1,151 @@
+"""
+Liveness and readiness checks.
+
+Liveness only says the process is serving requests. Readiness says this worker
+should keep receiving traffic. It fails, with a 503, when any critical check
+passes its threshold, so the load balancer drains a worker before its latency
+collapses:
+
+- mongo: round-trip time of a `ping` command
+- mongo_pool: share of the connection pool checked out, and callers queued waiting
+  for a connection
+- event_loop: recent loop lag from the LoopLagSampler
+- zoom_token: age of the cached Zoom OAuth token. This is informational unless
+  READINESS_REQUIRE_ZOOM_TOKEN is set, since an expired token is refreshed on the
+  next call.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict
+
+from pymongo import monitoring
+
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+READINESS_MONGO_PING_MS = float(os.getenv("READINESS_MONGO_PING_MS", "250"))
+READINESS_POOL_SATURATION = float(os.getenv("READINESS_POOL_SATURATION", "0.9"))
+READINESS_POOL_WAITERS = int(os.getenv("READINESS_POOL_WAITERS", "10"))
+READINESS_LOOP_LAG_MS = float(os.getenv("READINESS_LOOP_LAG_MS", "200"))
+READINESS_REQUIRE_ZOOM_TOKEN = os.getenv("READINESS_REQUIRE_ZOOM_TOKEN", "false").lower() == "true"
+
+
+class PoolUsage(monitoring.ConnectionPoolListener):
+    """Checked-out connections and queued check-outs per server, from pymongo pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked_out = defaultdict(int)
+        self.waiting = defaultdict(int)
+
+    def _add(self, counts, address, delta: int):
+        with self._lock:
+            counts[address] = max(0, counts[address] + delta)
+
+    def connection_check_out_started(self, event):
+        self._add(self.waiting, event.address, 1)
+
+    def connection_check_out_failed(self, event):
+        self._add(self.waiting, event.address, -1)
+
+    def connection_checked_out(self, event):
+        self._add(self.waiting, event.address, -1)
+        self._add(self.checked_out, event.address, 1)
+
+    def connection_checked_in(self, event):
+        self._add(self.checked_out, event.address, -1)
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.checked_out.pop(event.address, None)
+            self.waiting.pop(event.address, None)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def busiest(self):
+        """(checked out, waiting) on the busiest server."""
+        with self._lock:
+            addresses = set(self.checked_out) | set(self.waiting)
+            if not addresses:
+                return 0, 0
+            address = max(addresses, key=lambda a: (self.checked_out[a], self.waiting[a]))
+            return self.checked_out[address], self.waiting[address]
+
+
+async def check_mongo(db) -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), READINESS_TIMEOUT_SECONDS)
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    latency_ms = (time.perf_counter() - started) * 1000
+    return {"ok": latency_ms <= READINESS_MONGO_PING_MS, "latency_ms": round(latency_ms, 2),
+            "threshold_ms": READINESS_MONGO_PING_MS}
+
+
+def check_pool(pool_usage: PoolUsage, max_pool_size: int) -> dict:
+    checked_out, waiting = pool_usage.busiest()
+    saturation = checked_out / max_pool_size if max_pool_size else 0.0
+    return {
+        "ok": saturation < READINESS_POOL_SATURATION and waiting <= READINESS_POOL_WAITERS,
+        "checked_out": checked_out,
+        "max_pool_size": max_pool_size,
+        "saturation": round(saturation, 3),
+        "waiting": waiting,
+        "threshold_saturation": READINESS_POOL_SATURATION,
+        "threshold_waiting": READINESS_POOL_WAITERS,
+    }
+
+
+def check_event_loop(sampler) -> dict:
+    if not sampler.running:
+        return {"ok": False, "error": "loop lag sampler is not running"}
+    lag_ms = sampler.recent_max() * 1000
+    return {"ok": lag_ms <= READINESS_LOOP_LAG_MS, "lag_ms": round(lag_ms, 2), "last_lag_ms": round(sampler.last() * 1000, 2),
+            "threshold_ms": READINESS_LOOP_LAG_MS}
+
+
+def check_zoom_token(zoom_service) -> dict:
+    if not zoom_service.client_id:
+        return {"ok": True, "critical": False, "configured": False}
+    if not zoom_service.access_token:
+        return {"ok": not READINESS_REQUIRE_ZOOM_TOKEN, "critical": READINESS_REQUIRE_ZOOM_TOKEN, "configured": True,
+                "cached": False}
+    now = time.time()
+    valid = now < zoom_service.token_expires_at - zoom_service.token_buffer_seconds
+    return {
+        "ok": valid or not READINESS_REQUIRE_ZOOM_TOKEN,
+        "critical": READINESS_REQUIRE_ZOOM_TOKEN,
+        "configured": True,
+        "cached": True,
+        "valid": valid,
+        "age_seconds": round(now - zoom_service.token_obtained_at, 1),
+        "expires_in_seconds": round(zoom_service.token_expires_at - now, 1),
+    }
+
+
+async def readiness(db, pool_usage: PoolUsage, max_pool_size: int, sampler, zoom_service) -> dict:
+    checks = {
+        "mongo": await check_mongo(db),
+        "mongo_pool": check_pool(pool_usage, max_pool_size),
+        "event_loop": check_event_loop(sampler),
+        "zoom_token": check_zoom_token(zoom_service),
+    }
+    ready = all(check["ok"] for check in checks.values() if check.get("critical", True))
+    return {"status": "ready" if ready else "not_ready", "checks": checks}
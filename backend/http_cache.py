@@ -0,0 +1,190 @@
+"""
+Response compression and conditional GET.
+
+CompressionMiddleware gzips text and JSON responses of at least GZIP_MINIMUM_SIZE
+bytes for clients that accept it. Partial content, already-compressed media and
+anything served for ranged or attachment download (document downloads, whatever
+their type) go out untouched, since gzip would shift the byte offsets a resumed
+download asks for.
+
+Read endpoints send a strong ETag and answer a matching If-None-Match with 304
+before building the payload. Tags are derived from cheap version markers rather
+than the body: per-user counters in `resource_versions` that every write to the
+user's appointments or EMR bumps, or, for the doctor directory, a digest stored
+with the cached page. A gzipped body carries the tag with a `-gzip` suffix, since
+its bytes differ from the identity encoding.
+"""
+import hashlib
+import os
+import zlib
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from pymongo import UpdateOne
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+GZIP_COMPRESS_LEVEL = int(os.getenv("GZIP_COMPRESS_LEVEL", "6"))
+# Change to invalidate every client's cached representations, e.g. after a response shape change
+ETAG_SALT = os.getenv("ETAG_SALT", "1")
+GZIP_ETAG_SUFFIX = "-gzip"
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+PUBLIC_CACHE_CONTROL = "public, no-cache"
+
+DOCTOR_PROFILES_SCOPE = "doctor_profiles"
+
+
+def appointments_scope(user_id: str) -> str:
+    return f"appointments:{user_id}"
+
+
+def emr_scope(user_id: str) -> str:
+    return f"emr:{user_id}"
+
+
+def _compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+def _download(headers: Headers) -> bool:
+    """A response clients may fetch in byte ranges or save as a file; its bytes must match what it advertises."""
+    ranged = headers.get("accept-ranges", "none").strip().lower() != "none"
+    disposition = headers.get("content-disposition", "").split(";")[0].strip().lower()
+    return ranged or disposition == "attachment"
+
+
+class _GZipResponder:
+    """
+    Compresses one response, deciding from its start message and first body chunk.
+    Works on plain ASGI messages so it does not depend on Starlette's GZipResponder internals.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, compresslevel: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.send: Optional[Send] = None
+        self.start_message: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_gzip)
+
+    async def send_with_gzip(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = ("content-encoding" in headers or message["status"] == 206 or _download(headers)
+                                or not _compressible(headers.get("content-type", "")))
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # Held back until the first body chunk shows whether to compress
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._flush_start()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if len(body) < self.minimum_size and not more_body:
+                self.passthrough = True
+                await self._flush_start()
+                await self.send(message)
+                return
+            self.compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = "gzip"
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and etag.endswith('"'):
+                headers["ETag"] = etag[:-1] + GZIP_ETAG_SUFFIX + '"'
+            if more_body:
+                del headers["Content-Length"]
+
+        if more_body:
+            # Sync-flush each chunk so a streamed response reaches the client as it is produced
+            compressed = self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            compressed = self.compressor.compress(body) + self.compressor.flush()
+        if self.start_message is not None and not more_body:
+            MutableHeaders(raw=self.start_message["headers"])["Content-Length"] = str(len(compressed))
+        await self._flush_start()
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    async def _flush_start(self) -> None:
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            await self.send(start_message)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = GZIP_MINIMUM_SIZE, compresslevel: int = GZIP_COMPRESS_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+            responder = _GZipResponder(self.app, self.minimum_size, self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag for a representation identified by `parts` (route, caller, query, versions)."""
+    digest = hashlib.blake2b(repr((ETAG_SALT,) + parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def content_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def not_modified(request: Request, etag: str, cache_control: str = PRIVATE_CACHE_CONTROL) -> Optional[Response]:
+    """A 304 if the request's If-None-Match lists `etag` in either encoding, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    for tag in header.split(","):
+        tag = tag.strip()
+        candidate = tag[2:] if tag.startswith("W/") else tag
+        if candidate.endswith(GZIP_ETAG_SUFFIX + '"'):
+            candidate = candidate[:-len(GZIP_ETAG_SUFFIX) - 1] + '"'
+        if tag == "*" or candidate == etag:
+            # Echo the client's tag so a gzip representation keeps its suffix
+            return Response(status_code=304, headers={"ETag": tag if tag != "*" else etag, "Cache-Control": cache_control})
+    return None
+
+
+def cache_headers(etag: str, cache_control: str = PRIVATE_CACHE_CONTROL) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+class ResourceVersions:
+    """Version counters per scope, shared by all workers through MongoDB."""
+
+    def __init__(self, db):
+        self.collection = db.resource_versions
+
+    async def current(self, *scopes: str) -> Tuple[int, ...]:
+        versions = {}
+        async for doc in self.collection.find({"_id": {"$in": list(scopes)}}, {"version": 1}):
+            versions[doc["_id"]] = doc["version"]
+        return tuple(versions.get(scope, 0) for scope in scopes)
+
+    async def bump(self, scopes: Iterable[str]):
+        operations = [UpdateOne({"_id": scope}, {"$inc": {"version": 1}}, upsert=True) for scope in dict.fromkeys(scopes)]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
@@ -0,0 +1,345 @@
+"""
+Index and time-series collection declarations for every collection the API queries.
+
+Run as a script to create missing collections and indexes or check for drift:
+
+    python indexes.py            # ensure all declared indexes exist
+    python indexes.py --check    # report drift only, exit 1 if any
+    python indexes.py --resolve-duplicate-slots   # cancel double bookings, then ensure indexes
+
+Booking relies on doctor_slot_active_unique alone to reject double bookings, so
+SlotIndexGuard keeps the booking endpoint answering 503 until that index is
+verified. The index cannot be built while active appointments already share a
+(doctor, time) slot; ensure_indexes reports those, and --resolve-duplicate-slots
+cancels all but one booking per slot.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from models import ACTIVE_APPOINTMENT_STATUSES, AppointmentStatus
+from vitals_store import VITALS_COLLECTION, VITALS_GRANULARITY
+
+logger = logging.getLogger(__name__)
+
+ASCENDING = 1
+DESCENDING = -1
+
+# Options that change index behaviour and therefore count towards drift.
+COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+SLOT_INDEX_RECHECK_SECONDS = float(os.getenv("SLOT_INDEX_RECHECK_SECONDS", "30"))
+DUPLICATE_SLOT_REASON = "Duplicate booking of the same slot"
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    name: str
+    keys: List[Tuple[str, int]]
+    options: dict = {}
+
+
+class TimeSeriesSpec(NamedTuple):
+    collection: str
+    time_field: str
+    meta_field: str
+    granularity: str
+
+
+# Time-series collections must exist before their indexes are built or the first
+# insert lands, either of which would otherwise create a regular collection.
+TIMESERIES_SPECS = [
+    TimeSeriesSpec(VITALS_COLLECTION, "recorded_at", "patient_id", VITALS_GRANULARITY),
+]
+
+# At most one active appointment per doctor slot; booking relies on this to
+# reject double bookings atomically (partial $in filters need MongoDB 6.0+).
+SLOT_INDEX = IndexSpec(
+    "appointments", "doctor_slot_active_unique",
+    [("doctor_id", ASCENDING), ("appointment_datetime", ASCENDING)],
+    {"unique": True, "partialFilterExpression": {"status": {"$in": ACTIVE_APPOINTMENT_STATUSES}}},
+)
+
+INDEX_SPECS = [
+    # Login and registration look users up by email.
+    IndexSpec("users", "email_unique", [("email", ASCENDING)], {"unique": True}),
+    # The doctor search index loads every doctor user's name when it rebuilds.
+    IndexSpec("users", "role", [("role", ASCENDING)]),
+    # Profile endpoints resolve the caller's patient/doctor document by user_id.
+    IndexSpec("patients", "user_id_unique", [("user_id", ASCENDING)], {"unique": True}),
+    IndexSpec("doctors", "user_id_unique", [("user_id", ASCENDING)], {"unique": True}),
+    # List endpoints page with keyset cursors on (sort field, _id), so each
+    # per-owner index ends with both to serve every page from an index seek.
+    IndexSpec(
+        "appointments", "doctor_datetime_id",
+        [("doctor_id", ASCENDING), ("appointment_datetime", DESCENDING), ("_id", DESCENDING)],
+    ),
+    SLOT_INDEX,
+    IndexSpec(
+        "appointments", "patient_datetime_id",
+        [("patient_id", ASCENDING), ("appointment_datetime", DESCENDING), ("_id", DESCENDING)],
+    ),
+    # Time-series meta + time index; MongoDB 6.3+ creates it with the collection under this name.
+    IndexSpec(VITALS_COLLECTION, "patient_id_1_recorded_at_1", [("patient_id", ASCENDING), ("recorded_at", ASCENDING)]),
+    IndexSpec(
+        "prescriptions", "patient_created_at_id",
+        [("patient_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+    ),
+    IndexSpec(
+        "medical_documents", "patient_uploaded_at_id",
+        [("patient_id", ASCENDING), ("uploaded_at", DESCENDING), ("_id", DESCENDING)],
+    ),
+]
+
+
+def _normalize_keys(keys) -> list:
+    return [(field, int(direction)) if isinstance(direction, (int, float)) else (field, direction)
+            for field, direction in keys]
+
+
+def _compared_options(info: dict) -> dict:
+    return {option: info[option] for option in COMPARED_OPTIONS if option in info}
+
+
+def _spec_drift(spec: IndexSpec, info: dict) -> List[str]:
+    """Describe how an existing index differs from its declaration."""
+    problems = []
+    if _normalize_keys(info["key"]) != _normalize_keys(spec.keys):
+        problems.append(f"keys {_normalize_keys(info['key'])} != declared {spec.keys}")
+    actual_options = _compared_options(info)
+    declared_options = _compared_options(spec.options)
+    if actual_options != declared_options:
+        problems.append(f"options {actual_options} != declared {declared_options}")
+    return problems
+
+
+async def _collection_info(db, name: str):
+    cursor = await db.list_collections(filter={"name": name})
+    infos = await cursor.to_list(length=1)
+    return infos[0] if infos else None
+
+
+async def check_collections(db, specs: List[TimeSeriesSpec] = TIMESERIES_SPECS) -> List[str]:
+    """Report declared time-series collections that are missing or were created as regular collections."""
+    drift = []
+    for spec in specs:
+        info = await _collection_info(db, spec.collection)
+        if info is None:
+            drift.append(f"{spec.collection}: missing time-series collection")
+        elif info.get("type") != "timeseries":
+            drift.append(f"{spec.collection}: regular collection, declared as time-series")
+    return drift
+
+
+async def ensure_collections(db, specs: List[TimeSeriesSpec] = TIMESERIES_SPECS) -> List[str]:
+    """Create every declared time-series collection that does not exist yet. Returns remaining drift."""
+    for spec in specs:
+        if await _collection_info(db, spec.collection) is not None:
+            continue
+        try:
+            await db.create_collection(spec.collection, timeseries={
+                "timeField": spec.time_field,
+                "metaField": spec.meta_field,
+                "granularity": spec.granularity,
+            })
+        except (CollectionInvalid, OperationFailure) as e:
+            logger.error(f"Failed to create time-series collection {spec.collection}: {str(e)}")
+
+    drift = await check_collections(db, specs)
+    for message in drift:
+        logger.warning(f"Collection drift: {message}")
+    return drift
+
+
+async def check_indexes(db, specs: List[IndexSpec] = INDEX_SPECS) -> List[str]:
+    """Compare the live indexes against `specs` and return a list of drift messages."""
+    drift = []
+    declared_names = {}
+    for spec in specs:
+        declared_names.setdefault(spec.collection, set()).add(spec.name)
+
+    for collection_name, names in declared_names.items():
+        existing = await db[collection_name].index_information()
+        for spec in (s for s in specs if s.collection == collection_name):
+            info = existing.get(spec.name)
+            if info is None:
+                drift.append(f"{collection_name}.{spec.name}: missing")
+                continue
+            for problem in _spec_drift(spec, info):
+                drift.append(f"{collection_name}.{spec.name}: {problem}")
+        for name in existing:
+            if name != "_id_" and name not in names:
+                drift.append(f"{collection_name}.{name}: not declared")
+    return drift
+
+
+async def ensure_indexes(db, specs: List[IndexSpec] = INDEX_SPECS, rebuild_drifted: bool = False) -> List[str]:
+    """
+    Create every declared index that does not exist yet.
+    Indexes that exist under a declared name with a different definition are left
+    alone and reported, unless `rebuild_drifted` is set, in which case they are dropped
+    and recreated. Declared time-series collections are created first.
+    Returns the drift messages that remain.
+    """
+    collection_drift = await ensure_collections(db)
+    for spec in specs:
+        collection = db[spec.collection]
+        existing = await collection.index_information()
+        info = existing.get(spec.name)
+        if spec is SLOT_INDEX and info is None:
+            duplicates = await find_duplicate_slots(db)
+            if duplicates:
+                for duplicate in duplicates:
+                    logger.error(f"Duplicate active bookings for doctor {duplicate['doctor_id']} at "
+                                 f"{duplicate['appointment_datetime']}: {[str(_id) for _id in duplicate['ids']]}")
+                logger.error(f"Cannot build {spec.collection}.{spec.name} over {len(duplicates)} double-booked "
+                             f"slots; run `python indexes.py --resolve-duplicate-slots`")
+                continue
+        if info is not None and _spec_drift(spec, info):
+            if not rebuild_drifted:
+                continue
+            logger.warning(f"Rebuilding drifted index {spec.collection}.{spec.name}")
+            await collection.drop_index(spec.name)
+        try:
+            await collection.create_index(spec.keys, name=spec.name, **spec.options)
+        except OperationFailure as e:
+            logger.error(f"Failed to create index {spec.collection}.{spec.name}: {str(e)}")
+
+    drift = await check_indexes(db, specs)
+    for message in drift:
+        logger.warning(f"Index drift: {message}")
+    return collection_drift + drift
+
+
+async def find_duplicate_slots(db) -> List[dict]:
+    """Slots held by more than one active appointment, each with its appointment ids oldest first."""
+    pipeline = [
+        {"$match": {"status": {"$in": ACTIVE_APPOINTMENT_STATUSES}}},
+        {"$sort": {"_id": ASCENDING}},
+        {"$group": {
+            "_id": {"doctor_id": "$doctor_id", "appointment_datetime": "$appointment_datetime"},
+            "ids": {"$push": "$_id"},
+            "paid": {"$push": {"$eq": ["$payment_status", "completed"]}},
+        }},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ]
+    return [
+        {**group["_id"], "ids": group["ids"], "paid": group["paid"]}
+        async for group in db.appointments.aggregate(pipeline)
+    ]
+
+
+async def resolve_duplicate_slots(db) -> int:
+    """
+    Cancel all but one active appointment per double-booked slot: the oldest paid
+    booking if there is one, otherwise the oldest. Returns the number cancelled.
+    """
+    cancelled = 0
+    for duplicate in await find_duplicate_slots(db):
+        ids, paid = duplicate["ids"], duplicate["paid"]
+        keep = ids[paid.index(True)] if True in paid else ids[0]
+        losers = [_id for _id in ids if _id != keep]
+        result = await db.appointments.update_many(
+            {"_id": {"$in": losers}, "status": {"$in": ACTIVE_APPOINTMENT_STATUSES}},
+            {"$set": {"status": AppointmentStatus.CANCELLED.value, "cancellation_reason": DUPLICATE_SLOT_REASON}},
+        )
+        cancelled += result.modified_count
+        logger.warning(f"Kept appointment {keep} for doctor {duplicate['doctor_id']} at "
+                       f"{duplicate['appointment_datetime']}; cancelled {[str(_id) for _id in losers]}")
+    return cancelled
+
+
+async def slot_index_problem(db) -> Optional[str]:
+    """Why doctor_slot_active_unique cannot be relied on, or None if it is in place as declared."""
+    existing = await db[SLOT_INDEX.collection].index_information()
+    info = existing.get(SLOT_INDEX.name)
+    if info is None:
+        return f"{SLOT_INDEX.collection}.{SLOT_INDEX.name} is missing"
+    drift = _spec_drift(SLOT_INDEX, info)
+    if drift:
+        return f"{SLOT_INDEX.collection}.{SLOT_INDEX.name}: {'; '.join(drift)}"
+    return None
+
+
+class SlotGuardUnavailable(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                         detail="Booking is temporarily unavailable. Please try again later.")
+
+
+class SlotIndexGuard:
+    """
+    Whether the slot index is verified. Until it is, `require()` raises a 503 and
+    re-checks at most every SLOT_INDEX_RECHECK_SECONDS, so booking resumes without a
+    restart once an operator builds the index.
+    """
+
+    def __init__(self, db, recheck_seconds: float = SLOT_INDEX_RECHECK_SECONDS):
+        self.db = db
+        self.recheck_seconds = recheck_seconds
+        self.verified = False
+        self._checked_at: Optional[float] = None
+
+    async def check(self) -> bool:
+        problem = await slot_index_problem(self.db)
+        self._checked_at = time.monotonic()
+        self.verified = problem is None
+        if problem:
+            logger.error(f"Booking disabled: {problem}")
+        return self.verified
+
+    async def require(self):
+        if self.verified:
+            return
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.recheck_seconds:
+            try:
+                if await self.check():
+                    return
+            except Exception as e:
+                logger.error(f"Error checking slot index: {str(e)}")
+        raise SlotGuardUnavailable()
+
+
+async def main(check_only: bool, rebuild_drifted: bool, resolve_duplicates: bool = False) -> int:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if check_only:
+            drift = await check_collections(db) + await check_indexes(db)
+            duplicates = await find_duplicate_slots(db)
+            if duplicates:
+                drift.append(f"appointments: {len(duplicates)} double-booked slots")
+        else:
+            if resolve_duplicates:
+                print(f"Cancelled {await resolve_duplicate_slots(db)} duplicate bookings.")
+            drift = await ensure_indexes(db, rebuild_drifted=rebuild_drifted)
+    finally:
+        client.close()
+
+    for message in drift:
+        print(f"DRIFT {message}")
+    if not drift:
+        print("All declared collections and indexes are in place.")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Create and verify NAVHIM MongoDB indexes.")
+    parser.add_argument("--check", action="store_true", help="only report drift, do not create anything")
+    parser.add_argument("--rebuild-drifted", action="store_true",
+                        help="drop and recreate declared indexes whose definition has drifted")
+    parser.add_argument("--resolve-duplicate-slots", action="store_true",
+                        help="cancel all but one active appointment per double-booked slot before building indexes")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.check, args.rebuild_drifted, args.resolve_duplicate_slots)))
@@ -0,0 +1,69 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from projections import DOCTOR_SUMMARY, USER_NAME
+
+
+def _object_ids(ids) -> list:
+    """Convert string ids to ObjectIds, dropping blanks and malformed values."""
+    object_ids = set()
+    for value in ids:
+        if not value:
+            continue
+        try:
+            object_ids.add(ObjectId(value))
+        except (InvalidId, TypeError):
+            continue
+    return list(object_ids)
+
+
+async def load_by_ids(collection, ids, projection: dict = None) -> dict:
+    """Fetch every document whose _id is in `ids` with a single $in query, keyed by string id."""
+    object_ids = _object_ids(ids)
+    if not object_ids:
+        return {}
+    cursor = collection.find({"_id": {"$in": object_ids}}, projection)
+    docs = await cursor.to_list(length=len(object_ids))
+    return {str(doc["_id"]): doc for doc in docs}
+
+
+async def load_users(db, user_ids, projection: dict = USER_NAME) -> dict:
+    """Fetch users by id; only their names unless another projection is given."""
+    return await load_by_ids(db.users, user_ids, projection)
+
+
+async def load_doctors(db, doctor_ids, projection: dict = DOCTOR_SUMMARY) -> dict:
+    """Fetch doctors by id; only user_id and specialization unless another projection is given."""
+    return await load_by_ids(db.doctors, doctor_ids, projection)
+
+
+async def load_appointment_participants(db, appointments: list):
+    """
+    Resolve the doctor, doctor user and patient user for a page of appointments.
+    Always two round trips (doctors, then users) regardless of page size.
+    """
+    doctors = await load_doctors(db, {appt["doctor_id"] for appt in appointments})
+    user_ids = {appt["patient_id"] for appt in appointments}
+    user_ids.update(doctor["user_id"] for doctor in doctors.values())
+    users = await load_users(db, user_ids)
+    return doctors, users
+
+
+def user_name(user: dict) -> dict:
+    """First/last name of a user document, blank when the user is missing."""
+    return {
+        "first_name": user["first_name"] if user else "",
+        "last_name": user["last_name"] if user else ""
+    }
+
+
+def participant_details(appointment: dict, doctors: dict, users: dict):
+    """Build the patient_details/doctor_details pair for an appointment from preloaded maps."""
+    patient_user = users.get(appointment["patient_id"])
+    doctor = doctors.get(appointment["doctor_id"])
+    doctor_user = users.get(doctor["user_id"]) if doctor else None
+
+    patient_details = user_name(patient_user)
+    doctor_details = user_name(doctor_user)
+    doctor_details["specialization"] = doctor.get("specialization", "") if doctor else ""
+    return patient_details, doctor_details
@@ -0,0 +1,168 @@
+"""
+Event-loop lag sampling and blocking-call detection.
+
+LoopLagSampler wakes every LOOP_LAG_INTERVAL_SECONDS and records how late it woke
+up. A late wake-up means something held the loop: a CPU-bound handler or a
+blocking call. Samples feed the event_loop_lag_* metrics, and the readiness probe
+fails when recent lag passes its threshold.
+
+BlockingCallDetector is a watchdog thread that catches the culprit in the act. It
+schedules a no-op on the loop every LOOP_BLOCK_THRESHOLD_MS; if the loop has not
+run it within another LOOP_BLOCK_THRESHOLD_MS, it captures the loop thread's stack
+(the handler still blocking) and, once the loop is free again, logs it with a lower
+bound on how long the loop was held. Each distinct blocking site is logged at most once per
+LOOP_BLOCK_LOG_INTERVAL_SECONDS; every block counts towards event_loop_blocks_total.
+The detector is off unless LOOP_BLOCK_DETECTION=true.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG, EVENT_LOOP_LAG_SAMPLES
+
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.25"))
+LOOP_LAG_WINDOW = int(os.getenv("LOOP_LAG_WINDOW", "8"))
+LOOP_BLOCK_DETECTION = os.getenv("LOOP_BLOCK_DETECTION", "false").lower() == "true"
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+LOOP_BLOCK_LOG_INTERVAL_SECONDS = float(os.getenv("LOOP_BLOCK_LOG_INTERVAL_SECONDS", "60"))
+LOOP_BLOCK_STACK_DEPTH = int(os.getenv("LOOP_BLOCK_STACK_DEPTH", "25"))
+
+# Frames from this directory are ours; the innermost one names the blocking site
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagSampler:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS, window: int = LOOP_LAG_WINDOW):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.samples.append(lag)
+            EVENT_LOOP_LAG.set(lag)
+            EVENT_LOOP_LAG_SAMPLES.observe(lag)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def last(self) -> float:
+        """Lag of the latest sample, in seconds."""
+        return self.samples[-1] if self.samples else 0.0
+
+    def recent_max(self) -> float:
+        """Worst lag over the last `window` samples, in seconds."""
+        return max(self.samples, default=0.0)
+
+
+def blocking_site(frames) -> str:
+    """`file:line in function` of the innermost application frame, else of the innermost frame."""
+    if not frames:
+        return "unknown"
+    site = next((frame for frame in reversed(frames) if frame.filename.startswith(APP_DIR)), frames[-1])
+    filename = site.filename
+    if filename.startswith(APP_DIR):
+        filename = os.path.relpath(filename, APP_DIR)
+    return f"{filename}:{site.lineno} in {site.name}"
+
+
+class BlockingCallDetector:
+    def __init__(self, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS,
+                 log_interval: float = LOOP_BLOCK_LOG_INTERVAL_SECONDS, stack_depth: int = LOOP_BLOCK_STACK_DEPTH):
+        self.threshold = threshold_ms / 1000
+        self.log_interval = log_interval
+        self.stack_depth = stack_depth
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        # blocking site -> (last logged at, blocks since then)
+        self._reported: Dict[str, Tuple[float, int]] = {}
+
+    def start(self):
+        """Start watching the running loop; call from the loop's thread."""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-block-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout=self.threshold * 2 + 1)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _watch(self):
+        while not self._stopping.wait(self.threshold):
+            answered = threading.Event()
+            sent = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:
+                # Loop closed underneath us
+                return
+            if answered.wait(self.threshold):
+                continue
+
+            frames = self._loop_stack()
+            while not answered.wait(self.threshold):
+                if self._stopping.is_set():
+                    return
+            self._report(frames, time.monotonic() - sent)
+
+    def _loop_stack(self):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return []
+        return traceback.extract_stack(frame, limit=self.stack_depth)
+
+    def _report(self, frames, blocked_for: float):
+        EVENT_LOOP_BLOCKS.inc()
+        site = blocking_site(frames)
+        now = time.monotonic()
+        last_logged, suppressed = self._reported.get(site, (None, 0))
+        if last_logged is not None and now - last_logged < self.log_interval:
+            self._reported[site] = (last_logged, suppressed + 1)
+            return
+        self._reported[site] = (now, 0)
+        stack = "".join(traceback.format_list(frames))
+        repeats = f" ({suppressed} more since last report)" if suppressed else ""
+        logger.warning(f"Event loop blocked for at least {blocked_for * 1000:.0f} ms at {site}{repeats}\n{stack}")
+
+
+loop_lag = LoopLagSampler()
+blocking_detector = BlockingCallDetector()
@@ -0,0 +1,202 @@
+"""
+Prometheus metrics, served on /metrics.
+
+- MetricsMiddleware labels every request with its route template (`/api/doctors/{doctor_id}`,
+  never the raw path) and records latency, in-flight requests and status codes.
+- MongoCommandMetrics is a pymongo command listener recording every database command
+  by collection, command and the route template that issued it. A handler that runs
+  N+1 queries shows up as a high mongo_operations_total rate relative to its requests.
+- track_outbound times calls to Zoom and Razorpay.
+- event_loop_* series come from loop_monitor: sampled loop lag, and the number of
+  callbacks caught blocking the loop.
+- cache_* series are read from each registered in-process cache's stats() at scrape time.
+
+Metrics are kept per process; with several workers, scrape each one.
+"""
+import functools
+import time
+from contextvars import ContextVar
+from typing import Iterable
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+from starlette.types import Receive, Scope, Send
+
+REGISTRY = CollectorRegistry()
+
+HTTP_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status code",
+    ["method", "route", "status"], registry=REGISTRY,
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route"], buckets=HTTP_LATENCY_BUCKETS, registry=REGISTRY,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served",
+    ["method", "route"], registry=REGISTRY,
+)
+MONGO_OPERATIONS = Counter(
+    "mongo_operations_total", "MongoDB commands by collection, command and issuing route",
+    ["collection", "command", "handler", "outcome"], registry=REGISTRY,
+)
+MONGO_LATENCY = Histogram(
+    "mongo_operation_duration_seconds", "MongoDB command latency by collection, command and issuing route",
+    ["collection", "command", "handler"], buckets=MONGO_LATENCY_BUCKETS, registry=REGISTRY,
+)
+OUTBOUND_LATENCY = Histogram(
+    "outbound_request_duration_seconds", "Latency of calls to external services",
+    ["service", "operation", "outcome"], buckets=HTTP_LATENCY_BUCKETS, registry=REGISTRY,
+)
+EVENT_LOOP_LAG = Gauge(
+    "event_loop_lag_seconds", "Event-loop lag at the latest sample", registry=REGISTRY,
+)
+EVENT_LOOP_LAG_SAMPLES = Histogram(
+    "event_loop_lag_sample_seconds", "Distribution of sampled event-loop lag",
+    buckets=LOOP_LAG_BUCKETS, registry=REGISTRY,
+)
+EVENT_LOOP_BLOCKS = Counter(
+    "event_loop_blocks_total", "Callbacks that held the event loop past the blocking threshold",
+    registry=REGISTRY,
+)
+
+# Route template of the request being served; work outside a request is "background"
+current_handler: ContextVar[str] = ContextVar("current_handler", default="background")
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(routes: Iterable, scope: Scope) -> str:
+    """The path template of the route serving `scope`, or UNMATCHED_ROUTE so stray paths share one label."""
+    path, method = scope["path"], scope["method"]
+    partial = None
+    for route in routes:
+        # Only the path regex and method set; Route.matches also builds path params we do not need
+        regex = getattr(route, "path_regex", None)
+        if regex is None or not regex.match(path):
+            continue
+        methods = getattr(route, "methods", None)
+        if not methods or method in methods:
+            return route.path
+        if partial is None:
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    def __init__(self, app, routes: Iterable):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.routes, scope)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = current_handler.set(route)
+        in_flight = HTTP_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            in_flight.dec()
+            current_handler.reset(token)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Records each command's latency as reported by the driver. Motor runs commands on
+    its executor with the caller's context copied, so current_handler is the route
+    that issued the command.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = "-"
+        self._pending[(event.connection_id, event.request_id)] = (collection, current_handler.get())
+
+    def succeeded(self, event):
+        self._record(event, "success")
+
+    def failed(self, event):
+        self._record(event, "failure")
+
+    def _record(self, event, outcome: str):
+        collection, handler = self._pending.pop((event.connection_id, event.request_id), ("-", current_handler.get()))
+        MONGO_OPERATIONS.labels(collection, event.command_name, handler, outcome).inc()
+        MONGO_LATENCY.labels(collection, event.command_name, handler).observe(event.duration_micros / 1_000_000)
+
+
+def track_outbound(service: str, operation: str):
+    """Decorator timing an async call to an external service, labelled by outcome."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                outcome = "success"
+                return result
+            finally:
+                OUTBOUND_LATENCY.labels(service, operation, outcome).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class CacheStatsCollector:
+    """Exports the stats() of in-process caches: lookups by result, invalidations and entry count."""
+
+    def __init__(self):
+        self.caches = {}
+
+    def register(self, name: str, cache):
+        self.caches[name] = cache
+
+    def collect(self):
+        lookups = CounterMetricFamily("cache_lookups", "In-process cache lookups by result", labels=["cache", "result"])
+        invalidations = CounterMetricFamily("cache_invalidations", "In-process cache invalidations", labels=["cache"])
+        entries = GaugeMetricFamily("cache_entries", "Entries held by an in-process cache", labels=["cache"])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            lookups.add_metric([name, "hit"], stats["hits"])
+            lookups.add_metric([name, "miss"], stats["misses"])
+            if "invalidations" in stats:
+                invalidations.add_metric([name], stats["invalidations"])
+            entries.add_metric([name], stats["entries"])
+        yield lookups
+        yield invalidations
+        yield entries
+
+
+CACHE_STATS = CacheStatsCollector()
+REGISTRY.register(CACHE_STATS)
+
+
+def render_metrics() -> tuple:
+    """(body, content type) of the current metrics in the Prometheus text format."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
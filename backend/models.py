@@ -19,6 +19,13 @@ class AppointmentStatus(str, Enum):
     CANCELLED = "cancelled"
     IN_PROGRESS = "in_progress"
 
+# Statuses that hold a doctor's time slot
+ACTIVE_APPOINTMENT_STATUSES = [
+    AppointmentStatus.SCHEDULED.value,
+    AppointmentStatus.IN_PROGRESS.value,
+    AppointmentStatus.COMPLETED.value,
+]
+
 class AppointmentType(str, Enum):
     VIDEO = "video"
     IN_PERSON = "in_person"
@@ -187,6 +194,10 @@ class VitalsCreate(BaseModel):
     oxygen_saturation: Optional[int] = None
     notes: Optional[str] = None
 
+class VitalsReading(VitalsCreate):
+    """A device reading uploaded in bulk, timestamped by the client."""
+    recorded_at: datetime
+
 class VitalsResponse(BaseModel):
     id: str
     patient_id: str
@@ -224,6 +235,7 @@ class MedicalDocument(BaseModel):
     document_type: str
     document_name: str
     document_data: str  # base64 encoded
+    content_type: Optional[str] = None
     description: Optional[str] = None
 
 class MedicalDocumentResponse(BaseModel):
@@ -232,8 +244,10 @@ class MedicalDocumentResponse(BaseModel):
     uploaded_by: str
     document_type: str
     document_name: str
-    document_data: str
+    content_type: str
+    size: Optional[int] = None
     description: Optional[str] = None
+    download_url: str
     uploaded_at: datetime
 
 class EMRRecord(BaseModel):
@@ -0,0 +1,116 @@
+"""
+Keyset (cursor) pagination over a sort field with `_id` as the tie-breaker.
+
+A cursor is the opaque, URL-safe encoding of the last row's (sort value, _id).
+The next page is fetched with a range condition on those values, so every page
+costs the same index seek no matter how deep it is. Cursors come from the client,
+so decoded values are checked to be plain scalars before they reach a filter; a
+crafted cursor carrying an operator document is rejected with a 400.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+# Types a sort value may decode to; None is a row missing the sort field
+CURSOR_VALUE_TYPES = (str, int, float, datetime, ObjectId, type(None))
+
+
+class InvalidCursor(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+
+def encode_cursor(sort_value, last_id) -> str:
+    payload = json_util.dumps({"v": sort_value, "id": last_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _scalar(value) -> bool:
+    return isinstance(value, CURSOR_VALUE_TYPES) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str) -> Tuple[object, ObjectId]:
+    """
+    (sort value, last _id) of a cursor. The sort value is a scalar, or a flat list of
+    scalars for composite keys; the _id is an ObjectId.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        value, last_id = payload["v"], payload["id"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError, InvalidId, json.JSONDecodeError):
+        raise InvalidCursor()
+    if not isinstance(last_id, ObjectId):
+        raise InvalidCursor()
+    if not (_scalar(value) or (isinstance(value, list) and all(_scalar(item) for item in value))):
+        raise InvalidCursor()
+    return value, last_id
+
+
+def keyset_filter(sort_field: str, cursor: str, direction: int = -1) -> dict:
+    """Filter selecting the rows that come after `cursor` in (sort_field, _id) order."""
+    value, last_id = decode_cursor(cursor)
+    if isinstance(value, list):
+        raise InvalidCursor()
+    op = "$lt" if direction < 0 else "$gt"
+    if sort_field == "_id":
+        return {"_id": {op: last_id}}
+    return {"$or": [
+        {sort_field: {op: value}},
+        {sort_field: value, "_id": {op: last_id}},
+    ]}
+
+
+def sort_spec(sort_field: str, direction: int = -1) -> list:
+    if sort_field == "_id":
+        return [("_id", direction)]
+    return [(sort_field, direction), ("_id", direction)]
+
+
+def page_query(query: dict, sort_field: str, cursor: Optional[str] = None, direction: int = -1) -> dict:
+    if not cursor:
+        return query
+    keyset = keyset_filter(sort_field, cursor, direction)
+    return {"$and": [query, keyset]} if query else keyset
+
+
+def split_page(docs: list, sort_field: str, limit: int):
+    """Trim the lookahead row fetched past `limit`; returns (docs, next_cursor)."""
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["_id"])
+    return docs, next_cursor
+
+
+async def fetch_page(collection, query: dict, sort_field: str, limit: int, cursor: Optional[str] = None,
+                     projection: dict = None, direction: int = -1):
+    """
+    Fetch one page of `collection` matching `query`, ordered by (sort_field, _id).
+    Returns (docs, next_cursor); next_cursor is None on the last page.
+    """
+    query = page_query(query, sort_field, cursor, direction)
+    docs = await collection.find(query, projection).sort(sort_spec(sort_field, direction)).limit(limit + 1).to_list(length=limit + 1)
+    return split_page(docs, sort_field, limit)
+
+
+def page_stages(query: dict, sort_field: str, limit: int, cursor: Optional[str] = None, direction: int = -1) -> list:
+    """
+    Aggregation stages selecting the same page as fetch_page (plus its lookahead row).
+    Stages appended after these must keep `_id` and `sort_field` for split_page.
+    """
+    return [
+        {"$match": page_query(query, sort_field, cursor, direction)},
+        {"$sort": dict(sort_spec(sort_field, direction))},
+        {"$limit": limit + 1},
+    ]
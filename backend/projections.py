@@ -0,0 +1,55 @@
+"""
+Field projections for every read the API makes, one per response shape.
+Reads should name the projection for what they serialize instead of pulling whole
+documents (password hashes, availability arrays, document payloads).
+"""
+
+
+def fields(*names: str) -> dict:
+    return {name: 1 for name in names}
+
+
+# users
+USER_NAME = fields("first_name", "last_name")
+USER_CONTACT = fields("first_name", "last_name", "email")
+USER_PROFILE = fields(
+    "email", "role", "first_name", "last_name", "phone", "date_of_birth", "gender", "profile_image", "created_at"
+)
+USER_LOGIN = {**USER_PROFILE, "password": 1}
+ID_ONLY = {"_id": 1}
+
+# patients
+PATIENT_PROFILE = fields(
+    "user_id", "navhim_card_number", "blood_group", "allergies",
+    "emergency_contact_name", "emergency_contact_phone", "created_at"
+)
+
+# doctors
+DOCTOR_SUMMARY = fields("user_id", "specialization")
+DOCTOR_BOOKING = fields("user_id", "specialization", "consultation_fee")
+DOCTOR_CARD = fields(
+    "user_id", "specialization", "qualifications", "experience", "consultation_fee", "rating", "bio", "verified"
+)
+DOCTOR_DETAIL = {**DOCTOR_CARD, **fields("availability", "created_at")}
+DOCTOR_AVAILABILITY = fields("availability")
+
+# appointments
+# The appointment feed projects its own response shape (see appointment_feed.py)
+APPOINTMENT_PAYMENT = fields("patient_id", "doctor_id", "appointment_datetime", "appointment_type")
+BOOKED_SLOT = {"_id": 0, "appointment_datetime": 1}
+BOOKED_SLOTS_BY_DOCTOR = {"_id": 0, "doctor_id": 1, "appointment_datetime": 1}
+APPOINTMENT_CANCEL = fields("patient_id", "doctor_id", "appointment_datetime", "status")
+
+# EMR
+VITALS = fields(
+    "patient_id", "recorded_by", "blood_pressure_systolic", "blood_pressure_diastolic", "heart_rate",
+    "temperature", "weight", "height", "blood_sugar", "oxygen_saturation", "notes", "recorded_at"
+)
+PRESCRIPTION = fields(
+    "patient_id", "doctor_id", "appointment_id", "medications", "diagnosis", "notes", "created_at"
+)
+DOCUMENT_METADATA = fields(
+    "patient_id", "uploaded_by", "document_type", "document_name", "content_type", "size", "description",
+    "uploaded_at"
+)
+DOCUMENT_DOWNLOAD = {**DOCUMENT_METADATA, **fields("file_id", "document_data")}
@@ -0,0 +1,189 @@
+"""
+Per-request database query budget.
+
+QueryBudgetListener attributes every MongoDB command to the request that issued it
+(motor runs commands with the caller's context, so a contextvar set by the
+middleware is visible to the listener). QueryBudgetMiddleware logs one structured
+`slow_request` warning for any request that made more than QUERY_BUDGET_COUNT
+commands, spent more than QUERY_BUDGET_DB_MS in the database, or took longer than
+SLOW_REQUEST_MS overall. The log line lists the request's query shapes (filters
+and pipelines with every value replaced by "?") grouped with their counts, so an
+N+1 loop shows up as one shape repeated N times.
+
+The middleware must sit inside MetricsMiddleware, which sets the route template.
+"""
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, NamedTuple, Optional
+
+from pymongo import monitoring
+from starlette.types import Receive, Scope, Send
+
+from metrics import current_handler
+
+QUERY_BUDGET_COUNT = int(os.getenv("QUERY_BUDGET_COUNT", "25"))
+QUERY_BUDGET_DB_MS = float(os.getenv("QUERY_BUDGET_DB_MS", "250"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+MAX_LOGGED_SHAPES = 20
+MAX_SHAPE_LENGTH = 500
+
+# Where each command keeps its filter or pipeline
+SHAPE_FIELDS = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "update": "updates",
+    "delete": "deletes",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def query_shape(value):
+    """`value` with every literal replaced by "?"; operators, field names and stage structure are kept."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [query_shape(item) for item in value]
+    return "?"
+
+
+class CommandRecord(NamedTuple):
+    command: str
+    collection: str
+    duration_ms: float
+    # The filter or pipeline, shaped only if the request ends up being logged
+    query: object
+
+
+class RequestQueries:
+    def __init__(self):
+        # list.append is atomic, so commands finishing on executor threads can record concurrently
+        self.commands: List[CommandRecord] = []
+
+    def record(self, record: CommandRecord):
+        self.commands.append(record)
+
+    @property
+    def db_ms(self) -> float:
+        return sum(record.duration_ms for record in self.commands)
+
+    def slowest(self) -> Optional[CommandRecord]:
+        return max(self.commands, key=lambda record: record.duration_ms, default=None)
+
+    def shapes(self) -> List[dict]:
+        """Distinct command shapes, most frequent first."""
+        grouped: Dict[tuple, dict] = {}
+        for record in self.commands:
+            if record.command in ("update", "delete"):
+                # Bulk writes: the first statement stands for the batch
+                query = record.query[:1] if isinstance(record.query, list) else record.query
+            else:
+                query = record.query
+            shape = query_shape(query) if query is not None else None
+            encoded = json.dumps(shape, default=str)
+            if len(encoded) > MAX_SHAPE_LENGTH:
+                shape = encoded[:MAX_SHAPE_LENGTH] + "..."
+            entry = grouped.setdefault((record.command, record.collection, encoded), {
+                "command": record.command, "collection": record.collection, "shape": shape, "count": 0, "db_ms": 0.0,
+            })
+            entry["count"] += 1
+            entry["db_ms"] += record.duration_ms
+        for entry in grouped.values():
+            entry["db_ms"] = round(entry["db_ms"], 2)
+        return sorted(grouped.values(), key=lambda entry: (-entry["count"], -entry["db_ms"]))[:MAX_LOGGED_SHAPES]
+
+
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_queries", default=None)
+
+
+class QueryBudgetListener(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        queries = current_queries.get()
+        if queries is None:
+            return
+        collection = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        field = SHAPE_FIELDS.get(event.command_name)
+        self._pending[(event.connection_id, event.request_id)] = (
+            queries,
+            collection if isinstance(collection, str) else "-",
+            event.command.get(field) if field else None,
+        )
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        queries, collection, query = pending
+        queries.record(CommandRecord(event.command_name, collection, event.duration_micros / 1000, query))
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_queries.reset(token)
+            duration_ms = (time.perf_counter() - started) * 1000
+            exceeded = []
+            if len(queries.commands) > QUERY_BUDGET_COUNT:
+                exceeded.append("query_count")
+            if queries.db_ms > QUERY_BUDGET_DB_MS:
+                exceeded.append("db_time")
+            if duration_ms > SLOW_REQUEST_MS:
+                exceeded.append("latency")
+            if exceeded:
+                self._log(scope, status_code, duration_ms, queries, exceeded)
+
+    @staticmethod
+    def _log(scope: Scope, status_code: int, duration_ms: float, queries: RequestQueries, exceeded: List[str]):
+        slowest = queries.slowest()
+        line = {
+            "event": "slow_request",
+            "method": scope["method"],
+            "route": current_handler.get(),
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "queries": len(queries.commands),
+            "db_ms": round(queries.db_ms, 2),
+            "exceeded": exceeded,
+            "slowest": {
+                "command": slowest.command,
+                "collection": slowest.collection,
+                "db_ms": round(slowest.duration_ms, 2),
+            } if slowest else None,
+            "query_shapes": queries.shapes(),
+        }
+        logger.warning(f"Slow request: {json.dumps(line)}")
@@ -1,49 +1,51 @@
 import razorpay
+import httpx
+import asyncio
 import hmac
 import hashlib
 import os
 import logging
+from typing import Optional
+
+from metrics import track_outbound
 
 logger = logging.getLogger(__name__)
 
-class RazorpayService:
+RAZORPAY_API_BASE_URL = os.getenv("RAZORPAY_API_BASE_URL", "https://api.razorpay.com/v1")
+RAZORPAY_MAX_CONCURRENCY = int(os.getenv("RAZORPAY_MAX_CONCURRENCY", "10"))
+RAZORPAY_TIMEOUT_SECONDS = float(os.getenv("RAZORPAY_TIMEOUT_SECONDS", "10"))
+
+def build_order_data(amount: float, currency: str = "INR", receipt: str = None) -> dict:
+    """Order request body; amount is in rupees and is converted to paise."""
+    order_data = {
+        "amount": int(amount * 100),
+        "currency": currency,
+        "payment_capture": 1
+    }
+    if receipt:
+        order_data["receipt"] = receipt
+    return order_data
+
+def compute_payment_signature(key_secret: str, order_id: str, payment_id: str) -> str:
+    """Signature Razorpay attaches to a successful checkout for the given order and payment."""
+    return hmac.new(
+        key_secret.encode(),
+        f"{order_id}|{payment_id}".encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+class RazorpayServiceBase:
+    """Credentials and the local signature check shared by the sync and async clients."""
     def __init__(self):
         self.key_id = os.getenv("RAZORPAY_KEY_ID")
         self.key_secret = os.getenv("RAZORPAY_KEY_SECRET")
-        self.client = razorpay.Client(auth=(self.key_id, self.key_secret))
-    
-    def create_order(self, amount: float, currency: str = "INR", receipt: str = None) -> dict:
-        """
-        Create a Razorpay order.
-        Amount should be in rupees, will be converted to paise.
-        """
-        try:
-            amount_in_paise = int(amount * 100)
-            order_data = {
-                "amount": amount_in_paise,
-                "currency": currency,
-                "payment_capture": 1
-            }
-            if receipt:
-                order_data["receipt"] = receipt
-            
-            order = self.client.order.create(data=order_data)
-            logger.info(f"Created Razorpay order: {order['id']}")
-            return order
-        except Exception as e:
-            logger.error(f"Error creating Razorpay order: {str(e)}")
-            raise
     
     def verify_payment_signature(self, order_id: str, payment_id: str, signature: str) -> bool:
         """
         Verify the payment signature from Razorpay.
         """
         try:
-            generated_signature = hmac.new(
-                self.key_secret.encode(),
-                f"{order_id}|{payment_id}".encode(),
-                hashlib.sha256
-            ).hexdigest()
+            generated_signature = compute_payment_signature(self.key_secret, order_id, payment_id)
             
             is_valid = hmac.compare_digest(generated_signature, signature)
             if is_valid:
@@ -54,6 +56,24 @@ class RazorpayService:
         except Exception as e:
             logger.error(f"Error verifying payment signature: {str(e)}")
             return False
+
+class RazorpayService(RazorpayServiceBase):
+    def __init__(self):
+        super().__init__()
+        self.client = razorpay.Client(auth=(self.key_id, self.key_secret))
+    
+    def create_order(self, amount: float, currency: str = "INR", receipt: str = None) -> dict:
+        """
+        Create a Razorpay order.
+        Amount should be in rupees, will be converted to paise.
+        """
+        try:
+            order = self.client.order.create(data=build_order_data(amount, currency, receipt))
+            logger.info(f"Created Razorpay order: {order['id']}")
+            return order
+        except Exception as e:
+            logger.error(f"Error creating Razorpay order: {str(e)}")
+            raise
     
     def get_payment_details(self, payment_id: str) -> dict:
         """Get details of a payment."""
@@ -63,3 +83,61 @@ class RazorpayService:
         except Exception as e:
             logger.error(f"Error fetching payment details: {str(e)}")
             raise
+
+
+class AsyncRazorpayService(RazorpayServiceBase):
+    """
+    Non-blocking Razorpay client for use inside request handlers.
+    Calls the REST API over one pooled keep-alive connection set and allows at most
+    RAZORPAY_MAX_CONCURRENCY requests in flight; signature checks stay local.
+    """
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        super().__init__()
+        self.api_base_url = RAZORPAY_API_BASE_URL
+        self._client = client
+        self._semaphore = asyncio.Semaphore(RAZORPAY_MAX_CONCURRENCY)
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                auth=(self.key_id or "", self.key_secret or ""),
+                timeout=RAZORPAY_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=RAZORPAY_MAX_CONCURRENCY, max_keepalive_connections=RAZORPAY_MAX_CONCURRENCY)
+            )
+        return self._client
+    
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        async with self._semaphore:
+            response = await self._get_client().request(method, f"{self.api_base_url}{path}", **kwargs)
+        if response.status_code not in [200, 201]:
+            raise Exception(f"Razorpay {method} {path} failed: {response.status_code} - {response.text}")
+        return response.json()
+    
+    @track_outbound("razorpay", "create_order")
+    async def create_order(self, amount: float, currency: str = "INR", receipt: str = None) -> dict:
+        """
+        Create a Razorpay order.
+        Amount should be in rupees, will be converted to paise.
+        """
+        try:
+            order = await self._request("POST", "/orders", json=build_order_data(amount, currency, receipt))
+            logger.info(f"Created Razorpay order: {order['id']}")
+            return order
+        except Exception as e:
+            logger.error(f"Error creating Razorpay order: {str(e)}")
+            raise
+    
+    @track_outbound("razorpay", "get_payment_details")
+    async def get_payment_details(self, payment_id: str) -> dict:
+        """Get details of a payment."""
+        try:
+            return await self._request("GET", f"/payments/{payment_id}")
+        except Exception as e:
+            logger.error(f"Error fetching payment details: {str(e)}")
+            raise
+    
+    async def aclose(self):
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,33 @@
+"""
+orjson-backed JSON responses.
+
+orjson encodes datetime, date, UUID, Enum and str/int subclasses natively; ObjectIds
+and Pydantic models go through `_default`. FastJSONResponse is the app's default
+response class, but FastAPI still runs `jsonable_encoder` over a plain dict return
+before rendering it. Handlers with large bodies should build the response themselves,
+`return FastJSONResponse({...})`, and leave datetimes as datetimes so the body is
+encoded exactly once.
+"""
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -15,6 +15,9 @@ sys.path.append(str(ROOT_DIR))
 
 load_dotenv(ROOT_DIR / '.env')
 
+from indexes import ensure_collections
+from vitals_store import vitals_collection
+
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
@@ -52,7 +55,8 @@ async def seed_emr_data():
     print(f"Found doctor: Dr. {doctor_user['first_name']} {doctor_user['last_name']}")
     
     # Clear existing EMR data for test user
-    await db.vitals.delete_many({"patient_id": patient_id})
+    await ensure_collections(db)
+    await vitals_collection(db).delete_many({"patient_id": patient_id})
     await db.prescriptions.delete_many({"patient_id": patient_id})
     print("Cleared existing EMR data")
     
@@ -126,7 +130,7 @@ async def seed_emr_data():
         },
     ]
     
-    await db.vitals.insert_many(vitals_data)
+    await vitals_collection(db).insert_many(vitals_data)
     print(f"Added {len(vitals_data)} vital records")
     
     # Add sample prescriptions
@@ -1,30 +1,73 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Request, UploadFile, File, Form, Query
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import random
+import asyncio
+import time
+import weakref
+from typing import Optional, List
+from urllib.parse import quote
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 from models import *
-from auth import hash_password, verify_password, create_access_token, get_current_user
-from zoom_service import ZoomService
-from razorpay_service import RazorpayService
+from projections import *
+from auth import hash_password_async, verify_password_async, password_pool, create_access_token, get_current_user
+from auth import token_claims, profile_claims, profile_cache, AUTH_PROFILE_MODE, PROFILE_CACHE_TTL_SECONDS
+from zoom_service import AsyncZoomService
+from razorpay_service import AsyncRazorpayService
+from indexes import ensure_indexes, SlotIndexGuard
+from loaders import load_users, user_name, load_appointment_participants, participant_details
+from appointment_feed import patient_appointments, doctor_appointments, appointment_detail
+from pagination import fetch_page, decode_cursor, encode_cursor, MAX_PAGE_SIZE
+from doctor_cache import create_doctor_cache
+from doctor_search import DoctorSearchService, doctor_card
+from responses import FastJSONResponse, dumps
+from http_cache import CompressionMiddleware, ResourceVersions, make_etag, content_etag, not_modified, cache_headers
+from metrics import CACHE_STATS, MetricsMiddleware, MongoCommandMetrics, render_metrics
+from query_budget import QueryBudgetListener, QueryBudgetMiddleware
+from health import PoolUsage, readiness
+from loop_monitor import loop_lag, blocking_detector, LOOP_BLOCK_DETECTION
+from http_cache import appointments_scope, emr_scope, DOCTOR_PROFILES_SCOPE, PUBLIC_CACHE_CONTROL
+from vitals_store import vitals_collection, parse_trend_query, vitals_trends, ensure_legacy_vitals_migrated
+from vitals_store import read_vitals_batch_body, parse_vitals_batch, validate_vitals_batch, insert_vitals_batch
+from emr_timeline import patient_timeline, TIMELINE_KINDS
+from availability import AvailabilityService, parse_date_range, clinic_now, to_clinic_time, AVAILABILITY_MAX_DOCTORS, AVAILABILITY_MAX_DAYS
+from document_store import (
+    DocumentStore, DocumentTooLarge, RangeNotSatisfiable, DEFAULT_CONTENT_TYPE,
+    decode_base64_document, iter_upload_file, parse_range_header
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+pool_usage = PoolUsage()
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics(), QueryBudgetListener(), pool_usage])
 db = client[os.environ['DB_NAME']]
 
-zoom_service = ZoomService()
-razorpay_service = RazorpayService()
+zoom_service = AsyncZoomService()
+razorpay_service = AsyncRazorpayService()
+document_store = DocumentStore(db)
+doctor_cache = create_doctor_cache(db)
+doctor_search = DoctorSearchService(db, doctor_cache.generation)
+availability = AvailabilityService(db, doctor_cache.generation)
+# Operators read cache hit rates from /metrics
+CACHE_STATS.register("doctor_directory", doctor_cache)
+CACHE_STATS.register("availability", availability)
+resource_versions = ResourceVersions(db)
+# Bookings are refused until the index that rejects double bookings is verified
+slot_guard = SlotIndexGuard(db)
+# Per-appointment locks so concurrent create-order retries share one Razorpay order
+payment_order_locks = weakref.WeakValueDictionary()
 
-app = FastAPI(title="NAVHIM Hospital Management System API", version="1.0.0")
+app = FastAPI(title="NAVHIM Hospital Management System API", version="1.0.0", default_response_class=FastJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -39,15 +82,91 @@ def serialize_doc(doc):
         del doc["_id"]
     return doc
 
+def document_metadata(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "patient_id": doc["patient_id"],
+        "uploaded_by": doc["uploaded_by"],
+        "document_type": doc["document_type"],
+        "document_name": doc["document_name"],
+        "content_type": doc.get("content_type") or DEFAULT_CONTENT_TYPE,
+        "size": doc.get("size"),
+        "description": doc.get("description"),
+        "download_url": f"/api/emr/documents/{doc['_id']}/download",
+        "uploaded_at": doc["uploaded_at"]
+    }
+
+def prescription_response(presc: dict, doctor_users: dict) -> dict:
+    return {
+        "id": str(presc["_id"]),
+        "patient_id": presc["patient_id"],
+        "doctor_id": presc["doctor_id"],
+        "appointment_id": presc["appointment_id"],
+        "medications": presc["medications"],
+        "diagnosis": presc["diagnosis"],
+        "notes": presc.get("notes"),
+        "doctor_details": user_name(doctor_users.get(presc["doctor_id"])),
+        "created_at": presc["created_at"]
+    }
+
+async def store_medical_document(current_user: dict, document_type: str, document_name: str, content_type: str,
+                                 description: Optional[str], chunks) -> str:
+    """Stream a document body into blob storage and record its metadata; returns the document id."""
+    file_id, size = await document_store.save(document_name, content_type, chunks)
+    doc_data = {
+        "patient_id": current_user["user_id"],
+        "uploaded_by": current_user["user_id"],
+        "document_type": document_type,
+        "document_name": document_name,
+        "content_type": content_type,
+        "description": description,
+        "file_id": file_id,
+        "size": size,
+        "uploaded_at": datetime.utcnow()
+    }
+    try:
+        result = await db.medical_documents.insert_one(doc_data)
+    except Exception:
+        await document_store.delete(file_id)
+        raise
+    await resource_versions.bump([emr_scope(current_user["user_id"])])
+    return str(result.inserted_id)
+
+async def bump_appointment_versions(appointment: dict, doctor_user_id: Optional[str] = None):
+    """Invalidate the appointment feeds (and the patient's EMR timeline) of both participants."""
+    if doctor_user_id is None:
+        doctor = await db.doctors.find_one({"_id": ObjectId(appointment["doctor_id"])}, DOCTOR_SUMMARY)
+        doctor_user_id = doctor["user_id"] if doctor else None
+    scopes = [appointments_scope(appointment["patient_id"])]
+    if doctor_user_id:
+        scopes.append(appointments_scope(doctor_user_id))
+    await resource_versions.bump(scopes)
+
+async def get_or_create_payment_order(appointment: dict, amount: float) -> dict:
+    """Return the Razorpay order already created for this appointment and amount, or create and store one."""
+    appointment_id = str(appointment["_id"])
+    amount_in_paise = int(amount * 100)
+    lock = payment_order_locks.setdefault(appointment_id, asyncio.Lock())
+    async with lock:
+        current = await db.appointments.find_one({"_id": appointment["_id"]}, {"razorpay_order": 1})
+        order = (current or {}).get("razorpay_order")
+        if order and order["amount"] == amount_in_paise:
+            return order
+        
+        created = await razorpay_service.create_order(amount=amount, receipt=appointment_id)
+        order = {"id": created["id"], "amount": created["amount"], "currency": created["currency"]}
+        await db.appointments.update_one({"_id": appointment["_id"]}, {"$set": {"razorpay_order": order}})
+        return order
+
 @api_router.post("/auth/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate):
     try:
-        existing_user = await db.users.find_one({"email": user_data.email})
+        existing_user = await db.users.find_one({"email": user_data.email}, ID_ONLY)
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
         user_dict = user_data.model_dump()
-        user_dict["password"] = hash_password(user_dict["password"])
+        user_dict["password"] = await hash_password_async(user_dict["password"])
         user_dict["created_at"] = datetime.utcnow()
         
         result = await db.users.insert_one(user_dict)
@@ -78,9 +197,9 @@ async def register(user_data: UserCreate):
                 "created_at": datetime.utcnow()
             }
             await db.doctors.insert_one(doctor)
+            await doctor_cache.invalidate()
         
-        token_data = {"sub": user_id, "email": user_data.email, "role": user_data.role}
-        access_token = create_access_token(token_data)
+        access_token = create_access_token(token_claims(user_dict))
         
         user_profile = UserProfile(
             id=user_id,
@@ -104,13 +223,12 @@ async def register(user_data: UserCreate):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     try:
-        user = await db.users.find_one({"email": credentials.email})
-        if not user or not verify_password(credentials.password, user["password"]):
+        user = await db.users.find_one({"email": credentials.email}, USER_LOGIN)
+        if not user or not await verify_password_async(credentials.password, user["password"]):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         user_id = str(user["_id"])
-        token_data = {"sub": user_id, "email": user["email"], "role": user["role"]}
-        access_token = create_access_token(token_data)
+        access_token = create_access_token(token_claims(user))
         
         user_profile = UserProfile(
             id=user_id,
@@ -134,23 +252,23 @@ async def login(credentials: UserLogin):
 
 @api_router.get("/auth/me", response_model=UserProfile)
 async def get_me(current_user: dict = Depends(get_current_user)):
+    """Profile from the token or the in-process cache when available; Mongo only on a miss"""
     try:
-        user = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        return UserProfile(
-            id=str(user["_id"]),
-            email=user["email"],
-            role=user["role"],
-            first_name=user["first_name"],
-            last_name=user["last_name"],
-            phone=user["phone"],
-            date_of_birth=user["date_of_birth"],
-            gender=user["gender"],
-            profile_image=user.get("profile_image"),
-            created_at=user["created_at"]
-        )
+        user_id = current_user["user_id"]
+        profile = current_user.get("profile")
+        if profile is None and AUTH_PROFILE_MODE == "cache":
+            profile = profile_cache.get(user_id)
+        if profile is None:
+            user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_PROFILE)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+            profile = profile_claims(user)
+            if AUTH_PROFILE_MODE == "cache":
+                profile_cache.put(user_id, profile, time.time() + PROFILE_CACHE_TTL_SECONDS)
+        
+        return UserProfile(id=user_id, email=current_user["email"], role=current_user["role"], **profile)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching user: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch user")
@@ -161,7 +279,7 @@ async def get_patient_profile(current_user: dict = Depends(get_current_user)):
         if current_user["role"] != "patient":
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        patient = await db.patients.find_one({"user_id": current_user["user_id"]})
+        patient = await db.patients.find_one({"user_id": current_user["user_id"]}, PATIENT_PROFILE)
         if not patient:
             raise HTTPException(status_code=404, detail="Patient profile not found")
         
@@ -210,11 +328,11 @@ async def get_doctor_profile(current_user: dict = Depends(get_current_user)):
         if current_user["role"] != "doctor":
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        doctor = await db.doctors.find_one({"user_id": current_user["user_id"]})
+        doctor = await db.doctors.find_one({"user_id": current_user["user_id"]}, DOCTOR_DETAIL)
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor profile not found")
         
-        user = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
+        user = await db.users.find_one({"_id": ObjectId(current_user["user_id"])}, USER_CONTACT)
         user_details = {
             "first_name": user["first_name"],
             "last_name": user["last_name"],
@@ -257,6 +375,10 @@ async def update_doctor_profile(doctor_data: DoctorUpdate, current_user: dict =
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Doctor profile not found")
         
+        await doctor_cache.invalidate()
+        # Appointment feeds show the doctor's specialization
+        await resource_versions.bump([DOCTOR_PROFILES_SCOPE])
+        
         return {"message": "Profile updated successfully"}
     except HTTPException:
         raise
@@ -265,46 +387,154 @@ async def update_doctor_profile(doctor_data: DoctorUpdate, current_user: dict =
         raise HTTPException(status_code=500, detail="Failed to update profile")
 
 @api_router.get("/doctors/list")
-async def list_doctors(specialization: str = None):
-    try:
-        query = {}
+async def list_doctors(request: Request, specialization: str = None, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    async def load():
         if specialization:
-            query["specialization"] = {"$regex": specialization, "$options": "i"}
+            # Served from the search index: token/prefix match on specialization, in _id order
+            index = await doctor_search.get_index()
+            after_id = decode_cursor(cursor)[1] if cursor else None
+            result = index.list_by_specialization(specialization, limit + 1, after_id)
+            next_cursor = None
+            if len(result) > limit:
+                result = result[:limit]
+                last_id = ObjectId(result[-1]["id"])
+                next_cursor = encode_cursor(last_id, last_id)
+            return {"doctors": result, "next_cursor": next_cursor}
         
-        doctors_cursor = db.doctors.find(query).limit(50)
-        doctors_list = await doctors_cursor.to_list(length=50)
+        doctors_list, next_cursor = await fetch_page(db.doctors, {}, "_id", limit, cursor, DOCTOR_CARD, direction=1)
+        
+        users = await load_users(db, {doctor["user_id"] for doctor in doctors_list})
         
         result = []
         for doctor in doctors_list:
-            user = await db.users.find_one({"_id": ObjectId(doctor["user_id"])})
+            user = users.get(doctor["user_id"])
             if user:
-                result.append({
-                    "id": str(doctor["_id"]),
-                    "user_id": doctor["user_id"],
-                    "first_name": user["first_name"],
-                    "last_name": user["last_name"],
-                    "specialization": doctor.get("specialization", ""),
-                    "qualifications": doctor.get("qualifications", []),
-                    "experience": doctor.get("experience", 0),
-                    "consultation_fee": doctor.get("consultation_fee", 0.0),
-                    "rating": doctor.get("rating", 0.0),
-                    "bio": doctor.get("bio", ""),
-                    "verified": doctor.get("verified", False)
-                })
-        
-        return {"doctors": result}
+                result.append(doctor_card(doctor, user))
+        
+        return {"doctors": result, "next_cursor": next_cursor}
+    
+    async def load_rendered():
+        # Cache the encoded page with its ETag so hits skip both the build and the encode
+        body = dumps(await load())
+        return body, content_etag(body)
+    
+    try:
+        cache_key = ("list", (specialization or "").lower(), limit, cursor)
+        body, etag = await doctor_cache.get_or_load(cache_key, load_rendered)
+        return not_modified(request, etag, PUBLIC_CACHE_CONTROL) or Response(
+            body, media_type="application/json", headers=cache_headers(etag, PUBLIC_CACHE_CONTROL)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing doctors: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to list doctors")
 
+@api_router.get("/doctors/search")
+async def search_doctors(
+    q: Optional[str] = None,
+    specialization: Optional[str] = None,
+    min_fee: Optional[float] = Query(None, ge=0),
+    max_fee: Optional[float] = Query(None, ge=0),
+    min_experience: Optional[int] = Query(None, ge=0),
+    verified: Optional[bool] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Ranked doctor search over name, specialization, qualifications and bio; the last word matches as a prefix."""
+    try:
+        index = await doctor_search.get_index()
+        doctors = index.search(
+            q, specialization=specialization, min_fee=min_fee, max_fee=max_fee,
+            min_experience=min_experience, verified=verified, limit=limit
+        )
+        return FastJSONResponse({"doctors": doctors})
+    except Exception as e:
+        logger.error(f"Error searching doctors: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to search doctors")
+
+@api_router.get("/doctors/availability")
+async def get_doctors_availability(
+    doctor_ids: List[str] = Query(...),
+    start_date: str = Query(...),
+    end_date: Optional[str] = None
+):
+    """Free and booked slots for several doctors over a date range; unknown doctors are omitted"""
+    try:
+        start, end = parse_date_range(start_date, end_date)
+        if len(doctor_ids) > AVAILABILITY_MAX_DOCTORS:
+            raise HTTPException(status_code=400, detail=f"At most {AVAILABILITY_MAX_DOCTORS} doctors per request")
+        
+        slots = await availability.get_days(doctor_ids, start, end)
+        return FastJSONResponse({
+            "doctors": {
+                doctor_id: [day_slots.to_dict(day) for day, day_slots in days.items()]
+                for doctor_id, days in slots.items()
+            }
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching doctors availability: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch availability")
+
+@api_router.get("/doctors/next-available")
+async def get_next_available_slots(
+    specialization: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(5, ge=1, le=MAX_PAGE_SIZE)
+):
+    """
+    Earliest free slots across every doctor of a specialization, in local clinic time.
+    `start` and `end` with an offset are converted to clinic time; without one they are
+    taken as clinic time. The window defaults to the next 7 days, cannot exceed
+    AVAILABILITY_MAX_DAYS, and never reaches into the past.
+    """
+    try:
+        now = clinic_now()
+        start = to_clinic_time(start) if start else now
+        end = to_clinic_time(end) if end else start + timedelta(days=7)
+        if end <= start:
+            raise HTTPException(status_code=400, detail="end must be after start")
+        if end - start > timedelta(days=AVAILABILITY_MAX_DAYS):
+            raise HTTPException(status_code=400, detail=f"Window cannot exceed {AVAILABILITY_MAX_DAYS} days")
+        
+        # Slots that have already started cannot be booked
+        start = max(start, now)
+        if end <= start:
+            return {"slots": [], "doctors": {}}
+        
+        index = await doctor_search.get_index()
+        cards = {card["id"]: card for card in index.list_by_specialization(specialization, len(index))}
+        if not cards:
+            return {"slots": [], "doctors": {}}
+        
+        slots = await availability.next_available(list(cards), start, end, limit)
+        return FastJSONResponse({
+            "slots": [
+                {
+                    "doctor_id": doctor_id,
+                    "date": slot_start.strftime("%Y-%m-%d"),
+                    "time": slot_start.strftime("%H:%M")
+                }
+                for slot_start, doctor_id in slots
+            ],
+            "doctors": {doctor_id: cards[doctor_id] for doctor_id in {doctor_id for _, doctor_id in slots}}
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding next available slots: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to find available slots")
+
 @api_router.get("/doctors/{doctor_id}")
 async def get_doctor_by_id(doctor_id: str):
-    try:
-        doctor = await db.doctors.find_one({"_id": ObjectId(doctor_id)})
+    async def load():
+        doctor = await db.doctors.find_one({"_id": ObjectId(doctor_id)}, DOCTOR_DETAIL)
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
         
-        user = await db.users.find_one({"_id": ObjectId(doctor["user_id"])})
+        user = await db.users.find_one({"_id": ObjectId(doctor["user_id"])}, USER_CONTACT)
         
         return {
             "id": str(doctor["_id"]),
@@ -321,6 +551,9 @@ async def get_doctor_by_id(doctor_id: str):
             "availability": doctor.get("availability", []),
             "verified": doctor.get("verified", False)
         }
+    
+    try:
+        return await doctor_cache.get_or_load(("doctor", doctor_id), load)
     except HTTPException:
         raise
     except Exception as e:
@@ -328,6 +561,26 @@ async def get_doctor_by_id(doctor_id: str):
         raise HTTPException(status_code=500, detail="Failed to fetch doctor")
 
 
+@api_router.get("/doctors/{doctor_id}/availability")
+async def get_doctor_availability(doctor_id: str, start_date: str, end_date: Optional[str] = None):
+    """Free and booked slots for a doctor on each day from start_date to end_date (inclusive)"""
+    try:
+        start, end = parse_date_range(start_date, end_date)
+        slots = await availability.get_days([doctor_id], start, end)
+        if doctor_id not in slots:
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        
+        return FastJSONResponse({
+            "doctor_id": doctor_id,
+            "days": [day_slots.to_dict(day) for day, day_slots in slots[doctor_id].items()]
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching doctor availability: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch availability")
+
+
 @api_router.get("/doctors/{doctor_id}/booked-slots")
 async def get_booked_slots(doctor_id: str, date: str):
     """Get all booked time slots for a doctor on a specific date"""
@@ -344,8 +597,8 @@ async def get_booked_slots(doctor_id: str, date: str):
                 "$gte": start_of_day,
                 "$lte": end_of_day
             },
-            "status": {"$in": ["scheduled", "completed"]}
-        }).to_list(length=None)
+            "status": {"$in": ACTIVE_APPOINTMENT_STATUSES}
+        }, BOOKED_SLOT).to_list(length=None)
         
         # Extract booked times
         booked_slots = []
@@ -365,25 +618,14 @@ async def book_appointment(appointment_data: AppointmentCreate, current_user: di
         if current_user["role"] != "patient":
             raise HTTPException(status_code=403, detail="Only patients can book appointments")
         
-        doctor = await db.doctors.find_one({"_id": ObjectId(appointment_data.doctor_id)})
+        await slot_guard.require()
+        
+        doctor = await db.doctors.find_one({"_id": ObjectId(appointment_data.doctor_id)}, DOCTOR_BOOKING)
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
         
         appointment_datetime = datetime.strptime(f"{appointment_data.appointment_date} {appointment_data.appointment_time}", "%Y-%m-%d %H:%M")
         
-        # Check if slot is already booked for this doctor
-        existing_appointment = await db.appointments.find_one({
-            "doctor_id": appointment_data.doctor_id,
-            "appointment_datetime": appointment_datetime,
-            "status": {"$in": ["scheduled", "completed"]}  # Don't count cancelled appointments
-        })
-        
-        if existing_appointment:
-            raise HTTPException(
-                status_code=409, 
-                detail="This time slot is already booked. Please select a different time."
-            )
-        
         appointment = {
             "patient_id": current_user["user_id"],
             "doctor_id": appointment_data.doctor_id,
@@ -401,11 +643,22 @@ async def book_appointment(appointment_data: AppointmentCreate, current_user: di
             "created_at": datetime.utcnow()
         }
         
-        result = await db.appointments.insert_one(appointment)
+        # The insert is the reservation: the doctor_slot_active_unique index rejects
+        # a second active appointment for the same doctor and time.
+        try:
+            result = await db.appointments.insert_one(appointment)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=409, 
+                detail="This time slot is already booked. Please select a different time."
+            )
         appointment_id = str(result.inserted_id)
+        availability.invalidate_day(appointment_data.doctor_id, appointment_datetime.date())
+        await bump_appointment_versions(appointment, doctor["user_id"])
         
-        patient_user = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
-        doctor_user = await db.users.find_one({"_id": ObjectId(doctor["user_id"])})
+        users = await load_users(db, [current_user["user_id"], doctor["user_id"]])
+        doctor_details = user_name(users.get(doctor["user_id"]))
+        doctor_details["specialization"] = doctor.get("specialization", "")
         
         return AppointmentResponse(
             id=appointment_id,
@@ -418,8 +671,8 @@ async def book_appointment(appointment_data: AppointmentCreate, current_user: di
             notes=appointment_data.notes,
             consultation_fee=doctor.get("consultation_fee", 0.0),
             payment_status="pending",
-            patient_details={"first_name": patient_user["first_name"] if patient_user else "", "last_name": patient_user["last_name"] if patient_user else ""},
-            doctor_details={"first_name": doctor_user["first_name"] if doctor_user else "", "last_name": doctor_user["last_name"] if doctor_user else "", "specialization": doctor.get("specialization", "")},
+            patient_details=user_name(users.get(current_user["user_id"])),
+            doctor_details=doctor_details,
             created_at=appointment["created_at"]
         )
     except HTTPException:
@@ -429,46 +682,23 @@ async def book_appointment(appointment_data: AppointmentCreate, current_user: di
         raise HTTPException(status_code=500, detail=f"Failed to book appointment: {str(e)}")
 
 @api_router.get("/appointments/my")
-async def get_my_appointments(current_user: dict = Depends(get_current_user)):
+async def get_my_appointments(request: Request, limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     try:
-        if current_user["role"] == "patient":
-            query = {"patient_id": current_user["user_id"]}
-        elif current_user["role"] == "doctor":
-            doctor = await db.doctors.find_one({"user_id": current_user["user_id"]})
-            if not doctor:
-                return {"appointments": []}
-            query = {"doctor_id": str(doctor["_id"])}
-        else:
+        if current_user["role"] not in ("patient", "doctor"):
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        appointments_cursor = db.appointments.find(query).sort("appointment_datetime", -1)
-        appointments_list = await appointments_cursor.to_list(length=100)
+        versions = await resource_versions.current(appointments_scope(current_user["user_id"]), DOCTOR_PROFILES_SCOPE)
+        etag = make_etag("appointments/my", current_user["user_id"], limit, cursor, versions)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
         
-        result = []
-        for appt in appointments_list:
-            patient_user = await db.users.find_one({"_id": ObjectId(appt["patient_id"])})
-            doctor = await db.doctors.find_one({"_id": ObjectId(appt["doctor_id"])})
-            doctor_user = await db.users.find_one({"_id": ObjectId(doctor["user_id"])}) if doctor else None
-            
-            result.append({
-                "id": str(appt["_id"]),
-                "patient_id": appt["patient_id"],
-                "doctor_id": appt["doctor_id"],
-                "appointment_datetime": appt["appointment_datetime"].isoformat(),
-                "appointment_type": appt["appointment_type"],
-                "status": appt["status"],
-                "symptoms": appt.get("symptoms"),
-                "notes": appt.get("notes"),
-                "consultation_fee": appt.get("consultation_fee", 0.0),
-                "payment_status": appt.get("payment_status"),
-                "zoom_meeting_id": appt.get("zoom_meeting_id"),
-                "zoom_join_url": appt.get("zoom_join_url"),
-                "zoom_password": appt.get("zoom_password"),
-                "patient_details": {"first_name": patient_user["first_name"] if patient_user else "", "last_name": patient_user["last_name"] if patient_user else ""},
-                "doctor_details": {"first_name": doctor_user["first_name"] if doctor_user else "", "last_name": doctor_user["last_name"] if doctor_user else "", "specialization": doctor.get("specialization", "") if doctor else ""}
-            })
-        
-        return {"appointments": result}
+        if current_user["role"] == "patient":
+            appointments, next_cursor = await patient_appointments(db, current_user["user_id"], limit, cursor)
+        else:
+            appointments, next_cursor = await doctor_appointments(db, current_user["user_id"], limit, cursor)
+        
+        return FastJSONResponse({"appointments": appointments, "next_cursor": next_cursor}, headers=cache_headers(etag))
     except HTTPException:
         raise
     except Exception as e:
@@ -478,43 +708,55 @@ async def get_my_appointments(current_user: dict = Depends(get_current_user)):
 @api_router.get("/appointments/{appointment_id}")
 async def get_appointment(appointment_id: str, current_user: dict = Depends(get_current_user)):
     try:
-        appointment = await db.appointments.find_one({"_id": ObjectId(appointment_id)})
+        appointment = await appointment_detail(db, ObjectId(appointment_id))
         if not appointment:
             raise HTTPException(status_code=404, detail="Appointment not found")
         
-        patient_user = await db.users.find_one({"_id": ObjectId(appointment["patient_id"])})
-        doctor = await db.doctors.find_one({"_id": ObjectId(appointment["doctor_id"])})
-        doctor_user = await db.users.find_one({"_id": ObjectId(doctor["user_id"])}) if doctor else None
-        
-        return {
-            "id": str(appointment["_id"]),
-            "patient_id": appointment["patient_id"],
-            "doctor_id": appointment["doctor_id"],
-            "appointment_datetime": appointment["appointment_datetime"].isoformat(),
-            "appointment_type": appointment["appointment_type"],
-            "status": appointment["status"],
-            "symptoms": appointment.get("symptoms"),
-            "notes": appointment.get("notes"),
-            "consultation_fee": appointment.get("consultation_fee", 0.0),
-            "payment_status": appointment.get("payment_status"),
-            "payment_id": appointment.get("payment_id"),
-            "zoom_meeting_id": appointment.get("zoom_meeting_id"),
-            "zoom_join_url": appointment.get("zoom_join_url"),
-            "zoom_password": appointment.get("zoom_password"),
-            "patient_details": {"first_name": patient_user["first_name"] if patient_user else "", "last_name": patient_user["last_name"] if patient_user else ""},
-            "doctor_details": {"first_name": doctor_user["first_name"] if doctor_user else "", "last_name": doctor_user["last_name"] if doctor_user else "", "specialization": doctor.get("specialization", "") if doctor else ""}
-        }
+        return FastJSONResponse(appointment)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error fetching appointment: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch appointment")
 
+@api_router.put("/appointments/{appointment_id}/cancel")
+async def cancel_appointment(appointment_id: str, current_user: dict = Depends(get_current_user)):
+    """Cancel a scheduled appointment; the patient or the appointment's doctor may cancel"""
+    try:
+        appointment = await db.appointments.find_one({"_id": ObjectId(appointment_id)}, APPOINTMENT_CANCEL)
+        if not appointment:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        
+        if current_user["role"] == "doctor":
+            doctor = await db.doctors.find_one({"user_id": current_user["user_id"]}, ID_ONLY)
+            authorized = doctor is not None and str(doctor["_id"]) == appointment["doctor_id"]
+        else:
+            authorized = appointment["patient_id"] == current_user["user_id"]
+        if not authorized:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        
+        result = await db.appointments.update_one(
+            {"_id": ObjectId(appointment_id), "status": AppointmentStatus.SCHEDULED},
+            {"$set": {"status": AppointmentStatus.CANCELLED}}
+        )
+        if result.modified_count == 0:
+            raise HTTPException(status_code=409, detail="Only scheduled appointments can be cancelled")
+        
+        availability.invalidate_day(appointment["doctor_id"], appointment["appointment_datetime"].date())
+        await bump_appointment_versions(appointment, current_user["user_id"] if current_user["role"] == "doctor" else None)
+        
+        return {"success": True, "message": "Appointment cancelled"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error cancelling appointment: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to cancel appointment")
+
 @api_router.put("/appointments/{appointment_id}/complete-payment")
 async def complete_payment_mock(appointment_id: str, payment_data: dict, current_user: dict = Depends(get_current_user)):
     """Complete payment without actual Razorpay - for demo purposes"""
     try:
-        appointment = await db.appointments.find_one({"_id": ObjectId(appointment_id)})
+        appointment = await db.appointments.find_one({"_id": ObjectId(appointment_id)}, APPOINTMENT_PAYMENT)
         if not appointment:
             raise HTTPException(status_code=404, detail="Appointment not found")
         
@@ -537,6 +779,7 @@ async def complete_payment_mock(appointment_id: str, payment_data: dict, current
             {"_id": ObjectId(appointment_id)},
             {"$set": update_data}
         )
+        await bump_appointment_versions(appointment)
         
         return {"success": True, "message": "Payment completed successfully", "zoom_join_url": update_data.get("zoom_join_url")}
     except HTTPException:
@@ -549,14 +792,14 @@ async def complete_payment_mock(appointment_id: str, payment_data: dict, current
 @api_router.post("/payments/create-order", response_model=PaymentOrderResponse)
 async def create_payment_order(payment_data: PaymentOrderCreate, current_user: dict = Depends(get_current_user)):
     try:
-        appointment = await db.appointments.find_one({"_id": ObjectId(payment_data.appointment_id)})
+        appointment = await db.appointments.find_one({"_id": ObjectId(payment_data.appointment_id)}, APPOINTMENT_PAYMENT)
         if not appointment:
             raise HTTPException(status_code=404, detail="Appointment not found")
         
         if appointment["patient_id"] != current_user["user_id"]:
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        order = razorpay_service.create_order(amount=payment_data.amount, receipt=payment_data.appointment_id)
+        order = await get_or_create_payment_order(appointment, payment_data.amount)
         
         return PaymentOrderResponse(
             order_id=order["id"],
@@ -578,7 +821,7 @@ async def verify_payment(payment_data: PaymentVerify, current_user: dict = Depen
         if not is_valid:
             raise HTTPException(status_code=400, detail="Invalid payment signature")
         
-        appointment = await db.appointments.find_one({"_id": ObjectId(payment_data.appointment_id)})
+        appointment = await db.appointments.find_one({"_id": ObjectId(payment_data.appointment_id)}, APPOINTMENT_PAYMENT)
         if not appointment:
             raise HTTPException(status_code=404, detail="Appointment not found")
         
@@ -586,13 +829,12 @@ async def verify_payment(payment_data: PaymentVerify, current_user: dict = Depen
         
         if appointment["appointment_type"] == "video":
             try:
-                patient_user = await db.users.find_one({"_id": ObjectId(appointment["patient_id"])})
-                doctor = await db.doctors.find_one({"_id": ObjectId(appointment["doctor_id"])})
-                doctor_user = await db.users.find_one({"_id": ObjectId(doctor["user_id"])}) if doctor else None
+                doctors, users = await load_appointment_participants(db, [appointment])
+                patient_details, doctor_details = participant_details(appointment, doctors, users)
                 
-                topic = f"Consultation: Dr. {doctor_user['first_name'] if doctor_user else 'Doctor'} & {patient_user['first_name'] if patient_user else 'Patient'}"
+                topic = f"Consultation: Dr. {doctor_details['first_name'] or 'Doctor'} & {patient_details['first_name'] or 'Patient'}"
                 
-                meeting = zoom_service.create_meeting(topic=topic, start_time=appointment["appointment_datetime"], duration=60)
+                meeting = await zoom_service.create_meeting(topic=topic, start_time=appointment["appointment_datetime"], duration=60)
                 
                 update_data["zoom_meeting_id"] = meeting["meeting_id"]
                 update_data["zoom_join_url"] = meeting["join_url"]
@@ -601,6 +843,7 @@ async def verify_payment(payment_data: PaymentVerify, current_user: dict = Depen
                 logger.error(f"Failed to create Zoom meeting: {str(e)}")
         
         await db.appointments.update_one({"_id": ObjectId(payment_data.appointment_id)}, {"$set": update_data})
+        await bump_appointment_versions(appointment)
         
         return {"success": True, "message": "Payment verified and appointment confirmed", "zoom_join_url": update_data.get("zoom_join_url")}
     except HTTPException:
@@ -617,33 +860,105 @@ async def add_vitals(vitals_data: VitalsCreate, current_user: dict = Depends(get
         vitals["recorded_by"] = current_user["user_id"]
         vitals["recorded_at"] = datetime.utcnow()
         
-        result = await db.vitals.insert_one(vitals)
+        result = await vitals_collection(db).insert_one(vitals)
         vitals["id"] = str(result.inserted_id)
+        await resource_versions.bump([emr_scope(current_user["user_id"])])
         
         return VitalsResponse(**vitals)
     except Exception as e:
         logger.error(f"Error adding vitals: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to add vitals")
 
+@api_router.post("/emr/vitals/batch")
+async def add_vitals_batch(request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Bulk upload of device readings, each with its own `recorded_at`. The body is a JSON
+    array of readings or NDJSON (Content-Type: application/x-ndjson). Valid readings are
+    stored even when others fail; `errors` lists each rejected reading by batch index.
+    """
+    try:
+        body = await read_vitals_batch_body(request)
+        items = parse_vitals_batch(body, request.headers.get("content-type", ""))
+        
+        # Validating thousands of readings is CPU work; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        documents, positions, errors = await loop.run_in_executor(
+            None, validate_vitals_batch, items, current_user["user_id"], current_user["user_id"]
+        )
+        inserted, write_errors = await insert_vitals_batch(db, documents, positions)
+        if inserted:
+            await resource_versions.bump([emr_scope(current_user["user_id"])])
+        errors = sorted(errors + write_errors, key=lambda error: error["index"])
+        
+        return FastJSONResponse({"inserted": inserted, "failed": len(errors), "errors": errors})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding vitals batch: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to add vitals batch")
+
 @api_router.get("/emr/vitals")
-async def get_vitals(current_user: dict = Depends(get_current_user)):
+async def get_vitals(request: Request, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     try:
         patient_id = current_user["user_id"] if current_user["role"] == "patient" else None
         
         if not patient_id:
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        vitals_cursor = db.vitals.find({"patient_id": patient_id}).sort("recorded_at", -1).limit(50)
-        vitals_list = await vitals_cursor.to_list(length=50)
+        etag = make_etag("emr/vitals", patient_id, limit, cursor, await resource_versions.current(emr_scope(patient_id)))
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        
+        vitals_list, next_cursor = await fetch_page(vitals_collection(db), {"patient_id": patient_id}, "recorded_at", limit, cursor, VITALS)
         
         result = [serialize_doc(v) for v in vitals_list]
-        return {"vitals": result}
+        return FastJSONResponse({"vitals": result, "next_cursor": next_cursor}, headers=cache_headers(etag))
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error fetching vitals: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch vitals")
 
+@api_router.get("/emr/vitals/trends")
+async def get_vitals_trends(
+    request: Request,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: str = "day",
+    metrics: Optional[str] = None,
+    timezone: str = "UTC",
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Min/max/mean of each vitals metric per hour, day or week bucket over [start, end).
+    Defaults to the last 30 days; `metrics` is a comma-separated subset.
+    """
+    try:
+        if current_user["role"] != "patient":
+            raise HTTPException(status_code=403, detail="Not authorized")
+        
+        start, end, selected = parse_trend_query(start, end, bucket, metrics, timezone)
+        versions = await resource_versions.current(emr_scope(current_user["user_id"]))
+        etag = make_etag("emr/vitals/trends", current_user["user_id"], start, end, bucket, selected, timezone, versions)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        
+        buckets = await vitals_trends(db, current_user["user_id"], start, end, bucket, selected, timezone)
+        return FastJSONResponse({
+            "bucket": bucket,
+            "timezone": timezone,
+            "start": start,
+            "end": end,
+            "buckets": buckets
+        }, headers=cache_headers(etag))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching vitals trends: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch vitals trends")
+
 @api_router.post("/emr/prescription", response_model=PrescriptionResponse, status_code=status.HTTP_201_CREATED)
 async def create_prescription(prescription_data: PrescriptionCreate, current_user: dict = Depends(get_current_user)):
     try:
@@ -656,8 +971,9 @@ async def create_prescription(prescription_data: PrescriptionCreate, current_use
         
         result = await db.prescriptions.insert_one(prescription)
         prescription["id"] = str(result.inserted_id)
+        await resource_versions.bump([emr_scope(prescription["patient_id"])])
         
-        doctor_user = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
+        doctor_user = await db.users.find_one({"_id": ObjectId(current_user["user_id"])}, USER_NAME)
         prescription["doctor_details"] = {"first_name": doctor_user["first_name"] if doctor_user else "", "last_name": doctor_user["last_name"] if doctor_user else ""}
         
         return PrescriptionResponse(**prescription)
@@ -668,32 +984,23 @@ async def create_prescription(prescription_data: PrescriptionCreate, current_use
         raise HTTPException(status_code=500, detail="Failed to create prescription")
 
 @api_router.get("/emr/prescriptions")
-async def get_prescriptions(current_user: dict = Depends(get_current_user)):
+async def get_prescriptions(request: Request, limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     try:
         patient_id = current_user["user_id"] if current_user["role"] == "patient" else None
         
         if not patient_id:
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        prescriptions_cursor = db.prescriptions.find({"patient_id": patient_id}).sort("created_at", -1)
-        prescriptions_list = await prescriptions_cursor.to_list(length=100)
+        etag = make_etag("emr/prescriptions", patient_id, limit, cursor, await resource_versions.current(emr_scope(patient_id)))
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
         
-        result = []
-        for presc in prescriptions_list:
-            doctor_user = await db.users.find_one({"_id": ObjectId(presc["doctor_id"])})
-            result.append({
-                "id": str(presc["_id"]),
-                "patient_id": presc["patient_id"],
-                "doctor_id": presc["doctor_id"],
-                "appointment_id": presc["appointment_id"],
-                "medications": presc["medications"],
-                "diagnosis": presc["diagnosis"],
-                "notes": presc.get("notes"),
-                "doctor_details": {"first_name": doctor_user["first_name"] if doctor_user else "", "last_name": doctor_user["last_name"] if doctor_user else ""},
-                "created_at": presc["created_at"].isoformat()
-            })
-        
-        return {"prescriptions": result}
+        prescriptions_list, next_cursor = await fetch_page(db.prescriptions, {"patient_id": patient_id}, "created_at", limit, cursor, PRESCRIPTION)
+        doctor_users = await load_users(db, {presc["doctor_id"] for presc in prescriptions_list})
+        
+        result = [prescription_response(presc, doctor_users) for presc in prescriptions_list]
+        return FastJSONResponse({"prescriptions": result, "next_cursor": next_cursor}, headers=cache_headers(etag))
     except HTTPException:
         raise
     except Exception as e:
@@ -702,38 +1009,183 @@ async def get_prescriptions(current_user: dict = Depends(get_current_user)):
 
 @api_router.post("/emr/document", status_code=status.HTTP_201_CREATED)
 async def upload_medical_document(document: MedicalDocument, current_user: dict = Depends(get_current_user)):
+    """Upload a base64-encoded document in a JSON body. Prefer /emr/documents/upload for large files."""
     try:
-        doc_data = document.model_dump()
-        doc_data["patient_id"] = current_user["user_id"]
-        doc_data["uploaded_by"] = current_user["user_id"]
-        doc_data["uploaded_at"] = datetime.utcnow()
+        try:
+            data = decode_base64_document(document.document_data)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        result = await db.medical_documents.insert_one(doc_data)
+        async def body():
+            yield data
+        
+        document_id = await store_medical_document(
+            current_user, document.document_type, document.document_name,
+            document.content_type or DEFAULT_CONTENT_TYPE, document.description, body()
+        )
         
-        return {"id": str(result.inserted_id), "message": "Document uploaded successfully"}
+        return {"id": document_id, "message": "Document uploaded successfully"}
+    except HTTPException:
+        raise
+    except DocumentTooLarge:
+        raise HTTPException(status_code=413, detail="Document is too large")
     except Exception as e:
         logger.error(f"Error uploading document: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to upload document")
 
+@api_router.post("/emr/documents/upload", status_code=status.HTTP_201_CREATED)
+async def upload_medical_document_file(
+    file: UploadFile = File(...),
+    document_type: str = Form(...),
+    document_name: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Upload a document as multipart/form-data; the body is streamed into blob storage in chunks."""
+    try:
+        document_id = await store_medical_document(
+            current_user, document_type, document_name or file.filename or "document",
+            file.content_type or DEFAULT_CONTENT_TYPE, description, iter_upload_file(file)
+        )
+        
+        return {"id": document_id, "message": "Document uploaded successfully"}
+    except DocumentTooLarge:
+        raise HTTPException(status_code=413, detail="Document is too large")
+    except Exception as e:
+        logger.error(f"Error uploading document: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to upload document")
+    finally:
+        await file.close()
+
 @api_router.get("/emr/documents")
-async def get_medical_documents(current_user: dict = Depends(get_current_user)):
+async def get_medical_documents(request: Request, limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     try:
         patient_id = current_user["user_id"] if current_user["role"] == "patient" else None
         
         if not patient_id:
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        documents_cursor = db.medical_documents.find({"patient_id": patient_id}).sort("uploaded_at", -1)
-        documents_list = await documents_cursor.to_list(length=100)
+        etag = make_etag("emr/documents", patient_id, limit, cursor, await resource_versions.current(emr_scope(patient_id)))
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        
+        documents_list, next_cursor = await fetch_page(
+            db.medical_documents, {"patient_id": patient_id}, "uploaded_at", limit, cursor, DOCUMENT_METADATA
+        )
         
-        result = [serialize_doc(doc) for doc in documents_list]
-        return {"documents": result}
+        result = [document_metadata(doc) for doc in documents_list]
+        return FastJSONResponse({"documents": result, "next_cursor": next_cursor}, headers=cache_headers(etag))
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error fetching documents: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch documents")
 
+@api_router.get("/emr/timeline")
+async def get_emr_timeline(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    types: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Vitals, prescriptions, documents and appointments merged into one feed, newest first.
+    `types` is a comma-separated subset of vital, prescription, document, appointment.
+    Each entry's `record` has the same shape as in the per-type endpoints. `occurred_at`
+    is UTC for every type, including appointments, whose records keep local clinic time.
+    """
+    try:
+        if current_user["role"] != "patient":
+            raise HTTPException(status_code=403, detail="Not authorized")
+        
+        kinds = [kind.strip() for kind in types.split(",") if kind.strip()] if types else None
+        if kinds is not None and (not kinds or any(kind not in TIMELINE_KINDS for kind in kinds)):
+            raise HTTPException(status_code=400, detail=f"types must be drawn from: {', '.join(TIMELINE_KINDS)}")
+        
+        patient_id = current_user["user_id"]
+        versions = await resource_versions.current(emr_scope(patient_id), appointments_scope(patient_id), DOCTOR_PROFILES_SCOPE)
+        etag = make_etag("emr/timeline", patient_id, limit, cursor, kinds, versions)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        
+        entries, next_cursor = await patient_timeline(db, patient_id, limit, cursor, kinds)
+        doctor_users = await load_users(db, {entry.doc["doctor_id"] for entry in entries if entry.kind == "prescription"})
+        
+        timeline = []
+        for entry in entries:
+            if entry.kind == "prescription":
+                record = prescription_response(entry.doc, doctor_users)
+            elif entry.kind == "document":
+                record = document_metadata(entry.doc)
+            else:
+                record = serialize_doc(entry.doc)
+            timeline.append({"type": entry.kind, "occurred_at": entry.occurred_at, "record": record})
+        
+        return FastJSONResponse({"timeline": timeline, "next_cursor": next_cursor}, headers=cache_headers(etag))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching EMR timeline: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch EMR timeline")
+
+@api_router.get("/emr/documents/{document_id}/download")
+async def download_medical_document(document_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+    """Stream a document's bytes, honouring single-range `Range` requests."""
+    try:
+        doc = await db.medical_documents.find_one({"_id": ObjectId(document_id)}, DOCUMENT_DOWNLOAD)
+        if not doc:
+            raise HTTPException(status_code=404, detail="Document not found")
+        
+        if current_user["user_id"] not in (doc["patient_id"], doc.get("uploaded_by")):
+            raise HTTPException(status_code=403, detail="Not authorized")
+        
+        inline_data = None
+        if doc.get("file_id") is not None:
+            size = doc["size"]
+        else:
+            # Documents uploaded before blob storage keep their payload inline
+            inline_data = decode_base64_document(doc.get("document_data", ""))
+            size = len(inline_data)
+        
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(doc['document_name'])}"
+        }
+        try:
+            byte_range = parse_range_header(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        else:
+            start, end = 0, size - 1
+            status_code = 200
+        headers["Content-Length"] = str(end - start + 1)
+        
+        if inline_data is not None:
+            body = iter([inline_data[start:end + 1]])
+        else:
+            body = document_store.stream(doc["file_id"], start, end)
+        
+        return StreamingResponse(
+            body,
+            status_code=status_code,
+            media_type=doc.get("content_type") or DEFAULT_CONTENT_TYPE,
+            headers=headers
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error downloading document: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to download document")
+
 @api_router.get("/")
 async def root():
     return {"message": "NAVHIM Hospital Management System API", "version": "1.0.0"}
@@ -742,6 +1194,18 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "NAVHIM HMS API"}
 
+@api_router.get("/health/live")
+async def liveness_check():
+    """Liveness: the process is up and serving; no dependencies are checked."""
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def readiness_check():
+    """Readiness: 503 when MongoDB latency, pool saturation or event-loop lag is over its threshold."""
+    result = await readiness(db, pool_usage, client.options.pool_options.max_pool_size, loop_lag, zoom_service)
+    status_code = 200 if result["status"] == "ready" else 503
+    return FastJSONResponse(result, status_code=status_code, headers={"Cache-Control": "no-store"})
+
 @api_router.get("/specializations")
 async def get_specializations():
     specializations = [
@@ -753,14 +1217,54 @@ async def get_specializations():
 
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(QueryBudgetMiddleware)
+# Outermost, so latency covers compression and CORS too; also sets the route template the budget log reports
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+@app.on_event("startup")
+async def start_loop_monitoring():
+    loop_lag.start()
+    if LOOP_BLOCK_DETECTION:
+        blocking_detector.start()
+
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        if os.getenv("ENSURE_INDEXES_ON_STARTUP", "true").lower() == "true":
+            await ensure_indexes(db)
+        await slot_guard.check()
+    except Exception as e:
+        logger.error(f"Error ensuring indexes: {str(e)}")
+
+@app.on_event("startup")
+async def migrate_legacy_vitals():
+    # Runs after create_indexes, which creates the time-series collection, and before traffic
+    if os.getenv("VITALS_MIGRATE_ON_STARTUP", "true").lower() != "true":
+        return
+    try:
+        await ensure_legacy_vitals_migrated(db)
+    except Exception as e:
+        logger.error(f"Error migrating legacy vitals: {str(e)}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await loop_lag.stop()
+    blocking_detector.stop()
     client.close()
+    password_pool.shutdown()
+    await zoom_service.aclose()
+    await razorpay_service.aclose()
@@ -0,0 +1,140 @@
+"""
+Local stand-in for the third-party APIs the backend calls, for tests and load runs.
+
+    uvicorn stub_server:app --port 8010
+
+then point the backend at it:
+
+    ZOOM_OAUTH_URL=http://localhost:8010/zoom/oauth/token
+    ZOOM_API_BASE_URL=http://localhost:8010/zoom/v2
+    RAZORPAY_API_BASE_URL=http://localhost:8010/razorpay/v1
+
+STUB_LATENCY_MS adds a fixed delay to every response to mimic the real round trip.
+GET /stats returns per-endpoint call counts and GET /stats/connections the number of
+distinct client connections seen, so tests can check that callers reuse pooled
+connections; DELETE /stats resets both.
+"""
+import asyncio
+import os
+import random
+import secrets
+import time
+from collections import Counter
+
+from fastapi import FastAPI, HTTPException, Request
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "0"))
+
+app = FastAPI(title="NAVHIM third-party API stub")
+calls = Counter()
+# (host, port) of every client connection that sent a request
+peers = set()
+meetings = {}
+orders = {}
+
+
+async def _simulate(name: str):
+    calls[name] += 1
+    if STUB_LATENCY_MS:
+        await asyncio.sleep(STUB_LATENCY_MS / 1000)
+
+
+@app.middleware("http")
+async def track_connections(request: Request, call_next):
+    if request.client:
+        peers.add((request.client.host, request.client.port))
+    return await call_next(request)
+
+
+def _require_bearer(request: Request):
+    if not request.headers.get("authorization", "").startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+
+
+@app.post("/zoom/oauth/token")
+async def zoom_token(request: Request):
+    await _simulate("zoom.token")
+    if not request.headers.get("authorization", "").startswith("Basic "):
+        raise HTTPException(status_code=401, detail="Missing client credentials")
+    return {"access_token": secrets.token_hex(16), "token_type": "bearer", "expires_in": 3600}
+
+
+@app.post("/zoom/v2/users/me/meetings", status_code=201)
+async def zoom_create_meeting(request: Request):
+    await _simulate("zoom.create_meeting")
+    _require_bearer(request)
+    payload = await request.json()
+    meeting_id = random.randint(10**9, 10**10 - 1)
+    meeting = {
+        "id": meeting_id,
+        "topic": payload.get("topic"),
+        "start_time": payload.get("start_time"),
+        "duration": payload.get("duration"),
+        "password": payload.get("password", "123456"),
+        "join_url": f"https://zoom.example/j/{meeting_id}",
+        "start_url": f"https://zoom.example/s/{meeting_id}",
+    }
+    meetings[str(meeting_id)] = meeting
+    return meeting
+
+
+@app.get("/zoom/v2/meetings/{meeting_id}")
+async def zoom_get_meeting(meeting_id: str, request: Request):
+    await _simulate("zoom.get_meeting")
+    _require_bearer(request)
+    if meeting_id not in meetings:
+        raise HTTPException(status_code=404, detail="Meeting not found")
+    return meetings[meeting_id]
+
+
+@app.delete("/zoom/v2/meetings/{meeting_id}", status_code=204)
+async def zoom_delete_meeting(meeting_id: str, request: Request):
+    await _simulate("zoom.delete_meeting")
+    _require_bearer(request)
+    if meetings.pop(meeting_id, None) is None:
+        raise HTTPException(status_code=404, detail="Meeting not found")
+
+
+@app.post("/razorpay/v1/orders")
+async def razorpay_create_order(request: Request):
+    await _simulate("razorpay.create_order")
+    if not request.headers.get("authorization", "").startswith("Basic "):
+        raise HTTPException(status_code=401, detail="Missing key credentials")
+    payload = await request.json()
+    order_id = f"order_{secrets.token_hex(7)}"
+    order = {
+        "id": order_id,
+        "entity": "order",
+        "amount": payload["amount"],
+        "amount_paid": 0,
+        "amount_due": payload["amount"],
+        "currency": payload.get("currency", "INR"),
+        "receipt": payload.get("receipt"),
+        "status": "created",
+        "created_at": int(time.time()),
+    }
+    orders[order_id] = order
+    return order
+
+
+@app.get("/razorpay/v1/payments/{payment_id}")
+async def razorpay_get_payment(payment_id: str):
+    await _simulate("razorpay.get_payment")
+    return {"id": payment_id, "entity": "payment", "status": "captured"}
+
+
+@app.get("/stats")
+async def get_stats():
+    return dict(calls)
+
+
+@app.get("/stats/connections")
+async def get_connection_stats():
+    return {"connections": len(peers)}
+
+
+@app.delete("/stats")
+async def reset_stats():
+    calls.clear()
+    peers.clear()
+    return {}
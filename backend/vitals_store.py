@@ -0,0 +1,359 @@
+"""
+Vitals readings in a MongoDB time-series collection.
+
+Readings live in VITALS_COLLECTION, a time-series collection with `recorded_at` as
+the time field and `patient_id` as the meta field, so each patient's readings are
+stored together in compressed buckets. Trend queries group a range of readings into
+hour/day/week buckets with $dateTrunc and compute min/max/mean per metric inside
+the database (MongoDB 5.0+).
+
+ensure_indexes creates the collection before any index build or insert could create
+it as a regular collection. Readings in the legacy `vitals` collection are copied
+over at startup, before the server takes traffic: one worker holds a lease in
+`migrations` and copies, the others wait for it to record completion. The copy is
+idempotent, so a run cut short is simply repeated. Readings that old workers wrote
+to `vitals` during a rolling deploy are picked up by running, once they are gone:
+
+    python vitals_store.py --migrate
+"""
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import orjson
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from models import VitalsReading
+
+VITALS_COLLECTION = os.getenv("VITALS_COLLECTION", "vital_readings")
+VITALS_GRANULARITY = os.getenv("VITALS_GRANULARITY", "hours")
+LEGACY_VITALS_COLLECTION = "vitals"
+MIGRATION_BATCH_SIZE = 1000
+MIGRATIONS_COLLECTION = "migrations"
+LEGACY_VITALS_MIGRATION = "legacy_vitals"
+MIGRATION_LEASE_SECONDS = float(os.getenv("MIGRATION_LEASE_SECONDS", "60"))
+MIGRATION_POLL_SECONDS = 1.0
+MAX_TREND_BUCKETS = int(os.getenv("MAX_TREND_BUCKETS", "1000"))
+MAX_VITALS_BATCH = int(os.getenv("MAX_VITALS_BATCH", "10000"))
+# A full batch of MAX_VITALS_BATCH readings is well under this
+MAX_VITALS_BATCH_BYTES = int(os.getenv("MAX_VITALS_BATCH_BYTES", str(8 * 1024 * 1024)))
+# How far ahead of the server clock a device timestamp may be
+MAX_CLOCK_SKEW = timedelta(minutes=int(os.getenv("VITALS_MAX_CLOCK_SKEW_MINUTES", "5")))
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+DEFAULT_TREND_DAYS = 30
+
+METRICS = (
+    "blood_pressure_systolic", "blood_pressure_diastolic", "heart_rate", "temperature",
+    "weight", "height", "blood_sugar", "oxygen_saturation",
+)
+BUCKET_SIZES = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidTrendQuery(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+class InvalidVitalsBatch(HTTPException):
+    def __init__(self, detail: str, status_code: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(status_code=status_code, detail=detail)
+
+
+def vitals_collection(db):
+    return db[VITALS_COLLECTION]
+
+
+def parse_trend_query(start: Optional[datetime], end: Optional[datetime], bucket: str,
+                      metrics: Optional[str], timezone: str) -> Tuple[datetime, datetime, List[str]]:
+    """Validate a trend request; returns naive-UTC (start, end) and the metric names."""
+    if bucket not in BUCKET_SIZES:
+        raise InvalidTrendQuery(f"bucket must be one of: {', '.join(BUCKET_SIZES)}")
+    try:
+        ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise InvalidTrendQuery(f"Unknown timezone: {timezone}")
+
+    # Readings are stored as naive UTC
+    end = _naive_utc(end) if end else datetime.utcnow()
+    start = _naive_utc(start) if start else end - timedelta(days=DEFAULT_TREND_DAYS)
+    if end <= start:
+        raise InvalidTrendQuery("end must be after start")
+    if (end - start) / BUCKET_SIZES[bucket] > MAX_TREND_BUCKETS:
+        raise InvalidTrendQuery(f"Range spans more than {MAX_TREND_BUCKETS} {bucket} buckets")
+
+    selected = [name.strip() for name in metrics.split(",") if name.strip()] if metrics else list(METRICS)
+    unknown = [name for name in selected if name not in METRICS]
+    if unknown or not selected:
+        raise InvalidTrendQuery(f"metrics must be drawn from: {', '.join(METRICS)}")
+    return start, end, selected
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+
+def trend_pipeline(patient_id: str, start: datetime, end: datetime, bucket: str, metrics: List[str],
+                   timezone: str = "UTC") -> list:
+    group = {
+        "_id": {"$dateTrunc": {"date": "$recorded_at", "unit": bucket, "timezone": timezone, "startOfWeek": "monday"}},
+        "count": {"$sum": 1},
+    }
+    for metric in metrics:
+        group[f"{metric}_min"] = {"$min": f"${metric}"}
+        group[f"{metric}_max"] = {"$max": f"${metric}"}
+        group[f"{metric}_mean"] = {"$avg": f"${metric}"}
+    return [
+        {"$match": {"patient_id": patient_id, "recorded_at": {"$gte": start, "$lt": end}}},
+        {"$group": group},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+async def vitals_trends(db, patient_id: str, start: datetime, end: datetime, bucket: str, metrics: List[str],
+                        timezone: str = "UTC") -> List[dict]:
+    """Per-bucket reading count and min/max/mean of each metric; metrics without readings are left out."""
+    pipeline = trend_pipeline(patient_id, start, end, bucket, metrics, timezone)
+    buckets = []
+    async for row in vitals_collection(db).aggregate(pipeline):
+        summary = {}
+        for metric in metrics:
+            if row[f"{metric}_min"] is None:
+                continue
+            summary[metric] = {
+                "min": row[f"{metric}_min"],
+                "max": row[f"{metric}_max"],
+                "mean": round(row[f"{metric}_mean"], 2),
+            }
+        buckets.append({"start": row["_id"], "count": row["count"], "metrics": summary})
+    return buckets
+
+
+class InvalidLine(str):
+    """Marker for an NDJSON line that could not be decoded."""
+
+
+async def read_vitals_batch_body(request) -> bytes:
+    """
+    Read a batch body of at most MAX_VITALS_BATCH_BYTES. A larger Content-Length is refused
+    before reading; a body without one (chunked) is refused as soon as it passes the limit.
+    """
+    too_large = InvalidVitalsBatch(
+        f"Batch body exceeds {MAX_VITALS_BATCH_BYTES} bytes", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    )
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise InvalidVitalsBatch("Invalid Content-Length header")
+        if declared > MAX_VITALS_BATCH_BYTES:
+            raise too_large
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > MAX_VITALS_BATCH_BYTES:
+            raise too_large
+    return bytes(body)
+
+
+def parse_vitals_batch(body: bytes, content_type: str) -> List[object]:
+    """
+    Split a batch body into raw items: a JSON array, or NDJSON with one reading per line.
+    An NDJSON line that is not valid JSON becomes an InvalidLine item so it fails on its own.
+    """
+    if content_type.split(";")[0].strip().lower() in NDJSON_CONTENT_TYPES:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(orjson.loads(line))
+            except orjson.JSONDecodeError as e:
+                items.append(InvalidLine(str(e)))
+    else:
+        try:
+            items = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            raise InvalidVitalsBatch("Body must be a JSON array of readings or NDJSON")
+        if not isinstance(items, list):
+            raise InvalidVitalsBatch("Body must be a JSON array of readings or NDJSON")
+
+    if not items:
+        raise InvalidVitalsBatch("Batch contains no readings")
+    if len(items) > MAX_VITALS_BATCH:
+        raise InvalidVitalsBatch(
+            f"Batch contains {len(items)} readings; the limit is {MAX_VITALS_BATCH}",
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+    return items
+
+
+def _item_errors(error: ValidationError) -> List[dict]:
+    return [{"field": ".".join(str(part) for part in e["loc"]), "message": e["msg"]} for e in error.errors()]
+
+
+def validate_vitals_batch(items: List[object], patient_id: str, recorded_by: str):
+    """
+    Validate every item independently. Returns (documents, positions, errors) where
+    positions[i] is the batch index of documents[i] and errors holds one entry per rejected item.
+    """
+    latest = datetime.utcnow() + MAX_CLOCK_SKEW
+    documents, positions, errors = [], [], []
+    for index, item in enumerate(items):
+        if isinstance(item, InvalidLine):
+            errors.append({"index": index, "errors": [{"field": "", "message": f"Invalid JSON: {item}"}]})
+            continue
+        try:
+            reading = VitalsReading.model_validate(item)
+        except ValidationError as e:
+            errors.append({"index": index, "errors": _item_errors(e)})
+            continue
+        document = reading.model_dump()
+        document["recorded_at"] = _naive_utc(document["recorded_at"])
+        if document["recorded_at"] > latest:
+            errors.append({"index": index, "errors": [{"field": "recorded_at", "message": "Timestamp is in the future"}]})
+            continue
+        document["patient_id"] = patient_id
+        document["recorded_by"] = recorded_by
+        documents.append(document)
+        positions.append(index)
+    return documents, positions, errors
+
+
+async def insert_vitals_batch(db, documents: List[dict], positions: List[int]):
+    """
+    Insert validated readings with one unordered insert_many. Returns (inserted, errors),
+    with write errors mapped back to batch indexes.
+    """
+    if not documents:
+        return 0, []
+    try:
+        result = await vitals_collection(db).insert_many(documents, ordered=False)
+        return len(result.inserted_ids), []
+    except BulkWriteError as e:
+        details = e.details
+        errors = [
+            {"index": positions[write_error["index"]], "errors": [{"field": "", "message": write_error["errmsg"]}]}
+            for write_error in details.get("writeErrors", [])
+        ]
+        return details.get("nInserted", 0), errors
+
+
+async def migrate_legacy_vitals(db, on_batch=None) -> int:
+    """
+    Copy readings from the legacy `vitals` collection into the time-series collection,
+    keeping their _id. Copied rows are marked so an interrupted run resumes where it
+    stopped; rows a crashed run copied but did not mark are found in the target and
+    skipped, since the time-series collection would accept them twice. `on_batch` is
+    awaited after each batch. Returns the number copied.
+    """
+    legacy = db[LEGACY_VITALS_COLLECTION]
+    target = vitals_collection(db)
+    migrated = 0
+    while True:
+        batch = await legacy.find({"migrated_to": {"$exists": False}}).sort("_id", 1).to_list(length=MIGRATION_BATCH_SIZE)
+        if not batch:
+            return migrated
+        ids = [doc["_id"] for doc in batch]
+        # patient_id is the meta field, so this only opens the batch's patients' buckets
+        copied = {doc["_id"] async for doc in target.find(
+            {"patient_id": {"$in": list({doc.get("patient_id") for doc in batch})}, "_id": {"$in": ids}}, {"_id": 1}
+        )}
+        missing = [doc for doc in batch if doc["_id"] not in copied]
+        if missing:
+            await target.insert_many(missing, ordered=False)
+        await legacy.update_many({"_id": {"$in": ids}}, {"$set": {"migrated_to": VITALS_COLLECTION}})
+        migrated += len(missing)
+        if on_batch is not None:
+            await on_batch()
+
+
+async def ensure_legacy_vitals_migrated(db, lease_seconds: float = MIGRATION_LEASE_SECONDS) -> int:
+    """
+    Run the legacy vitals migration once across all workers and return only when it is
+    complete. The worker that takes the lease copies, renewing it after every batch;
+    the others wait, and take over if the lease runs out. Returns the number this worker copied.
+    """
+    # Imported here to avoid a cycle: indexes declares the collection from this module's settings
+    from indexes import ensure_collections
+
+    migrations = db[MIGRATIONS_COLLECTION]
+    holder = uuid.uuid4().hex
+    while True:
+        state = await migrations.find_one({"_id": LEGACY_VITALS_MIGRATION})
+        if state and state.get("completed_at"):
+            return 0
+
+        now = datetime.utcnow()
+        try:
+            result = await migrations.update_one(
+                {"_id": LEGACY_VITALS_MIGRATION, "completed_at": {"$exists": False},
+                 "$or": [{"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]},
+                {"$set": {"lease_until": now + timedelta(seconds=lease_seconds), "holder": holder}},
+                upsert=True,
+            )
+            acquired = result.upserted_id is not None or result.modified_count == 1
+        except DuplicateKeyError:
+            # Another worker holds the lease, so the upsert collided with its document
+            acquired = False
+        if not acquired:
+            await asyncio.sleep(MIGRATION_POLL_SECONDS)
+            continue
+
+        async def renew_lease():
+            await migrations.update_one(
+                {"_id": LEGACY_VITALS_MIGRATION, "holder": holder},
+                {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=lease_seconds)}},
+            )
+
+        await ensure_collections(db)
+        migrated = await migrate_legacy_vitals(db, on_batch=renew_lease)
+        await migrations.update_one(
+            {"_id": LEGACY_VITALS_MIGRATION, "holder": holder},
+            {"$set": {"completed_at": datetime.utcnow(), "migrated": migrated}, "$unset": {"lease_until": ""}},
+        )
+        if migrated:
+            logger.info(f"Migrated {migrated} legacy vitals readings to {VITALS_COLLECTION}")
+        return migrated
+
+
+async def main():
+    # Imported here to avoid a cycle: indexes declares the collection from this module's settings
+    from indexes import ensure_collections
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        db = client[os.environ['DB_NAME']]
+        await ensure_collections(db)
+        migrated = await migrate_legacy_vitals(db)
+    finally:
+        client.close()
+    print(f"Migrated {migrated} vitals readings to {VITALS_COLLECTION}.")
+    if migrated:
+        print(f"Drop the `{LEGACY_VITALS_COLLECTION}` collection once no worker of the previous version is running.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vitals storage maintenance.")
+    parser.add_argument("--migrate", action="store_true",
+                        help=f"copy readings from `{LEGACY_VITALS_COLLECTION}` into the time-series collection")
+    args = parser.parse_args()
+    if not args.migrate:
+        parser.error("nothing to do; pass --migrate")
+    asyncio.run(main())
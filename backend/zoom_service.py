@@ -1,4 +1,6 @@
 import requests
+import httpx
+import asyncio
 import base64
 import time
 import logging
@@ -6,9 +8,15 @@ from typing import Optional
 from datetime import datetime
 import os
 
+from metrics import track_outbound
+
 logger = logging.getLogger(__name__)
 
-class ZoomService:
+ZOOM_MAX_CONNECTIONS = int(os.getenv("ZOOM_MAX_CONNECTIONS", "20"))
+ZOOM_TIMEOUT_SECONDS = float(os.getenv("ZOOM_TIMEOUT_SECONDS", "10"))
+
+class ZoomServiceBase:
+    """Configuration and request/response shapes shared by the sync and async clients."""
     def __init__(self):
         self.account_id = os.getenv("ZOOM_ACCOUNT_ID")
         self.client_id = os.getenv("ZOOM_CLIENT_ID")
@@ -17,74 +25,92 @@ class ZoomService:
         self.api_base_url = os.getenv("ZOOM_API_BASE_URL")
         self.access_token: Optional[str] = None
         self.token_expires_at: float = 0
+        self.token_obtained_at: float = 0
         self.token_buffer_seconds = 300
     
+    def _has_valid_token(self) -> bool:
+        return bool(self.access_token) and time.time() < (self.token_expires_at - self.token_buffer_seconds)
+    
+    def _token_request_headers(self) -> dict:
+        credentials = f"{self.client_id}:{self.client_secret}"
+        encoded_credentials = base64.b64encode(credentials.encode()).decode()
+        return {
+            "Authorization": f"Basic {encoded_credentials}",
+            "Content-Type": "application/x-www-form-urlencoded"
+        }
+    
+    def _store_token(self, response_data: dict) -> str:
+        self.access_token = response_data["access_token"]
+        self.token_obtained_at = time.time()
+        self.token_expires_at = self.token_obtained_at + response_data.get("expires_in", 3600)
+        logger.info("Successfully obtained new Zoom access token")
+        return self.access_token
+    
+    def _auth_headers(self, token: str) -> dict:
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+    
+    def _meeting_payload(self, topic: str, start_time: datetime, duration: int) -> dict:
+        return {
+            "topic": topic,
+            "type": 2,  # Scheduled meeting
+            "start_time": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "duration": duration,
+            "timezone": "Asia/Kolkata",
+            "password": "123456",
+            "settings": {
+                "host_video": True,
+                "participant_video": True,
+                "join_before_host": False,
+                "mute_upon_entry": False,
+                "waiting_room": True,
+                "audio": "voip",
+                "auto_recording": "none"
+            }
+        }
+    
+    def _meeting_result(self, data: dict) -> dict:
+        return {
+            "meeting_id": str(data["id"]),
+            "join_url": data["join_url"],
+            "password": data.get("password", "123456"),
+            "start_url": data.get("start_url", "")
+        }
+
+class ZoomService(ZoomServiceBase):
     def get_access_token(self) -> str:
         """Get a valid access token, refreshing if necessary."""
-        current_time = time.time()
-        if self.access_token and current_time < (self.token_expires_at - self.token_buffer_seconds):
+        if self._has_valid_token():
             return self.access_token
         return self._refresh_access_token()
     
     def _refresh_access_token(self) -> str:
         """Request a new access token from Zoom OAuth endpoint."""
         try:
-            credentials = f"{self.client_id}:{self.client_secret}"
-            encoded_credentials = base64.b64encode(credentials.encode()).decode()
-            
-            headers = {
-                "Authorization": f"Basic {encoded_credentials}",
-                "Content-Type": "application/x-www-form-urlencoded"
-            }
-            
             data = {"grant_type": "client_credentials"}
             
-            response = requests.post(self.oauth_url, headers=headers, data=data, timeout=10)
+            response = requests.post(self.oauth_url, headers=self._token_request_headers(), data=data, timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Failed to get access token: {response.status_code} - {response.text}")
                 raise Exception(f"Failed to get access token: {response.text}")
             
-            response_data = response.json()
-            self.access_token = response_data["access_token"]
-            self.token_expires_at = time.time() + response_data.get("expires_in", 3600)
-            
-            logger.info("Successfully obtained new Zoom access token")
-            return self.access_token
+            return self._store_token(response.json())
         except Exception as e:
             logger.error(f"Error refreshing token: {str(e)}")
             raise
     
     def _get_headers(self):
         """Get authorization headers with valid access token."""
-        token = self.get_access_token()
-        return {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        return self._auth_headers(self.get_access_token())
     
     def create_meeting(self, topic: str, start_time: datetime, duration: int = 60) -> dict:
         """Create a new Zoom meeting."""
         try:
             url = f"{self.api_base_url}/users/me/meetings"
-            
-            payload = {
-                "topic": topic,
-                "type": 2,  # Scheduled meeting
-                "start_time": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                "duration": duration,
-                "timezone": "Asia/Kolkata",
-                "password": "123456",
-                "settings": {
-                    "host_video": True,
-                    "participant_video": True,
-                    "join_before_host": False,
-                    "mute_upon_entry": False,
-                    "waiting_room": True,
-                    "audio": "voip",
-                    "auto_recording": "none"
-                }
-            }
+            payload = self._meeting_payload(topic, start_time, duration)
             
             response = requests.post(url, headers=self._get_headers(), json=payload, timeout=10)
             
@@ -92,13 +118,7 @@ class ZoomService:
                 logger.error(f"Failed to create meeting: {response.status_code} - {response.text}")
                 raise Exception(f"Failed to create meeting: {response.text}")
             
-            data = response.json()
-            return {
-                "meeting_id": str(data["id"]),
-                "join_url": data["join_url"],
-                "password": data.get("password", "123456"),
-                "start_url": data.get("start_url", "")
-            }
+            return self._meeting_result(response.json())
         except Exception as e:
             logger.error(f"Error creating Zoom meeting: {str(e)}")
             raise
@@ -132,3 +152,109 @@ class ZoomService:
         except Exception as e:
             logger.error(f"Error deleting Zoom meeting: {str(e)}")
             raise
+
+class AsyncZoomService(ZoomServiceBase):
+    """
+    Non-blocking Zoom client for use inside request handlers.
+    All calls share one keep-alive connection pool, and concurrent callers that find
+    the token expired wait on a single refresh instead of each starting their own.
+    """
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        super().__init__()
+        self._client = client
+        self._token_lock = asyncio.Lock()
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=ZOOM_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=ZOOM_MAX_CONNECTIONS, max_keepalive_connections=ZOOM_MAX_CONNECTIONS)
+            )
+        return self._client
+    
+    async def get_access_token(self) -> str:
+        """Get a valid access token, refreshing at most once for all concurrent callers."""
+        if self._has_valid_token():
+            return self.access_token
+        async with self._token_lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self._has_valid_token():
+                return self.access_token
+            return await self._refresh_access_token()
+    
+    @track_outbound("zoom", "refresh_token")
+    async def _refresh_access_token(self) -> str:
+        """Request a new access token from Zoom OAuth endpoint."""
+        try:
+            data = {"grant_type": "client_credentials"}
+            
+            response = await self._get_client().post(self.oauth_url, headers=self._token_request_headers(), data=data)
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to get access token: {response.status_code} - {response.text}")
+                raise Exception(f"Failed to get access token: {response.text}")
+            
+            return self._store_token(response.json())
+        except Exception as e:
+            logger.error(f"Error refreshing token: {str(e)}")
+            raise
+    
+    async def _get_headers(self):
+        """Get authorization headers with valid access token."""
+        return self._auth_headers(await self.get_access_token())
+    
+    @track_outbound("zoom", "create_meeting")
+    async def create_meeting(self, topic: str, start_time: datetime, duration: int = 60) -> dict:
+        """Create a new Zoom meeting."""
+        try:
+            url = f"{self.api_base_url}/users/me/meetings"
+            payload = self._meeting_payload(topic, start_time, duration)
+            
+            response = await self._get_client().post(url, headers=await self._get_headers(), json=payload)
+            
+            if response.status_code not in [200, 201]:
+                logger.error(f"Failed to create meeting: {response.status_code} - {response.text}")
+                raise Exception(f"Failed to create meeting: {response.text}")
+            
+            return self._meeting_result(response.json())
+        except Exception as e:
+            logger.error(f"Error creating Zoom meeting: {str(e)}")
+            raise
+    
+    @track_outbound("zoom", "get_meeting")
+    async def get_meeting(self, meeting_id: str) -> dict:
+        """Get details of a specific meeting."""
+        try:
+            url = f"{self.api_base_url}/meetings/{meeting_id}"
+            response = await self._get_client().get(url, headers=await self._get_headers())
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to get meeting: {response.status_code} - {response.text}")
+                raise Exception(f"Failed to get meeting: {response.text}")
+            
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error getting Zoom meeting: {str(e)}")
+            raise
+    
+    @track_outbound("zoom", "delete_meeting")
+    async def delete_meeting(self, meeting_id: str) -> None:
+        """Delete a meeting."""
+        try:
+            url = f"{self.api_base_url}/meetings/{meeting_id}"
+            response = await self._get_client().delete(url, headers=await self._get_headers())
+            
+            if response.status_code not in [204, 200]:
+                logger.error(f"Failed to delete meeting: {response.status_code} - {response.text}")
+                raise Exception(f"Failed to delete meeting: {response.text}")
+            
+            logger.info(f"Successfully deleted meeting {meeting_id}")
+        except Exception as e:
+            logger.error(f"Error deleting Zoom meeting: {str(e)}")
+            raise
+    
+    async def aclose(self):
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
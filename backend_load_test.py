@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+NAVHIM Hospital Management System Backend Load Test
+Drives a weighted mix of the booking and EMR flows at fixed concurrency and reports
+throughput, latency percentiles and error rates per endpoint as JSON
+
+    python backend_load_test.py --spawn --concurrency 32 --duration 60 --output before.json
+    python backend_load_test.py --spawn --concurrency 32 --duration 60 --output after.json --baseline before.json
+
+--spawn starts the API and the third-party stub (backend/stub_server.py) with uvicorn
+against a throwaway database on MONGO_URL, and drops the database afterwards.
+Without it the harness targets --base-url, which must already be configured with the
+stub URLs and the same RAZORPAY_KEY_SECRET as this process.
+
+To measure a build that predates the batch vitals, timeline and availability routes,
+check it out and run the same command. Where a route answers 404 the harness uses what
+the app called before it: per-reading POST /emr/vitals for seeding, /emr/vitals plus
+/emr/prescriptions for the EMR screen, /doctors/{id}/booked-slots for slots, and /health
+for readiness. Those requests are reported under their own endpoints, so the comparison
+lists them as new rather than matching them up. Builds older than the stub support in
+the Zoom and Razorpay clients cannot reach the stub, so pass --mix without `pay` for them.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+import requests
+
+from backend_perf_test import percentile
+
+# Configuration
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+BASE_URL = os.getenv("NAVHIM_API_URL", "http://localhost:8001/api")
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID", "rzp_test_load")
+RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET", "load-test-secret")
+TEST_PASSWORD = "Test@123"
+
+sys.path.insert(0, BACKEND_DIR)
+from razorpay_service import compute_payment_signature  # noqa: E402
+
+# Flow -> relative weight; roughly what the app does for one booking
+DEFAULT_MIX = {"login": 1, "doctors": 4, "slots": 4, "book": 1, "pay": 1, "emr": 3}
+
+# Slot starts inside the default clinic hours
+SLOT_TIMES = [f"{hour:02d}:{minute:02d}" for hour in (9, 10, 11, 12, 14, 15, 16, 17, 18) for minute in (0, 30)]
+
+# Statuses that are a correct answer under load, not an error: two workers picking
+# the same slot is expected and the loser gets a 409
+ACCEPTED_STATUSES = {
+    "POST /appointments/book": {201, 409},
+}
+
+
+class Sample(NamedTuple):
+    endpoint: str
+    latency_ms: float
+    status: int
+    ok: bool
+
+
+class NAVHIMLoadTester:
+    def __init__(self, base_url: str = BASE_URL, seed: int = 1):
+        self.base_url = base_url
+        self.seed = seed
+        self.patients: List[Dict] = []
+        self.doctor_ids: List[str] = []
+        # "vitals_batch", "emr_timeline", "availability": routes the API under test lacks, found by setup
+        self.legacy_routes: set = set()
+
+    def make_request(self, method: str, endpoint: str, data: Dict = None, token: str = None,
+                     session: requests.Session = None) -> requests.Response:
+        """Make HTTP request with proper headers"""
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return (session or requests).request(method, f"{self.base_url}{endpoint}", json=data,
+                                             headers=headers, timeout=60)
+
+    def register_user(self, role: str) -> Dict:
+        """Register a throwaway user and return its email and access token"""
+        email = f"load-{uuid.uuid4().hex[:12]}@test.com"
+        response = self.make_request("POST", "/auth/register", {
+            "email": email,
+            "password": TEST_PASSWORD,
+            "first_name": "Load",
+            "last_name": role.capitalize(),
+            "phone": "+1234567890",
+            "date_of_birth": "1990-01-01",
+            "gender": "male",
+            "role": role
+        })
+        response.raise_for_status()
+        return {"email": email, "token": response.json()["access_token"]}
+
+    def route_exists(self, method: str, endpoint: str, data=None, token: str = None) -> bool:
+        """False if the API answers 404 for `endpoint`, i.e. the build under test predates it"""
+        return self.make_request(method, endpoint, data, token).status_code != 404
+
+    def seed_vitals(self, token: str, readings: List[Dict]):
+        if "vitals_batch" not in self.legacy_routes:
+            self.make_request("POST", "/emr/vitals/batch", readings, token).raise_for_status()
+            return
+        # Older builds stamp each reading with the server time and ignore recorded_at
+        for reading in readings:
+            self.make_request("POST", "/emr/vitals", reading, token).raise_for_status()
+
+    def setup(self, patients: int, doctors: int, vitals_per_patient: int):
+        """Create doctors with a fee, and patients with some vitals history for the EMR reads"""
+        print(f"\n=== Setup ({patients} patients, {doctors} doctors) ===")
+        # An empty batch is a 400 where the route exists, so the probe writes nothing
+        probe = self.register_user("patient")
+        if not self.route_exists("POST", "/emr/vitals/batch", [], probe["token"]):
+            self.legacy_routes.add("vitals_batch")
+        if not self.route_exists("GET", "/emr/timeline?limit=1", token=probe["token"]):
+            self.legacy_routes.add("emr_timeline")
+
+        def create_doctor(_):
+            doctor = self.register_user("doctor")
+            self.make_request("PUT", "/doctors/profile", {
+                "specialization": "Load Testing",
+                "consultation_fee": 500.0,
+            }, doctor["token"]).raise_for_status()
+
+        def create_patient(index: int) -> Dict:
+            patient = self.register_user("patient")
+            rng = random.Random(f"{self.seed}-vitals-{index}")
+            started_at = datetime.utcnow() - timedelta(hours=vitals_per_patient)
+            readings = [{
+                "heart_rate": rng.randint(55, 110),
+                "blood_pressure_systolic": rng.randint(100, 150),
+                "blood_pressure_diastolic": rng.randint(60, 95),
+                "oxygen_saturation": rng.randint(92, 100),
+                "recorded_at": (started_at + timedelta(hours=i)).isoformat() + "Z",
+            } for i in range(vitals_per_patient)]
+            if readings:
+                self.seed_vitals(patient["token"], readings)
+            return patient
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(create_doctor, range(doctors)))
+            self.patients = list(pool.map(create_patient, range(patients)))
+
+        response = self.make_request("GET", "/doctors/list?limit=100")
+        response.raise_for_status()
+        self.doctor_ids = [doctor["id"] for doctor in response.json()["doctors"]]
+        if not self.doctor_ids:
+            raise RuntimeError("No doctors available after setup")
+        today = date.today()
+        if not self.route_exists("GET", f"/doctors/{self.doctor_ids[0]}/availability?start_date={today}&end_date={today}"):
+            self.legacy_routes.add("availability")
+        print(f"   {len(self.patients)} patients, {len(self.doctor_ids)} doctors ready")
+        if self.legacy_routes:
+            print(f"   Using legacy endpoints for: {', '.join(sorted(self.legacy_routes))}")
+
+    # --- Flows. Each one issues its requests through `call`, which records a sample per request.
+
+    def call(self, samples: List[Sample], session: requests.Session, method: str, endpoint: str, path: str,
+             data: Dict = None, token: str = None) -> Optional[requests.Response]:
+        """Issue one request and record it under `endpoint`, the route template it hits"""
+        label = f"{method} {endpoint}"
+        started = time.perf_counter()
+        try:
+            response = self.make_request(method, path, data, token, session)
+        except requests.exceptions.RequestException:
+            samples.append(Sample(label, (time.perf_counter() - started) * 1000, 0, False))
+            return None
+        latency_ms = (time.perf_counter() - started) * 1000
+        ok = response.status_code in ACCEPTED_STATUSES.get(label, ()) or response.status_code < 400
+        samples.append(Sample(label, latency_ms, response.status_code, ok))
+        return response
+
+    def flow_login(self, samples, session, rng):
+        patient = rng.choice(self.patients)
+        self.call(samples, session, "POST", "/auth/login", "/auth/login",
+                  {"email": patient["email"], "password": TEST_PASSWORD})
+
+    def flow_doctors(self, samples, session, rng):
+        self.call(samples, session, "GET", "/doctors/list", "/doctors/list?limit=20")
+
+    def flow_slots(self, samples, session, rng):
+        doctor_id = rng.choice(self.doctor_ids)
+        start = date.today() + timedelta(days=rng.randint(1, 60))
+        if "availability" in self.legacy_routes:
+            # Before the availability route the booking screen asked for one day at a time
+            self.call(samples, session, "GET", "/doctors/{doctor_id}/booked-slots",
+                      f"/doctors/{doctor_id}/booked-slots?date={start}")
+            return
+        self.call(samples, session, "GET", "/doctors/{doctor_id}/availability",
+                  f"/doctors/{doctor_id}/availability?start_date={start}&end_date={start + timedelta(days=6)}")
+
+    def book(self, samples, session, rng, patient: Dict, appointment_type: str) -> Optional[str]:
+        """Book a random far-future slot; returns the appointment id, or None if the slot was taken"""
+        # Far enough out that reruns against a kept database rarely collide
+        day = date.today() + timedelta(days=rng.randint(400, 4000))
+        response = self.call(samples, session, "POST", "/appointments/book", "/appointments/book", {
+            "doctor_id": rng.choice(self.doctor_ids),
+            "appointment_date": day.isoformat(),
+            "appointment_time": rng.choice(SLOT_TIMES),
+            "appointment_type": appointment_type,
+        }, patient["token"])
+        if response is None or response.status_code != 201:
+            return None
+        return response.json()["id"]
+
+    def flow_book(self, samples, session, rng):
+        self.book(samples, session, rng, rng.choice(self.patients), "in_person")
+
+    def flow_pay(self, samples, session, rng):
+        """Video booking through checkout: book, create the Razorpay order, verify the signed payment"""
+        patient = rng.choice(self.patients)
+        appointment_id = self.book(samples, session, rng, patient, "video")
+        if appointment_id is None:
+            return
+        response = self.call(samples, session, "POST", "/payments/create-order", "/payments/create-order",
+                             {"appointment_id": appointment_id, "amount": 500.0}, patient["token"])
+        if response is None or not response.ok:
+            return
+        order_id = response.json()["order_id"]
+        payment_id = f"pay_{uuid.UUID(int=rng.getrandbits(128)).hex[:14]}"
+        self.call(samples, session, "POST", "/payments/verify", "/payments/verify", {
+            "appointment_id": appointment_id,
+            "razorpay_order_id": order_id,
+            "razorpay_payment_id": payment_id,
+            "razorpay_signature": compute_payment_signature(RAZORPAY_KEY_SECRET, order_id, payment_id),
+        }, patient["token"])
+
+    def flow_emr(self, samples, session, rng):
+        """What the EMR screen loads: the timeline, then the vitals trend chart"""
+        patient = rng.choice(self.patients)
+        if "emr_timeline" in self.legacy_routes:
+            # Before the timeline the screen loaded vitals and prescriptions separately
+            self.call(samples, session, "GET", "/emr/vitals", "/emr/vitals?limit=100", token=patient["token"])
+            self.call(samples, session, "GET", "/emr/prescriptions", "/emr/prescriptions", token=patient["token"])
+            return
+        self.call(samples, session, "GET", "/emr/timeline", "/emr/timeline?limit=50", token=patient["token"])
+        self.call(samples, session, "GET", "/emr/vitals", "/emr/vitals?limit=100", token=patient["token"])
+
+    # --- Load phase
+
+    def run(self, mix: Dict[str, int], concurrency: int, duration: float, warmup: float) -> Dict:
+        """Run `concurrency` workers for warmup + duration seconds; only the measured part is reported"""
+        print(f"\n=== Load ({concurrency} workers, {warmup:g}s warmup + {duration:g}s, mix {mix}) ===")
+        flows = [getattr(self, f"flow_{name}") for name in mix]
+        weights = list(mix.values())
+        start_barrier = threading.Barrier(concurrency + 1)
+        per_worker: List[List[Sample]] = [[] for _ in range(concurrency)]
+        window = {}
+
+        def worker(index: int):
+            rng = random.Random(f"{self.seed}-worker-{index}")
+            session = requests.Session()
+            samples = per_worker[index]
+            start_barrier.wait()
+            while time.perf_counter() < window["end"]:
+                before = len(samples)
+                rng.choices(flows, weights)[0](samples, session, rng)
+                if time.perf_counter() < window["start"]:
+                    del samples[before:]
+
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        window["start"] = time.perf_counter() + warmup
+        window["end"] = window["start"] + duration
+        start_barrier.wait()
+        for thread in threads:
+            thread.join()
+        # Flows still in flight at the deadline finish late; throughput uses the real span
+        measured = max(time.perf_counter() - window["start"], 1e-9)
+        return summarize([sample for samples in per_worker for sample in samples], measured)
+
+
+def latency_stats(samples: List[Sample], seconds: float) -> Dict:
+    latencies = [sample.latency_ms for sample in samples]
+    errors = sum(1 for sample in samples if not sample.ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / seconds, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies, default=0.0), 2),
+    }
+
+
+def summarize(samples: List[Sample], seconds: float) -> Dict:
+    by_endpoint: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample.endpoint, []).append(sample)
+    endpoints = {}
+    for endpoint, endpoint_samples in by_endpoint.items():
+        stats = latency_stats(endpoint_samples, seconds)
+        statuses: Dict[str, int] = {}
+        for sample in endpoint_samples:
+            statuses[str(sample.status)] = statuses.get(str(sample.status), 0) + 1
+        stats["statuses"] = statuses
+        endpoints[endpoint] = stats
+    return {"measured_s": round(seconds, 2), "totals": latency_stats(samples, seconds), "endpoints": endpoints}
+
+
+def print_report(report: Dict):
+    print("\n" + "=" * 96)
+    print("📊 LOAD TEST SUMMARY")
+    print("=" * 96)
+    print(f"{'endpoint':<48}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>12}")
+    rows = sorted(report["endpoints"].items()) + [("TOTAL", report["totals"])]
+    for endpoint, stats in rows:
+        print(f"{endpoint:<48}{stats['throughput_rps']:>9.1f}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}"
+              f"{stats['p99_ms']:>9.1f}{stats['errors']:>6} ({stats['error_rate']:.1%})")
+    print("=" * 96)
+
+
+def compare(report: Dict, baseline: Dict, max_p99_regression: Optional[float]) -> bool:
+    """Print per-endpoint changes against a baseline report; False if a p99 regressed past the limit"""
+    print(f"\n=== Compared with baseline ({baseline['meta'].get('git_rev', 'unknown')}) ===")
+    ok = True
+    current = dict(report["endpoints"], TOTAL=report["totals"])
+    previous = dict(baseline["endpoints"], TOTAL=baseline["totals"])
+    for endpoint in sorted(current):
+        if endpoint not in previous:
+            print(f"   {endpoint}: new")
+            continue
+        before, after = previous[endpoint], current[endpoint]
+
+        def change(key: str) -> float:
+            return (after[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+
+        regressed = max_p99_regression is not None and change("p99_ms") > max_p99_regression
+        ok = ok and not regressed
+        status = "❌" if regressed else "  "
+        print(f" {status} {endpoint:<45} req/s {change('throughput_rps'):+6.1f}%  p95 {change('p95_ms'):+6.1f}%  "
+              f"p99 {change('p99_ms'):+6.1f}%  errors {before['error_rate']:.1%} -> {after['error_rate']:.1%}")
+    return ok
+
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BACKEND_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class SpawnedStack:
+    """The API and the third-party stub under uvicorn, on a throwaway database"""
+
+    def __init__(self, api_port: int, stub_port: int, workers: int, keep_db: bool = False):
+        self.api_port = api_port
+        self.stub_port = stub_port
+        self.workers = workers
+        self.keep_db = keep_db
+        self.db_name = f"navhim_load_{uuid.uuid4().hex[:8]}"
+        self.processes: List[subprocess.Popen] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.api_port}/api"
+
+    def _uvicorn(self, app: str, port: int, env: Dict, workers: int = 1) -> subprocess.Popen:
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+
+    def __enter__(self) -> "SpawnedStack":
+        stub = f"http://127.0.0.1:{self.stub_port}"
+        env = dict(
+            os.environ,
+            MONGO_URL=MONGO_URL,
+            DB_NAME=self.db_name,
+            ZOOM_ACCOUNT_ID="load",
+            ZOOM_CLIENT_ID="load",
+            ZOOM_CLIENT_SECRET="load",
+            ZOOM_OAUTH_URL=f"{stub}/zoom/oauth/token",
+            ZOOM_API_BASE_URL=f"{stub}/zoom/v2",
+            RAZORPAY_KEY_ID=RAZORPAY_KEY_ID,
+            RAZORPAY_KEY_SECRET=RAZORPAY_KEY_SECRET,
+            RAZORPAY_API_BASE_URL=f"{stub}/razorpay/v1",
+        )
+        print(f"Starting API on :{self.api_port} ({self.workers} workers, database {self.db_name}) "
+              f"and stub on :{self.stub_port}")
+        self.processes.append(self._uvicorn("stub_server:app", self.stub_port, env))
+        self.processes.append(self._uvicorn("server:app", self.api_port, env, self.workers))
+        try:
+            self._wait_until_ready()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _wait_until_ready(self, timeout: float = 60.0):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if any(process.poll() is not None for process in self.processes):
+                raise RuntimeError("API or stub exited during startup")
+            try:
+                response = requests.get(f"{self.base_url}/health/ready", timeout=2)
+                if response.status_code == 404:
+                    # Builds without the readiness probe
+                    response = requests.get(f"{self.base_url}/health", timeout=2)
+                if response.ok:
+                    return
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"API not ready after {timeout:.0f}s")
+
+    def __exit__(self, *exc):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        if not self.keep_db:
+            from pymongo import MongoClient
+            with MongoClient(MONGO_URL) as mongo:
+                mongo.drop_database(self.db_name)
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """`login=1,doctors=4,...` -> {"login": 1, "doctors": 4, ...}"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown flow {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        try:
+            mix[name] = int(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight for {name} must be an integer")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("at least one flow needs a positive weight")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="NAVHIM backend load test")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--spawn", action="store_true", help="start the API and the Zoom/Razorpay stub locally")
+    parser.add_argument("--api-port", type=int, default=8011)
+    parser.add_argument("--stub-port", type=int, default=8012)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn")
+    parser.add_argument("--keep-db", action="store_true", help="keep the --spawn database for inspection")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of load before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="flow weights, e.g. login=1,doctors=4,slots=4,book=1,pay=1,emr=3")
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--vitals", type=int, default=200, help="vitals readings seeded per patient")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--max-p99-regression", type=float,
+                        help="with --baseline, exit 1 if any endpoint's p99 grows by more than this many percent")
+    args = parser.parse_args()
+
+    spawned = SpawnedStack(args.api_port, args.stub_port, args.workers, args.keep_db) if args.spawn else nullcontext()
+    with spawned as stack:
+        base_url = stack.base_url if stack else args.base_url
+        tester = NAVHIMLoadTester(base_url, args.seed)
+        tester.setup(args.patients, args.doctors, args.vitals)
+        result = tester.run(args.mix, args.concurrency, args.duration, args.warmup)
+
+    report = {
+        "meta": {
+            "git_rev": git_rev(),
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "base_url": base_url,
+            "spawned": args.spawn,
+            "workers": args.workers if args.spawn else None,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": args.mix,
+            "patients": args.patients,
+            "doctors": args.doctors,
+            "seed": args.seed,
+            "legacy_routes": sorted(tester.legacy_routes),
+        },
+        **result,
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Report written to {args.output}")
+
+    ok = report["totals"]["requests"] > 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            ok = compare(report, json.load(f), args.max_p99_regression) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,634 @@
+#!/usr/bin/env python3
+"""
+NAVHIM Hospital Management System Backend Performance Tests
+Concurrency and latency checks against a running API backed by a local MongoDB
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import requests
+from bson import ObjectId
+
+# Configuration
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+BASE_URL = os.getenv("NAVHIM_API_URL", "http://localhost:8001/api")
+TEST_PASSWORD = "Test@123"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class NAVHIMPerfTester:
+    def __init__(self, base_url: str = BASE_URL):
+        self.base_url = base_url
+        self.test_results = []
+
+    def log_result(self, test_name: str, success: bool, message: str, response_data: Any = None):
+        """Log test results"""
+        result = {
+            "test": test_name,
+            "success": success,
+            "message": message,
+            "timestamp": datetime.now().isoformat(),
+            "response_data": response_data
+        }
+        self.test_results.append(result)
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {message}")
+        if not success and response_data:
+            print(f"   Response: {response_data}")
+
+    def make_request(self, method: str, endpoint: str, data: Dict = None, token: str = None,
+                     session: requests.Session = None) -> requests.Response:
+        """Make HTTP request with proper headers"""
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return (session or requests).request(method, f"{self.base_url}{endpoint}", json=data,
+                                             headers=headers, timeout=60)
+
+    def register_patient(self, email: str = None) -> str:
+        """Register a throwaway patient and return its access token"""
+        return self.register_user("patient", email)
+
+    def register_user(self, role: str, email: str = None) -> str:
+        """Register a throwaway user with the given role and return its access token"""
+        response = self.make_request("POST", "/auth/register", {
+            "email": email or f"perf-{uuid.uuid4().hex[:12]}@test.com",
+            "password": TEST_PASSWORD,
+            "first_name": "Perf",
+            "last_name": role.capitalize(),
+            "phone": "+1234567890",
+            "date_of_birth": "1990-01-01",
+            "gender": "male",
+            "role": role
+        })
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    def first_doctor_id(self) -> str:
+        response = self.make_request("GET", "/doctors/list")
+        response.raise_for_status()
+        doctors = response.json().get("doctors", [])
+        if not doctors:
+            raise RuntimeError("No doctors found - run seed.py first")
+        return doctors[0]["id"]
+
+    def test_booking_race(self, bookings: int = 300, patients: int = 20):
+        """Fire simultaneous bookings at a single slot; exactly one may succeed"""
+        print(f"\n=== Booking Race ({bookings} concurrent requests) ===")
+        try:
+            doctor_id = self.first_doctor_id()
+            tokens = [self.register_patient() for _ in range(patients)]
+        except Exception as e:
+            self.log_result("Booking Race", False, f"Setup error: {str(e)}")
+            return False
+
+        # A random far-future slot so reruns do not collide with earlier bookings
+        slot = datetime.now() + timedelta(days=random.randint(400, 4000))
+        payload = {
+            "doctor_id": doctor_id,
+            "appointment_date": slot.strftime("%Y-%m-%d"),
+            "appointment_time": random.choice(["09:00", "10:30", "14:00", "17:30"]),
+            "appointment_type": "in_person",
+        }
+        barrier = threading.Barrier(bookings)
+
+        def book(index: int) -> int:
+            barrier.wait()
+            try:
+                return self.make_request("POST", "/appointments/book", payload, tokens[index % len(tokens)]).status_code
+            except requests.exceptions.RequestException:
+                return -1
+
+        with ThreadPoolExecutor(max_workers=bookings) as pool:
+            statuses = list(pool.map(book, range(bookings)))
+
+        counts = {code: statuses.count(code) for code in set(statuses)}
+        success = counts.get(201, 0) == 1 and counts.get(409, 0) == bookings - 1
+        self.log_result(
+            "Booking Race",
+            success,
+            f"{counts.get(201, 0)} booked, {counts.get(409, 0)} rejected with 409",
+            {"slot": payload, "status_counts": counts}
+        )
+        return success
+
+    def sample_health_latency(self, duration: float, stop: threading.Event = None, base_url: str = None) -> List[float]:
+        """Poll /health sequentially and return latencies in milliseconds"""
+        latencies = []
+        session = requests.Session()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline and not (stop and stop.is_set()):
+            started = time.perf_counter()
+            session.get(f"{base_url or self.base_url}/health", timeout=60)
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+        return latencies
+
+    def login_storm(self, base_url: str, concurrency: int, duration: float) -> Dict:
+        """/health latency idle and while `concurrency` clients log in back to back against one server"""
+        email = f"perf-{uuid.uuid4().hex[:12]}@test.com"
+        tester = NAVHIMPerfTester(base_url)
+        tester.register_patient(email)
+
+        idle = self.sample_health_latency(duration / 2, base_url=base_url)
+
+        stop = threading.Event()
+        login_statuses = []
+
+        def login_loop():
+            session = requests.Session()
+            while not stop.is_set():
+                response = tester.make_request("POST", "/auth/login", {"email": email, "password": TEST_PASSWORD},
+                                               session=session)
+                login_statuses.append(response.status_code)
+
+        workers = [threading.Thread(target=login_loop, daemon=True) for _ in range(concurrency)]
+        for worker in workers:
+            worker.start()
+        try:
+            storm = self.sample_health_latency(duration, base_url=base_url)
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+        return {
+            "idle_p50_ms": round(percentile(idle, 50), 2),
+            "idle_p99_ms": round(percentile(idle, 99), 2),
+            "storm_p50_ms": round(percentile(storm, 50), 2),
+            "storm_p99_ms": round(percentile(storm, 99), 2),
+            "logins": len(login_statuses),
+            "logins_ok": login_statuses.count(200),
+            "logins_503": login_statuses.count(503),
+        }
+
+    def test_login_storm(self, concurrency: int = 32, duration: float = 10.0, p99_budget_ms: float = 100.0,
+                         inline_base_url: str = None):
+        """
+        Measure /health p99 latency while logins hammer bcrypt. With `inline_base_url`, a
+        second server started with PASSWORD_POOL_KIND=inline (bcrypt on the event loop, as
+        before the pool) gets the same storm, so both numbers come from one run.
+        """
+        print(f"\n=== Login Storm ({concurrency} concurrent logins for {duration:.0f}s) ===")
+        try:
+            stats = self.login_storm(self.base_url, concurrency, duration)
+            inline = self.login_storm(inline_base_url, concurrency, duration) if inline_base_url else None
+        except Exception as e:
+            self.log_result("Login Storm", False, f"Setup error: {str(e)}")
+            return False
+
+        success = stats["storm_p99_ms"] <= p99_budget_ms
+        message = (f"/health p99 {stats['idle_p99_ms']}ms idle -> {stats['storm_p99_ms']}ms under load "
+                   f"(budget {p99_budget_ms:.0f}ms)")
+        if inline:
+            message += (f"; inline bcrypt {inline['idle_p99_ms']}ms -> {inline['storm_p99_ms']}ms, "
+                        f"{inline['logins']} vs {stats['logins']} logins")
+            stats = {"pool": stats, "inline": inline}
+        self.log_result("Login Storm", success, message, stats)
+        print(f"   {stats}")
+        return success
+
+    def test_next_available(self, doctors: int = 300, queries: int = 200, p99_budget_ms: float = 100.0):
+        """Latency of /doctors/next-available for one specialization with many doctors"""
+        print(f"\n=== Next Available Slot ({doctors} doctors, {queries} queries) ===")
+        specialization = f"Perfology {uuid.uuid4().hex[:8]}"
+
+        def create_doctor(_):
+            token = self.register_user("doctor")
+            self.make_request("PUT", "/doctors/profile", {"specialization": specialization}, token).raise_for_status()
+
+        try:
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                list(pool.map(create_doctor, range(doctors)))
+        except Exception as e:
+            self.log_result("Next Available Slot", False, f"Setup error: {str(e)}")
+            return False
+
+        session = requests.Session()
+        endpoint = f"/doctors/next-available?specialization={specialization}&limit=5"
+        started = time.perf_counter()
+        first = self.make_request("GET", endpoint, session=session)
+        cold_ms = (time.perf_counter() - started) * 1000
+
+        latencies = []
+        for _ in range(queries):
+            started = time.perf_counter()
+            self.make_request("GET", endpoint, session=session)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        stats = {
+            "cold_ms": round(cold_ms, 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "doctors_in_result": len(first.json().get("doctors", {})) if first.ok else 0,
+        }
+        success = first.ok and len(first.json().get("slots", [])) == 5 and stats["p99_ms"] <= p99_budget_ms
+        self.log_result(
+            "Next Available Slot",
+            success,
+            f"cold {stats['cold_ms']}ms, warm p50 {stats['p50_ms']}ms / p99 {stats['p99_ms']}ms "
+            f"(budget {p99_budget_ms:.0f}ms)",
+            stats if success else first.text
+        )
+        print(f"   {stats}")
+        return success
+
+    def test_auth_overhead(self, iterations: int = 20000):
+        """Microbenchmark per-request token verification with and without the verified-token cache"""
+        print(f"\n=== Auth Overhead ({iterations} verifications) ===")
+        import asyncio
+        import sys
+        sys.path.insert(0, BACKEND_DIR)
+        from fastapi.security.http import HTTPAuthorizationCredentials
+        import auth
+
+        user = {
+            "_id": ObjectId(), "email": "perf@test.com", "role": "patient", "first_name": "Perf",
+            "last_name": "Patient", "phone": "+1234567890", "date_of_birth": "1990-01-01", "gender": "male",
+            "profile_image": None, "created_at": datetime.utcnow()
+        }
+        plain_token = auth.create_access_token({"sub": str(user["_id"]), "email": user["email"], "role": user["role"]})
+        profile_token = auth.create_access_token({**auth.token_claims(user), "profile": auth.profile_claims(user)})
+
+        def per_call_us(fn) -> float:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            return (time.perf_counter() - started) / iterations * 1e6
+
+        def uncached(token):
+            auth.token_cache.clear()
+            return auth.decode_access_token(token)
+
+        async def dependency_loop(token):
+            credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await auth.get_current_user(credentials)
+            return (time.perf_counter() - started) / iterations * 1e6
+
+        stats = {
+            "verify_uncached_us": round(per_call_us(lambda: uncached(plain_token)), 2),
+            "verify_cached_us": round(per_call_us(lambda: auth.decode_access_token(plain_token)), 2),
+            "verify_uncached_with_profile_us": round(per_call_us(lambda: uncached(profile_token)), 2),
+            "verify_cached_with_profile_us": round(per_call_us(lambda: auth.decode_access_token(profile_token)), 2),
+            "get_current_user_cached_us": round(asyncio.run(dependency_loop(profile_token)), 2),
+            "plain_token_bytes": len(plain_token),
+            "profile_token_bytes": len(profile_token),
+        }
+        success = stats["verify_cached_us"] < stats["verify_uncached_us"]
+        self.log_result(
+            "Auth Overhead",
+            success,
+            f"verify {stats['verify_uncached_us']}us uncached -> {stats['verify_cached_us']}us cached",
+            stats
+        )
+        print(f"   {stats}")
+        return success
+
+    def test_serialization(self, page_sizes: List[int] = (100, 500), iterations: int = 200):
+        """Serialization cost of an /appointments/my page: jsonable_encoder + json vs FastJSONResponse"""
+        import json
+        import sys
+        sys.path.insert(0, BACKEND_DIR)
+        from fastapi.encoders import jsonable_encoder
+        from fastapi.responses import JSONResponse
+        from responses import FastJSONResponse
+
+        def appointment(index: int, booked_at: datetime) -> Dict:
+            return {
+                "id": str(ObjectId()), "patient_id": str(ObjectId()), "doctor_id": str(ObjectId()),
+                "appointment_datetime": booked_at, "appointment_type": "video", "status": "scheduled",
+                "symptoms": "Persistent headache and mild fever for three days", "notes": None,
+                "consultation_fee": 800.0, "payment_status": "completed",
+                "zoom_meeting_id": f"mock_{index}", "zoom_join_url": f"https://zoom.us/j/mock_{index}",
+                "zoom_password": "demo123",
+                "patient_details": {"first_name": "Perf", "last_name": "Patient"},
+                "doctor_details": {"first_name": "Rajesh", "last_name": "Sharma", "specialization": "Cardiologist"},
+            }
+
+        def per_call_ms(fn) -> float:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            return (time.perf_counter() - started) / iterations * 1000
+
+        all_ok = True
+        for size in page_sizes:
+            print(f"\n=== /appointments/my Serialization ({size} appointments) ===")
+            now = datetime.now().replace(microsecond=0)
+            page = [appointment(i, now + timedelta(minutes=30 * i)) for i in range(size)]
+            # The old handlers pre-formatted datetimes before FastAPI's encode pass
+            legacy_page = [{**appt, "appointment_datetime": appt["appointment_datetime"].isoformat()} for appt in page]
+            legacy_body = {"appointments": legacy_page, "next_cursor": None}
+            fast_body = {"appointments": page, "next_cursor": None}
+
+            legacy = lambda: JSONResponse(jsonable_encoder(legacy_body)).body
+            fast = lambda: FastJSONResponse(fast_body).body
+
+            stats = {
+                "stdlib_ms": round(per_call_ms(legacy), 3),
+                "fast_ms": round(per_call_ms(fast), 3),
+                "bytes": len(fast()),
+            }
+            stats["speedup"] = round(stats["stdlib_ms"] / stats["fast_ms"], 1)
+            success = json.loads(legacy()) == json.loads(fast()) and stats["fast_ms"] < stats["stdlib_ms"]
+            all_ok = all_ok and success
+            self.log_result(
+                f"Serialization {size}",
+                success,
+                f"{stats['stdlib_ms']}ms -> {stats['fast_ms']}ms per response ({stats['speedup']}x), identical JSON",
+                stats
+            )
+            print(f"   {stats}")
+        return all_ok
+
+    def test_search_index(self, sizes: List[int] = (10_000, 100_000), queries: int = 500,
+                          p99_budget_ms: float = 100.0):
+        """Benchmark DoctorSearchIndex queries in-process over synthetic directories"""
+        import sys
+        sys.path.insert(0, BACKEND_DIR)
+        from doctor_search import DoctorSearchIndex
+
+        first_names = ["Aarav", "Priya", "Rahul", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rohan", "Meera",
+                       "Karan", "Isha", "Aditya", "Pooja", "Nikhil", "Divya", "Sanjay", "Neha", "Rajesh", "Lakshmi"]
+        last_names = ["Sharma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Singh", "Menon", "Rao", "Das",
+                      "Kapoor", "Joshi", "Bhat", "Verma", "Chopra", "Pillai", "Kumar", "Mehta", "Sen", "Ghosh"]
+        specializations = ["Cardiology", "Dermatology", "Neurology", "Orthopedics", "Pediatrics", "Psychiatry",
+                           "General Medicine", "Gynecology", "Ophthalmology", "Oncology", "Endocrinology", "ENT"]
+        qualifications = ["MBBS", "MD", "MS", "DM", "MCh", "DNB", "FRCS", "MRCP"]
+        bio_words = ["experienced", "consultant", "specialist", "care", "diabetes", "heart", "skin", "children",
+                     "surgery", "clinic", "hospital", "research", "preventive", "chronic", "pain", "sports"]
+        query_mix = {
+            "typeahead": lambda rng: rng.choice(first_names + last_names)[:rng.randint(2, 4)],
+            "full-text": lambda rng: f"{rng.choice(specializations).split()[0]} {rng.choice(bio_words)}",
+            "filtered": lambda rng: rng.choice(specializations)[:5],
+        }
+
+        all_ok = True
+        for size in sizes:
+            print(f"\n=== Doctor Search Index ({size} doctors, {queries} queries per type) ===")
+            rng = random.Random(size)
+            cards = [{
+                "id": str(ObjectId()),
+                "user_id": str(ObjectId()),
+                "first_name": rng.choice(first_names),
+                "last_name": rng.choice(last_names),
+                "specialization": rng.choice(specializations),
+                "qualifications": rng.sample(qualifications, 2),
+                "experience": rng.randint(0, 40),
+                "consultation_fee": float(rng.randrange(200, 3000, 50)),
+                "rating": round(rng.uniform(3, 5), 1),
+                "bio": " ".join(rng.sample(bio_words, 6)),
+                "verified": rng.random() < 0.7,
+            } for _ in range(size)]
+
+            started = time.perf_counter()
+            index = DoctorSearchIndex(cards)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            stats = {"build_ms": round(build_ms, 1), "terms": len(index.terms)}
+            for kind, make_query in query_mix.items():
+                latencies = []
+                for _ in range(queries):
+                    text = make_query(rng)
+                    started = time.perf_counter()
+                    if kind == "filtered":
+                        index.search(specialization=text, min_fee=500, max_fee=1500, min_experience=5, verified=True)
+                    else:
+                        index.search(text)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                stats[f"{kind}_p50_ms"] = round(percentile(latencies, 50), 3)
+                stats[f"{kind}_p99_ms"] = round(percentile(latencies, 99), 3)
+
+            worst_p99 = max(value for key, value in stats.items() if key.endswith("_p99_ms"))
+            success = worst_p99 <= p99_budget_ms
+            all_ok = all_ok and success
+            self.log_result(
+                f"Doctor Search {size}",
+                success,
+                f"built in {stats['build_ms']}ms, worst p99 {worst_p99}ms (budget {p99_budget_ms:.0f}ms)",
+                stats
+            )
+            print(f"   {stats}")
+        return all_ok
+
+    def test_vitals_batch(self, readings: int = 10_000, uploads: int = 5):
+        """Throughput of /emr/vitals/batch: in-process parse + validate, then live uploads"""
+        import sys
+        sys.path.insert(0, BACKEND_DIR)
+        import orjson
+        from vitals_store import parse_vitals_batch, validate_vitals_batch
+
+        print(f"\n=== Vitals Batch Ingestion ({readings} readings per request) ===")
+        started_at = datetime.utcnow() - timedelta(minutes=readings)
+        batch = [{
+            "heart_rate": random.randint(55, 110),
+            "blood_pressure_systolic": random.randint(100, 150),
+            "blood_pressure_diastolic": random.randint(60, 95),
+            "oxygen_saturation": random.randint(92, 100),
+            "recorded_at": (started_at + timedelta(minutes=i)).isoformat() + "Z",
+        } for i in range(readings)]
+        bodies = {
+            "application/json": orjson.dumps(batch),
+            "application/x-ndjson": b"\n".join(orjson.dumps(reading) for reading in batch),
+        }
+
+        all_ok = True
+        for content_type, body in bodies.items():
+            started = time.perf_counter()
+            documents, _, errors = validate_vitals_batch(parse_vitals_batch(body, content_type), "perf", "perf")
+            validate_ms = (time.perf_counter() - started) * 1000
+            stats = {
+                "body_kb": len(body) // 1024,
+                "validate_ms": round(validate_ms, 1),
+                "validate_per_s": round(readings / validate_ms * 1000),
+            }
+
+            try:
+                token = self.register_patient()
+                session = requests.Session()
+                headers = {"Content-Type": content_type, "Authorization": f"Bearer {token}"}
+                latencies = []
+                for _ in range(uploads):
+                    started = time.perf_counter()
+                    response = session.post(f"{self.base_url}/emr/vitals/batch", data=body, headers=headers, timeout=120)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    response.raise_for_status()
+            except Exception as e:
+                self.log_result(f"Vitals Batch {content_type}", False, f"Upload error: {str(e)}", stats)
+                all_ok = False
+                continue
+
+            result = response.json()
+            stats["request_p50_ms"] = round(percentile(latencies, 50), 1)
+            stats["readings_per_s"] = round(readings / stats["request_p50_ms"] * 1000)
+            success = len(documents) == readings and not errors and result["inserted"] == readings and not result["errors"]
+            all_ok = all_ok and success
+            self.log_result(
+                f"Vitals Batch {content_type}",
+                success,
+                f"validate {stats['validate_ms']}ms in-process, request p50 {stats['request_p50_ms']}ms "
+                f"({stats['readings_per_s']} readings/s)",
+                stats if success else result
+            )
+            print(f"   {stats}")
+        return all_ok
+
+    def test_conditional_get(self, polls: int = 200):
+        """Bytes and latency of repeat polls: full gzip responses vs If-None-Match revalidation"""
+        print(f"\n=== Conditional GET ({polls} polls per endpoint) ===")
+        try:
+            token = self.register_patient()
+        except Exception as e:
+            self.log_result("Conditional GET", False, f"Setup error: {str(e)}")
+            return False
+
+        all_ok = True
+        for endpoint in ("/doctors/list?limit=100", "/appointments/my", "/emr/timeline"):
+            session = requests.Session()
+            session.headers.update({"Authorization": f"Bearer {token}", "Accept-Encoding": "gzip"})
+            first = session.get(f"{self.base_url}{endpoint}", stream=True, timeout=60)
+            wire_bytes = len(first.raw.read())
+            etag = first.headers.get("ETag")
+
+            def poll(headers: Dict) -> List[float]:
+                latencies = []
+                for _ in range(polls):
+                    started = time.perf_counter()
+                    response = session.get(f"{self.base_url}{endpoint}", headers=headers, timeout=60)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    last_status[0] = response.status_code
+                return latencies
+
+            last_status = [None]
+            full = poll({})
+            revalidated = poll({"If-None-Match": etag} if etag else {})
+            stats = {
+                "wire_bytes": wire_bytes,
+                "encoding": first.headers.get("Content-Encoding", "identity"),
+                "full_p50_ms": round(percentile(full, 50), 2),
+                "not_modified_p50_ms": round(percentile(revalidated, 50), 2),
+            }
+            success = first.ok and etag is not None and last_status[0] == 304
+            all_ok = all_ok and success
+            self.log_result(
+                f"Conditional GET {endpoint}",
+                success,
+                f"200 p50 {stats['full_p50_ms']}ms ({wire_bytes} bytes {stats['encoding']}) vs "
+                f"304 p50 {stats['not_modified_p50_ms']}ms",
+                stats
+            )
+            print(f"   {stats}")
+        return all_ok
+
+    def test_query_budget(self, requests_per_route: int = 20, budget: float = 5.0):
+        """Mongo commands per request for the list endpoints, read from /metrics; guards against N+1 regressions"""
+        print(f"\n=== Query Budget ({requests_per_route} requests per route, budget {budget:g}) ===")
+        try:
+            token = self.register_patient()
+        except Exception as e:
+            self.log_result("Query Budget", False, f"Setup error: {str(e)}")
+            return False
+
+        metrics_url = self.base_url.rsplit("/api", 1)[0] + "/metrics"
+
+        def commands_by_handler() -> Dict[str, float]:
+            totals: Dict[str, float] = {}
+            for line in requests.get(metrics_url, timeout=30).text.splitlines():
+                if line.startswith("mongo_operations_total{"):
+                    labels, value = line.rsplit(" ", 1)
+                    handler = labels.split('handler="', 1)[1].split('"', 1)[0]
+                    totals[handler] = totals.get(handler, 0.0) + float(value)
+            return totals
+
+        routes = {
+            "/api/appointments/my": "/appointments/my",
+            "/api/emr/prescriptions": "/emr/prescriptions",
+            "/api/emr/timeline": "/emr/timeline",
+            "/api/doctors/{doctor_id}": f"/doctors/{self.first_doctor_id()}",
+        }
+        all_ok = True
+        session = requests.Session()
+        for route, endpoint in routes.items():
+            before = commands_by_handler().get(route, 0.0)
+            for _ in range(requests_per_route):
+                self.make_request("GET", endpoint, token=token, session=session)
+            per_request = (commands_by_handler().get(route, 0.0) - before) / requests_per_route
+            success = per_request <= budget
+            all_ok = all_ok and success
+            self.log_result(f"Query Budget {route}", success, f"{per_request:.1f} commands per request (budget {budget:g})")
+        return all_ok
+
+    def print_test_summary(self):
+        """Print test results summary"""
+        print("\n" + "=" * 60)
+        print("📊 PERFORMANCE TEST SUMMARY")
+        print("=" * 60)
+
+        passed = sum(1 for result in self.test_results if result["success"])
+        failed = len(self.test_results) - passed
+
+        print(f"Total Tests: {len(self.test_results)}")
+        print(f"✅ Passed: {passed}")
+        print(f"❌ Failed: {failed}")
+
+        if failed > 0:
+            print("\n🔍 FAILED TESTS:")
+            for result in self.test_results:
+                if not result["success"]:
+                    print(f"   ❌ {result['test']}: {result['message']}")
+
+        print("\n" + "=" * 60)
+
+
+TESTS = {
+    "booking-race": lambda tester, args: tester.test_booking_race(args.bookings),
+    "login-storm": lambda tester, args: tester.test_login_storm(args.concurrency, args.duration, args.p99_budget_ms,
+                                                                args.inline_base_url),
+    "auth-overhead": lambda tester, args: tester.test_auth_overhead(),
+    "next-available": lambda tester, args: tester.test_next_available(args.doctors, p99_budget_ms=args.p99_budget_ms),
+    "serialization": lambda tester, args: tester.test_serialization(),
+    "search-index": lambda tester, args: tester.test_search_index(p99_budget_ms=args.p99_budget_ms),
+    "vitals-batch": lambda tester, args: tester.test_vitals_batch(),
+    "conditional-get": lambda tester, args: tester.test_conditional_get(),
+    "query-budget": lambda tester, args: tester.test_query_budget(),
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NAVHIM backend performance tests")
+    parser.add_argument("tests", nargs="*", help=f"tests to run: {', '.join(TESTS)} (default: all)")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--inline-base-url",
+                        help="login-storm: also storm a server started with PASSWORD_POOL_KIND=inline and compare")
+    parser.add_argument("--bookings", type=int, default=300)
+    parser.add_argument("--doctors", type=int, default=300, help="doctors to create for next-available")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per load phase")
+    parser.add_argument("--p99-budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    unknown = [name for name in args.tests if name not in TESTS]
+    if unknown:
+        parser.error(f"unknown tests: {', '.join(unknown)}")
+
+    tester = NAVHIMPerfTester(args.base_url)
+    for name in args.tests or list(TESTS):
+        TESTS[name](tester, args)
+    tester.print_test_summary()
@@ -397,6 +397,54 @@ class NAVHIMAPITester:
             self.log_result("Book Appointment", False, f"Error: {str(e)}")
             return None
     
+    def test_doctor_availability(self, appointment_data: Dict):
+        """Test that a booked appointment shows up as a booked slot in the doctor's availability"""
+        print("\n=== Testing Doctor Availability ===")
+        
+        if not appointment_data:
+            self.log_result("Doctor Availability", False, "No appointment data available")
+            return False
+        
+        booked_at = datetime.fromisoformat(appointment_data["appointment_datetime"])
+        booked_date = booked_at.strftime("%Y-%m-%d")
+        end_date = (booked_at + timedelta(days=6)).strftime("%Y-%m-%d")
+        
+        try:
+            response = self.make_request(
+                "GET",
+                f"/doctors/{appointment_data['doctor_id']}/availability?start_date={booked_date}&end_date={end_date}"
+            )
+            
+            if response.status_code == 200:
+                days = {day["date"]: day for day in response.json().get("days", [])}
+                booked_day = days.get(booked_date, {})
+                booked_time = booked_at.strftime("%H:%M")
+                success = (
+                    len(days) == 7
+                    and booked_time in booked_day.get("booked_slots", [])
+                    and booked_time not in booked_day.get("free_slots", [])
+                )
+                self.log_result(
+                    "Doctor Availability",
+                    success,
+                    f"{len(days)} days returned, {booked_time} on {booked_date} "
+                    f"{'marked booked' if success else 'not marked booked'}",
+                    booked_day
+                )
+                return success
+            else:
+                self.log_result(
+                    "Doctor Availability",
+                    False,
+                    f"Availability request failed with status {response.status_code}",
+                    response.text
+                )
+                return False
+                
+        except Exception as e:
+            self.log_result("Doctor Availability", False, f"Error: {str(e)}")
+            return False
+    
     def test_payment_flow(self, appointment_data: Dict):
         """Test complete payment flow"""
         print("\n=== Testing Payment Flow ===")
@@ -615,6 +663,49 @@ class NAVHIMAPITester:
             self.log_result("Get Single Appointment Details", False, f"Error: {str(e)}")
             return False
     
+    def test_emr_timeline(self):
+        """Test that the EMR timeline pages through a time-ordered, duplicate-free feed"""
+        print("\n=== Testing EMR Timeline ===")
+        
+        try:
+            vitals = self.make_request("POST", "/emr/vitals", {"heart_rate": 72, "notes": "Timeline test"})
+            if vitals.status_code != 201:
+                self.log_result("EMR Timeline", False, f"Could not add vitals: {vitals.status_code}", vitals.text)
+                return False
+            
+            entries, cursor, pages = [], None, 0
+            while True:
+                endpoint = "/emr/timeline?limit=2" + (f"&cursor={cursor}" if cursor else "")
+                response = self.make_request("GET", endpoint)
+                if response.status_code != 200:
+                    self.log_result("EMR Timeline", False, f"Failed with status {response.status_code}", response.text)
+                    return False
+                data = response.json()
+                entries.extend(data.get("timeline", []))
+                cursor = data.get("next_cursor")
+                pages += 1
+                if not cursor or pages >= 50:
+                    break
+            
+            times = [entry["occurred_at"] for entry in entries]
+            keys = [(entry["type"], entry["record"]["id"]) for entry in entries]
+            success = (
+                times == sorted(times, reverse=True)
+                and len(keys) == len(set(keys))
+                and ("vital", vitals.json()["id"]) in keys
+            )
+            self.log_result(
+                "EMR Timeline",
+                success,
+                f"{len(entries)} entries over {pages} pages, "
+                f"{'ordered and unique' if success else 'out of order, duplicated or missing the new reading'}",
+                {"types": sorted({entry["type"] for entry in entries})}
+            )
+            return success
+        except Exception as e:
+            self.log_result("EMR Timeline", False, f"Error: {str(e)}")
+            return False
+    
     def run_all_tests(self):
         """Run all backend API tests"""
         print("🏥 NAVHIM Hospital Management System - Backend API Tests")
@@ -631,6 +722,9 @@ class NAVHIMAPITester:
         # Test appointment booking (video)
         appointment_data = self.test_appointment_booking(doctor_data)
         
+        # Test availability reflects the booking
+        availability_success = self.test_doctor_availability(appointment_data)
+        
         # Test payment flow
         payment_success = self.test_payment_flow(appointment_data)
         
@@ -640,6 +734,9 @@ class NAVHIMAPITester:
         # Test appointment retrieval
         retrieval_success = self.test_appointment_retrieval()
         
+        # Test the merged EMR timeline
+        timeline_success = self.test_emr_timeline()
+        
         # Print summary
         self.print_test_summary()
         
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   Text,
@@ -33,13 +33,17 @@ export default function BookAppointmentScreen() {
   const [paymentDetails, setPaymentDetails] = useState<any>(null);
   const [showConfirmation, setShowConfirmation] = useState(false);
   const [appointmentDetails, setAppointmentDetails] = useState<any>(null);
-  const [bookedSlots, setBookedSlots] = useState<string[]>([]);
+  const [availability, setAvailability] = useState<Record<string, { free_slots: string[]; booked_slots: string[] }>>({});
+  // Doctor the availability map belongs to; responses requested for anyone else are dropped
+  const availabilityDoctorId = useRef<string | null>(null);
 
-  const allTimeSlots = [
-    '09:00', '09:30', '10:00', '10:30', '11:00', '11:30',
-    '12:00', '12:30', '14:00', '14:30', '15:00', '15:30',
-    '16:00', '16:30', '17:00', '17:30', '18:00', '18:30',
-  ];
+  const AVAILABILITY_FETCH_DAYS = 14;
+
+  const dayAvailability = availability[selectedDate];
+  const bookedSlots = dayAvailability?.booked_slots || [];
+  const allTimeSlots = dayAvailability
+    ? [...dayAvailability.free_slots, ...dayAvailability.booked_slots].sort()
+    : [];
 
   const getAvailableTimeSlots = () => {
     if (!selectedDate) return allTimeSlots;
@@ -66,25 +70,47 @@ export default function BookAppointmentScreen() {
     return availableSlots.filter(slot => !bookedSlots.includes(slot));
   };
 
-  const loadBookedSlots = async () => {
-    if (!selectedDoctor || !selectedDate) return;
+  const loadAvailability = async (refresh = false) => {
+    if (!selectedDoctor || !selectedDate || (!refresh && availability[selectedDate])) return;
+    
+    const doctorId = selectedDoctor.id;
+    // Fetch the next two weeks in one call so browsing nearby dates needs no further requests
+    const end = new Date(`${selectedDate}T00:00:00Z`);
+    end.setUTCDate(end.getUTCDate() + AVAILABILITY_FETCH_DAYS - 1);
+    const endDate = end.toISOString().split('T')[0];
     
     try {
-      const response = await api.get(`/api/doctors/${selectedDoctor.id}/booked-slots?date=${selectedDate}`);
-      setBookedSlots(response.data.booked_slots || []);
+      const response = await api.get(
+        `/api/doctors/${doctorId}/availability?start_date=${selectedDate}&end_date=${endDate}`
+      );
+      // The patient picked another doctor while this was in flight
+      if (availabilityDoctorId.current !== doctorId) return;
+      const days: Record<string, { free_slots: string[]; booked_slots: string[] }> = {};
+      for (const day of response.data.days || []) {
+        days[day.date] = { free_slots: day.free_slots, booked_slots: day.booked_slots };
+      }
+      setAvailability((current) => ({ ...current, ...days }));
     } catch (error) {
-      console.error('Error loading booked slots:', error);
-      setBookedSlots([]);
+      console.error('Error loading availability:', error);
     }
   };
 
+  const refreshSelectedDay = () => {
+    setAvailability((current) => {
+      const next = { ...current };
+      delete next[selectedDate];
+      return next;
+    });
+    loadAvailability(true);
+  };
+
   useEffect(() => {
     loadSpecializations();
   }, []);
 
   useEffect(() => {
     if (selectedDoctor && selectedDate) {
-      loadBookedSlots();
+      loadAvailability();
     }
   }, [selectedDoctor, selectedDate]);
 
@@ -117,6 +143,8 @@ export default function BookAppointmentScreen() {
 
   const handleDoctorSelect = (doctor: any) => {
     setSelectedDoctor(doctor);
+    availabilityDoctorId.current = doctor.id;
+    setAvailability({});
     setStep(3);
   };
 
@@ -139,6 +167,8 @@ export default function BookAppointmentScreen() {
 
       const createdAppointmentId = bookingResponse.data.id;
       setAppointmentId(createdAppointmentId);
+      // The slot just booked must not be offered again if the patient comes back to this screen
+      refreshSelectedDay();
       
       setLoading(false);
       // Navigate to dummy payment screen
@@ -154,6 +184,11 @@ export default function BookAppointmentScreen() {
     } catch (error: any) {
       setLoading(false);
       console.error('Booking error:', error);
+      if (error.response?.status === 409) {
+        // Someone else took the slot; show the day as it is now
+        setSelectedTime('');
+        refreshSelectedDay();
+      }
       Alert.alert('Error', error.response?.data?.detail || 'Failed to create appointment. Please try again.');
     }
   };
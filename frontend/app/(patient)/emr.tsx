@@ -16,12 +16,17 @@ export default function PatientEMRScreen() {
 
   const loadData = async () => {
     try {
-      const [vitalsRes, prescriptionsRes] = await Promise.all([
-        api.get('/api/emr/vitals'),
-        api.get('/api/emr/prescriptions'),
+      // One request per type, so a long vitals history cannot crowd prescriptions out of the page
+      const loadRecords = async (type: string) => {
+        const response = await api.get('/api/emr/timeline', { params: { types: type, limit: 100 } });
+        return (response.data.timeline || []).map((entry: any) => entry.record);
+      };
+      const [vitalRecords, prescriptionRecords] = await Promise.all([
+        loadRecords('vital'),
+        loadRecords('prescription'),
       ]);
-      setVitals(vitalsRes.data.vitals || []);
-      setPrescriptions(prescriptionsRes.data.prescriptions || []);
+      setVitals(vitalRecords);
+      setPrescriptions(prescriptionRecords);
     } catch (error) {
       console.error('Error loading EMR data:', error);
     } finally {
@@ -0,0 +1,39 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+import uvicorn
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+import stub_server  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def stub_url():
+    """Base URL of backend/stub_server.py, served by uvicorn on a free local port."""
+    server = uvicorn.Server(uvicorn.Config(stub_server.app, host="127.0.0.1", port=0, log_level="warning",
+                                           timeout_graceful_shutdown=1))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("stub server did not start")
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def stub(stub_url, monkeypatch):
+    """The stub module with call counts reset; set STUB_LATENCY_MS on it to slow responses down."""
+    stub_server.calls.clear()
+    stub_server.peers.clear()
+    monkeypatch.setattr(stub_server, "STUB_LATENCY_MS", 0.0)
+    return stub_server
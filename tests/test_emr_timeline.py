@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from bson import ObjectId
+
+import availability
+from emr_timeline import patient_timeline
+
+PATIENT = "patient-1"
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(_matches(doc, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, part) for part in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            if "$lt" in condition and not value < condition["$lt"]:
+                return False
+            if "$lte" in condition and not value <= condition["$lte"]:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, spec):
+        for key, direction in reversed(spec):
+            self.docs.sort(key=lambda doc: doc[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+    async def close(self):
+        pass
+
+
+class FakeCollection:
+    """find and the $match/$sort/$limit head of a timeline pipeline; later stages are ignored."""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+
+    def find(self, query, projection=None):
+        return FakeCursor([doc for doc in self.docs if _matches(doc, query)])
+
+    def aggregate(self, pipeline):
+        cursor = self.find(pipeline[0]["$match"])
+        return cursor.sort(list(pipeline[1]["$sort"].items())).limit(pipeline[2]["$limit"])
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+@pytest.fixture
+def ist(monkeypatch):
+    monkeypatch.setattr(availability, "CLINIC_TIMEZONE", ZoneInfo("Asia/Kolkata"))
+
+
+def test_appointments_merge_with_utc_records_in_real_time_order(ist):
+    # 10:00 IST is 04:30 UTC: the appointment came after the 04:00 UTC vital and before the 05:00 UTC one
+    appointment = {"_id": ObjectId(), "patient_id": PATIENT, "appointment_datetime": datetime(2026, 10, 20, 10, 0)}
+    early_vital = {"_id": ObjectId(), "patient_id": PATIENT, "recorded_at": datetime(2026, 10, 20, 4, 0)}
+    late_vital = {"_id": ObjectId(), "patient_id": PATIENT, "recorded_at": datetime(2026, 10, 20, 5, 0)}
+    db = FakeDB(appointments=FakeCollection([appointment]), vital_readings=FakeCollection([early_vital, late_vital]))
+
+    entries, _ = asyncio.run(patient_timeline(db, PATIENT, 10))
+
+    assert [entry.doc["_id"] for entry in entries] == [late_vital["_id"], appointment["_id"], early_vital["_id"]]
+    assert entries[1].occurred_at == datetime(2026, 10, 20, 4, 30)
+
+
+def test_pages_split_at_an_appointment_continue_in_order(ist):
+    appointment = {"_id": ObjectId(), "patient_id": PATIENT, "appointment_datetime": datetime(2026, 10, 20, 10, 0)}
+    vitals = [{"_id": ObjectId(), "patient_id": PATIENT, "recorded_at": datetime(2026, 10, 20, hour, 0)}
+              for hour in (3, 4, 5)]
+    db = FakeDB(appointments=FakeCollection([appointment]), vital_readings=FakeCollection(vitals))
+
+    first, cursor = asyncio.run(patient_timeline(db, PATIENT, 2))
+    second, last_cursor = asyncio.run(patient_timeline(db, PATIENT, 2, cursor))
+
+    order = [entry.doc["_id"] for entry in first + second]
+    assert order == [vitals[2]["_id"], appointment["_id"], vitals[1]["_id"], vitals[0]["_id"]]
+    assert last_cursor is None
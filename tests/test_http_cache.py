@@ -0,0 +1,121 @@
+import base64
+import gzip
+import os
+import zlib
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from bson import ObjectId
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:1")
+os.environ.setdefault("DB_NAME", "navhim_test")
+
+# Imported at collection time: motor's GridFS bucket needs the main thread's event loop
+import server as server_module  # noqa: E402
+from auth import get_current_user  # noqa: E402
+from http_cache import GZIP_ETAG_SUFFIX, CompressionMiddleware  # noqa: E402
+
+PAYLOAD = b'{"readings": [' + b",".join(b'{"heart_rate": 72}' for _ in range(200)) + b"]}"
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.get("/json")
+    def json_body():
+        return Response(PAYLOAD, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    def small_body():
+        return Response(b"{}", media_type="application/json")
+
+    @app.get("/image")
+    def image_body():
+        return Response(PAYLOAD, media_type="image/png")
+
+    @app.get("/partial")
+    def partial_body():
+        return Response(PAYLOAD, status_code=206, media_type="application/json")
+
+    @app.get("/stream")
+    def stream_body():
+        return StreamingResponse(iter([PAYLOAD[:1500], PAYLOAD[1500:]]), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return app
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(make_app())
+
+
+def get_raw(client, path):
+    """Response headers and the body exactly as sent, before the client undoes any gzip."""
+    with client.stream("GET", path, headers={"Accept-Encoding": "gzip"}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_large_json_is_gzipped_with_tagged_etag(client):
+    response, raw = get_raw(client, "/json")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == f'"abc{GZIP_ETAG_SUFFIX}"'
+    assert int(response.headers["content-length"]) == len(raw)
+    assert gzip.decompress(raw) == PAYLOAD
+
+
+@pytest.mark.parametrize("path", ["/small", "/image", "/partial"])
+def test_small_binary_and_partial_responses_pass_through(client, path):
+    response, raw = get_raw(client, path)
+
+    assert "content-encoding" not in response.headers
+    assert int(response.headers["content-length"]) == len(raw)
+
+
+def test_streamed_response_is_gzipped_per_chunk(client):
+    response, raw = get_raw(client, "/stream")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert zlib.decompress(raw, zlib.MAX_WBITS | 16) == PAYLOAD
+
+
+def test_client_without_gzip_gets_identity(client):
+    response = client.get("/json", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+    assert response.content == PAYLOAD
+
+
+class FakeDocuments:
+    def __init__(self, doc: dict):
+        self.doc = doc
+
+    async def find_one(self, query, projection=None):
+        return dict(self.doc) if query["_id"] == self.doc["_id"] else None
+
+
+def test_text_document_download_is_not_gzipped_and_resumes(monkeypatch):
+    content = b"Discharge summary\n" * 200
+    doc = {"_id": ObjectId(), "patient_id": "patient-1", "document_name": "summary.txt",
+           "content_type": "text/plain", "document_data": base64.b64encode(content).decode()}
+    monkeypatch.setattr(server_module, "db", type("FakeDB", (), {"medical_documents": FakeDocuments(doc)})())
+    monkeypatch.setitem(server_module.app.dependency_overrides, get_current_user, lambda: {"user_id": "patient-1"})
+    # No context manager, so the startup hooks (and their MongoDB calls) do not run
+    client = TestClient(server_module.app)
+    path = f"/api/emr/documents/{doc['_id']}/download"
+
+    response, raw = get_raw(client, path)
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert raw == content
+
+    resumed = client.get(path, headers={"Accept-Encoding": "gzip", "Range": "bytes=1000-"})
+    assert resumed.status_code == 206
+    assert "content-encoding" not in resumed.headers
+    assert raw[:1000] + resumed.content == content
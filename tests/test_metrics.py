@@ -0,0 +1,28 @@
+from metrics import CacheStatsCollector
+
+
+class FakeCache:
+    def __init__(self, **stats):
+        self._stats = stats
+
+    def stats(self):
+        return self._stats
+
+
+def samples(collector):
+    return {(sample.name, tuple(sorted(sample.labels.items()))): sample.value
+            for family in collector.collect() for sample in family.samples}
+
+
+def test_cache_stats_are_exported_per_cache():
+    collector = CacheStatsCollector()
+    collector.register("doctor_directory", FakeCache(entries=3, hits=8, misses=2, invalidations=1))
+    collector.register("availability", FakeCache(entries=5, hits=1, misses=4))
+
+    exported = samples(collector)
+
+    assert exported[("cache_lookups_total", (("cache", "doctor_directory"), ("result", "hit")))] == 8
+    assert exported[("cache_lookups_total", (("cache", "availability"), ("result", "miss")))] == 4
+    assert exported[("cache_invalidations_total", (("cache", "doctor_directory"),))] == 1
+    assert ("cache_invalidations_total", (("cache", "availability"),)) not in exported
+    assert exported[("cache_entries", (("cache", "availability"),))] == 5
@@ -0,0 +1,81 @@
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:1")
+os.environ.setdefault("DB_NAME", "navhim_test")
+
+# Imported at collection time: motor's GridFS bucket needs the main thread's event loop
+import availability  # noqa: E402
+import server as server_module  # noqa: E402
+
+
+class FakeIndex:
+    def __len__(self):
+        return 1
+
+    def list_by_specialization(self, specialization, limit):
+        return [{"id": "doctor-1", "specialization": specialization}]
+
+
+class FakeSearch:
+    async def get_index(self):
+        return FakeIndex()
+
+
+class FakeAvailability:
+    """Records the clinic-time window the endpoint searched."""
+
+    def __init__(self):
+        self.windows = []
+
+    async def next_available(self, doctor_ids, start, end, limit):
+        self.windows.append((start, end))
+        return []
+
+
+@pytest.fixture
+def searched(monkeypatch):
+    monkeypatch.setattr(availability, "CLINIC_TIMEZONE", ZoneInfo("Asia/Kolkata"))
+    fake = FakeAvailability()
+    monkeypatch.setattr(server_module, "availability", fake)
+    monkeypatch.setattr(server_module, "doctor_search", FakeSearch())
+    # No context manager, so the startup hooks (and their MongoDB calls) do not run
+    client = TestClient(server_module.app)
+
+    def search(**params):
+        response = client.get("/api/doctors/next-available", params={"specialization": "Cardiology", **params})
+        return response, fake.windows
+
+    return search
+
+
+def test_offset_times_are_converted_to_clinic_time(searched):
+    response, windows = searched(start="2099-10-20T09:00:00Z", end="2099-10-21T09:00:00Z")
+
+    assert response.status_code == 200
+    assert windows == [(datetime(2099, 10, 20, 14, 30), datetime(2099, 10, 21, 14, 30))]
+
+
+def test_naive_times_are_clinic_time(searched):
+    response, windows = searched(start="2099-10-20T09:00:00", end="2099-10-21T09:00:00")
+
+    assert windows == [(datetime(2099, 10, 20, 9, 0), datetime(2099, 10, 21, 9, 0))]
+
+
+def test_past_start_is_clamped_to_now(searched):
+    before = datetime.now(ZoneInfo("Asia/Kolkata")).replace(tzinfo=None)
+    response, windows = searched(start=(before - timedelta(days=2)).isoformat(), end=(before + timedelta(days=1)).isoformat())
+
+    assert response.status_code == 200
+    assert windows[0][0] >= before
+
+
+def test_window_entirely_in_the_past_is_empty(searched):
+    response, windows = searched(start="2020-01-01T09:00:00", end="2020-01-02T09:00:00")
+
+    assert response.json() == {"slots": [], "doctors": {}}
+    assert windows == []
@@ -0,0 +1,45 @@
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId, json_util
+
+from emr_timeline import decode_timeline_cursor
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+
+
+def raw_cursor(payload: dict) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    last_id = ObjectId()
+    created_at = datetime(2026, 1, 1, 9, 30)
+
+    assert decode_cursor(encode_cursor(created_at, last_id)) == (created_at, last_id)
+    assert keyset_filter("created_at", encode_cursor(created_at, last_id)) == {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": last_id}},
+    ]}
+
+
+@pytest.mark.parametrize("payload", [
+    {"v": {"$ne": None}, "id": ObjectId()},
+    {"v": [{"$gt": ""}], "id": ObjectId()},
+    {"v": True, "id": ObjectId()},
+    {"v": datetime(2026, 1, 1), "id": {"$gt": ""}},
+    {"v": datetime(2026, 1, 1), "id": "not-an-object-id"},
+])
+def test_crafted_cursor_is_rejected(payload):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor(payload))
+
+
+def test_composite_cursor_only_for_timeline():
+    cursor = encode_cursor([datetime(2026, 1, 1), "vital"], ObjectId())
+
+    assert decode_timeline_cursor(cursor)[1] == 0
+    with pytest.raises(InvalidCursor):
+        keyset_filter("created_at", cursor)
+    with pytest.raises(InvalidCursor):
+        decode_timeline_cursor(raw_cursor({"v": ["2026-01-01", "vital"], "id": ObjectId()}))
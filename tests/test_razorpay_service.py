@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+import pytest
+from bson import ObjectId
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:1")
+os.environ.setdefault("DB_NAME", "navhim_test")
+
+# Imported at collection time: motor's GridFS bucket needs the main thread's event loop
+import server as server_module  # noqa: E402
+from razorpay_service import AsyncRazorpayService, compute_payment_signature  # noqa: E402
+
+
+def make_service(stub_url: str) -> AsyncRazorpayService:
+    service = AsyncRazorpayService()
+    service.key_id = "rzp_test_key"
+    service.key_secret = "test-secret"
+    service.api_base_url = f"{stub_url}/razorpay/v1"
+    return service
+
+
+class FakeAppointments:
+    """The two appointments calls get_or_create_payment_order makes, on one in-memory document."""
+
+    def __init__(self, doc: dict):
+        self.doc = doc
+
+    async def find_one(self, query, projection=None):
+        return dict(self.doc) if query["_id"] == self.doc["_id"] else None
+
+    async def update_one(self, query, update):
+        self.doc.update(update["$set"])
+
+
+@pytest.fixture
+def server(stub_url, monkeypatch):
+    monkeypatch.setattr(server_module, "razorpay_service", make_service(stub_url))
+    return server_module
+
+
+def test_create_order_in_paise(stub, stub_url):
+    async def run():
+        service = make_service(stub_url)
+        try:
+            return await service.create_order(499.5, receipt="appointment-1")
+        finally:
+            await service.aclose()
+
+    order = asyncio.run(run())
+
+    assert order["id"].startswith("order_")
+    assert order["amount"] == 49950
+    assert order["currency"] == "INR"
+    assert order["receipt"] == "appointment-1"
+    assert stub.calls["razorpay.create_order"] == 1
+
+
+def test_retried_create_order_reuses_the_order(stub, server, monkeypatch):
+    appointment = {"_id": ObjectId(), "patient_id": "patient-1"}
+    appointments = FakeAppointments(dict(appointment))
+    monkeypatch.setattr(server, "db", type("FakeDB", (), {"appointments": appointments})())
+
+    async def run():
+        try:
+            concurrent = await asyncio.gather(*(server.get_or_create_payment_order(appointment, 500.0) for _ in range(5)))
+            retried = await server.get_or_create_payment_order(appointment, 500.0)
+            repriced = await server.get_or_create_payment_order(appointment, 750.0)
+            return concurrent, retried, repriced
+        finally:
+            await server.razorpay_service.aclose()
+
+    concurrent, retried, repriced = asyncio.run(run())
+
+    assert len({order["id"] for order in concurrent}) == 1
+    assert retried == concurrent[0]
+    assert repriced["id"] != retried["id"] and repriced["amount"] == 75000
+    assert appointments.doc["razorpay_order"] == repriced
+    assert stub.calls["razorpay.create_order"] == 2
+
+
+def test_verify_payment_signature():
+    service = AsyncRazorpayService()
+    service.key_secret = "test-secret"
+    signature = compute_payment_signature("test-secret", "order_abc", "pay_123")
+
+    assert service.verify_payment_signature("order_abc", "pay_123", signature)
+    assert not service.verify_payment_signature("order_abc", "pay_456", signature)
+    assert not service.verify_payment_signature("order_abc", "pay_123", compute_payment_signature("other", "order_abc", "pay_123"))
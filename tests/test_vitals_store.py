@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import vitals_store
+from vitals_store import LEGACY_VITALS_COLLECTION, VITALS_COLLECTION, migrate_legacy_vitals, read_vitals_batch_body
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        self.docs.sort(key=lambda doc: doc[key], reverse=direction < 0)
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if isinstance(condition, dict) and "$exists" in condition:
+            if (key in doc) != condition["$exists"]:
+                return False
+        elif isinstance(condition, dict) and "$in" in condition:
+            if doc.get(key) not in condition["$in"]:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    """The find/insert_many/update_many subset migrate_legacy_vitals uses; no _id uniqueness, like a time-series collection."""
+
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs if _matches(doc, query)])
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(dict(doc) for doc in docs)
+
+    async def update_many(self, query, update):
+        for doc in self.docs:
+            if _matches(doc, query):
+                doc.update(update["$set"])
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+def legacy_readings(count):
+    return [{"_id": ObjectId(), "patient_id": f"patient-{i % 3}", "heart_rate": 60 + i} for i in range(count)]
+
+
+def test_migration_resumes_without_duplicating_after_a_crash(monkeypatch):
+    monkeypatch.setattr(vitals_store, "MIGRATION_BATCH_SIZE", 4)
+    db = FakeDB({LEGACY_VITALS_COLLECTION: FakeCollection(legacy_readings(10))})
+    legacy, target = db[LEGACY_VITALS_COLLECTION], db[VITALS_COLLECTION]
+
+    # A run that dies after copying its first batch but before marking it
+    async def crash_before_marking(query, update):
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr(legacy, "update_many", crash_before_marking)
+    with pytest.raises(RuntimeError):
+        asyncio.run(migrate_legacy_vitals(db))
+    assert len(target.docs) == 4
+    monkeypatch.undo()
+    monkeypatch.setattr(vitals_store, "MIGRATION_BATCH_SIZE", 4)
+
+    migrated = asyncio.run(migrate_legacy_vitals(db))
+
+    assert migrated == 6
+    assert sorted(doc["_id"] for doc in target.docs) == sorted(doc["_id"] for doc in legacy.docs)
+    assert all(doc["migrated_to"] == VITALS_COLLECTION for doc in legacy.docs)
+    assert asyncio.run(migrate_legacy_vitals(db)) == 0
+
+
+def batch_request(chunks, content_length=None):
+    """A Request whose body arrives in `chunks`; `received` counts the chunks the handler pulled."""
+    headers = [(b"content-length", str(content_length).encode())] if content_length is not None else []
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1} for i, chunk in enumerate(chunks)]
+    received = []
+
+    async def receive():
+        received.append(1)
+        return messages[len(received) - 1]
+
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive), received
+
+
+def read_body(request):
+    return asyncio.run(read_vitals_batch_body(request))
+
+
+def test_batch_body_within_limit_is_read(monkeypatch):
+    monkeypatch.setattr(vitals_store, "MAX_VITALS_BATCH_BYTES", 10)
+    request, _ = batch_request([b"[1,", b"2]"])
+
+    assert read_body(request) == b"[1,2]"
+
+
+def test_oversized_content_length_is_refused_unread(monkeypatch):
+    monkeypatch.setattr(vitals_store, "MAX_VITALS_BATCH_BYTES", 10)
+    request, received = batch_request([b"x" * 11], content_length=11)
+
+    with pytest.raises(HTTPException) as error:
+        read_body(request)
+    assert error.value.status_code == 413
+    assert not received
+
+
+def test_chunked_body_is_cut_off_at_the_limit(monkeypatch):
+    monkeypatch.setattr(vitals_store, "MAX_VITALS_BATCH_BYTES", 10)
+    request, received = batch_request([b"x" * 6, b"x" * 6, b"x" * 6])
+
+    with pytest.raises(HTTPException) as error:
+        read_body(request)
+    assert error.value.status_code == 413
+    assert len(received) == 2
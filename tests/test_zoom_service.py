@@ -0,0 +1,69 @@
+import asyncio
+import time
+from datetime import datetime
+
+import httpx
+import pytest
+
+import zoom_service
+from zoom_service import AsyncZoomService
+
+
+def make_service(stub_url: str) -> AsyncZoomService:
+    service = AsyncZoomService()
+    service.client_id = "test-client"
+    service.client_secret = "test-secret"
+    service.oauth_url = f"{stub_url}/zoom/oauth/token"
+    service.api_base_url = f"{stub_url}/zoom/v2"
+    return service
+
+
+async def create_meetings(service: AsyncZoomService, count: int, concurrent: bool = True):
+    try:
+        calls = [service.create_meeting("Consultation", start_time=datetime(2030, 1, 1, 10, 0))
+                 for _ in range(count)]
+        if concurrent:
+            return await asyncio.gather(*calls)
+        return [await call for call in calls]
+    finally:
+        await service.aclose()
+
+
+def test_concurrent_calls_with_expired_token_refresh_once(stub, stub_url):
+    stub.STUB_LATENCY_MS = 20
+    service = make_service(stub_url)
+    service.access_token = "expired"
+    service.token_expires_at = time.time() - 1
+
+    meetings = asyncio.run(create_meetings(service, 25))
+
+    assert stub.calls["zoom.token"] == 1
+    assert stub.calls["zoom.create_meeting"] == 25
+    assert all(meeting["join_url"] for meeting in meetings)
+    assert service.access_token != "expired"
+
+
+def test_sequential_calls_reuse_one_connection(stub, stub_url):
+    asyncio.run(create_meetings(make_service(stub_url), 10, concurrent=False))
+
+    assert stub.calls["zoom.token"] == 1
+    assert stub.calls["zoom.create_meeting"] == 10
+    assert stub.peers and len(stub.peers) == 1
+
+
+def test_concurrent_calls_stay_within_pool_limit(stub, stub_url):
+    stub.STUB_LATENCY_MS = 20
+    asyncio.run(create_meetings(make_service(stub_url), zoom_service.ZOOM_MAX_CONNECTIONS * 3))
+
+    assert 1 < len(stub.peers) <= zoom_service.ZOOM_MAX_CONNECTIONS
+
+
+def test_slow_api_times_out(stub, stub_url, monkeypatch):
+    monkeypatch.setattr(zoom_service, "ZOOM_TIMEOUT_SECONDS", 0.1)
+    stub.STUB_LATENCY_MS = 1000
+    service = make_service(stub_url)
+
+    started = time.perf_counter()
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(create_meetings(service, 1))
+    assert time.perf_counter() - started < 0.9